@@ -5,13 +5,17 @@ Este script ayuda a identificar cómo se cargan los datos de candidatos
 y qué peticiones se realizan para obtener la información.
 """
 
+import argparse
 import asyncio
 from playwright.async_api import async_playwright
 import json
 import os
 
-async def analyze_page_structure():
-    """Analiza la estructura de la página y las peticiones de red."""
+async def analyze_page_structure(record_har=None):
+    """
+    Analiza la estructura de la página y las peticiones de red. Con record_har se guarda
+    además un HAR completo (peticiones y respuestas con su cuerpo) para har_archive.py replay.
+    """
     
     print("Iniciando análisis de la estructura de la página del INE...")
     
@@ -20,7 +24,11 @@ async def analyze_page_structure():
         browser = await p.chromium.launch(headless=True)
         
         # Crear un contexto con interceptación de peticiones
-        context = await browser.new_context()
+        if record_har:
+            os.makedirs(os.path.dirname(record_har) or ".", exist_ok=True)
+            context = await browser.new_context(record_har_path=record_har, record_har_content="embed")
+        else:
+            context = await browser.new_context()
         
         # Crear una página
         page = await context.new_page()
@@ -149,8 +157,11 @@ async def analyze_page_structure():
         await page.screenshot(path=screenshot_path)
         print(f"\nCaptura de pantalla guardada en: {screenshot_path}")
         
-        # Cerrar el navegador
+        # Cerrar el navegador (el HAR se escribe al cerrar el contexto)
+        await context.close()
         await browser.close()
+        if record_har:
+            print(f"\nHAR de la sesión guardado en {record_har}")
         
         # Guardar resultados del análisis
         analysis_results = {
@@ -167,4 +178,8 @@ async def analyze_page_structure():
         print("\nAnálisis completado.")
 
 if __name__ == "__main__":
-    asyncio.run(analyze_page_structure())
+    parser = argparse.ArgumentParser(description="Analiza la estructura de la página del INE y sus endpoints")
+    parser.add_argument("--record-har", nargs="?", const=os.path.join("har_archives", "ine_site.har"), default=None,
+                        help="Guardar un HAR completo de la sesión (por defecto har_archives/ine_site.har)")
+    args = parser.parse_args()
+    asyncio.run(analyze_page_structure(args.record_har))
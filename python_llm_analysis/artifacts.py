@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Capa de artefactos columnares para las salidas intermedias del pipeline.
+Cada tabla CSV/JSON se acompaña de una versión Parquet tipada (mismo nombre,
+extensión .parquet) y los lectores cargan solo las columnas que necesitan.
+"""
+
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+def parquet_path(path):
+    """Ruta del artefacto Parquet que acompaña a un CSV/JSON."""
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def _prepare_for_parquet(df):
+    """
+    Ajusta columnas de tipo object para que Arrow pueda tiparlas:
+    listas/dicts se serializan a JSON y columnas con tipos mezclados pasan a texto.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+        if inferred in ("string", "empty", "bytes", "boolean"):
+            continue
+        if inferred == "integer":
+            df[col] = df[col].astype("Int64")
+            continue
+        if inferred in ("floating", "mixed-integer-float"):
+            df[col] = pd.to_numeric(df[col])
+            continue
+        if df[col].map(lambda v: isinstance(v, (list, dict))).any():
+            df[col] = df[col].map(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v)
+        df[col] = df[col].map(lambda v: None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+    return df
+
+
+def write_table(df, path, write_csv=True):
+    """
+    Escribe df como CSV en path (si write_csv) y como Parquet en la ruta hermana .parquet.
+    Regresa la ruta del Parquet.
+    """
+    if write_csv:
+        df.to_csv(path, index=False, encoding='utf-8')
+    target = parquet_path(path)
+    _prepare_for_parquet(df).to_parquet(target, index=False, compression="zstd")
+    return target
+
+
+def write_records(records, path):
+    """Escribe una lista de dicts (p. ej. un JSON de candidatos) como Parquet junto a path."""
+    # dtype=object evita que los enteros con faltantes pasen a float (2 -> 2.0); _prepare_for_parquet
+    # los tipa como Int64
+    return write_table(pd.DataFrame(list(records), dtype=object), path, write_csv=False)
+
+
+def read_table(path, columns=None):
+    """
+    Lee una tabla cargando solo las columnas pedidas. Usa el Parquet si existe y no es
+    más viejo que el CSV; si no, cae al CSV leyendo todo como texto (igual que csv.DictReader).
+    Las columnas pedidas que no existen en el archivo se omiten.
+    """
+    target = parquet_path(path)
+    use_parquet = os.path.exists(target) and (
+        not os.path.exists(path) or os.path.getmtime(target) >= os.path.getmtime(path)
+    )
+    if use_parquet:
+        if columns is not None:
+            available = set(pq.read_schema(target).names)
+            columns = [col for col in columns if col in available]
+        return pd.read_parquet(target, columns=columns)
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            # dtype=object conserva enteros con faltantes como enteros (no 5.0)
+            df = pd.DataFrame(json.load(f), dtype=object)
+        return df[[col for col in columns if col in df.columns]] if columns is not None else df
+    usecols = (lambda col: col in columns) if columns is not None else None
+    return pd.read_csv(path, usecols=usecols, dtype=str, keep_default_na=False, encoding='utf-8')
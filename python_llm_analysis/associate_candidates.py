@@ -7,10 +7,13 @@ de distritos judiciales para crear una asociación entre ambos.
 
 import os
 import pandas as pd
-import geopandas as gpd
 import json
 import logging
-from tqdm import tqdm
+from artifacts import read_table
+from geo_cache import read_attributes, read_geodataframe
+from candidate_store import CandidateStore
+from metrics import counter, export as export_metrics, timer
+from profiling import profile_from_argv
 
 # Configuración de logging
 logging.basicConfig(
@@ -23,13 +26,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Directorios de trabajo
-BASE_DIR = "/home/ubuntu"
-INE_SCRAPER_DIR = os.path.join(BASE_DIR, "ine_scraper")
-DISTRITOS_DIR = os.path.join(BASE_DIR, "distritos_judiciales")
+# Directorios de trabajo (relativos al directorio desde el que se ejecuta, como las demás etapas)
+BASE_DIR = os.getcwd()
+EXTRACT_DIR = os.path.join(BASE_DIR, "extract_candidates_output")
+DOWNLOAD_DIR = os.path.join(BASE_DIR, "download_profiles_output")
+DISTRITOS_DIR = os.environ.get("DISTRITOS_DIR", os.path.join(BASE_DIR, "distritos_judiciales"))
 OUTPUT_DIR = os.path.join(DISTRITOS_DIR, "output")
 RESULT_DIR = os.path.join(BASE_DIR, "resultado_final")
 
+# Almacén compartido de candidatos
+STORE_PATH = os.path.join(EXTRACT_DIR, "candidates.sqlite")
+
+# Categorías de candidatos con archivo raw_{categoria}.json
+RAW_CATEGORIES = [
+    "jueces_distrito", "magistrados_circuito", "magistrados_sala_superior",
+    "magistrados_sala_regional", "magistrados_tribunal_disciplina", "ministros_suprema_corte"
+]
+
 # Crear directorio de resultados si no existe
 os.makedirs(RESULT_DIR, exist_ok=True)
 
@@ -39,14 +52,14 @@ def load_candidates_data():
     """
     try:
         # Intentar cargar desde el CSV con documentos
-        candidates_csv = os.path.join(INE_SCRAPER_DIR, "data", "candidates_with_documents.csv")
+        candidates_csv = os.path.join(DOWNLOAD_DIR, "candidates_with_documents.csv")
         if os.path.exists(candidates_csv):
-            df = pd.read_csv(candidates_csv)
+            df = read_table(candidates_csv)
             logger.info(f"Datos de candidatos cargados desde CSV: {candidates_csv}")
             return df
         
         # Si no existe, intentar cargar desde el JSON normalizado
-        normalized_json = os.path.join(INE_SCRAPER_DIR, "data", "normalized_candidates.json")
+        normalized_json = os.path.join(EXTRACT_DIR, "normalized_candidates.json")
         if os.path.exists(normalized_json):
             with open(normalized_json, 'r', encoding='utf-8') as f:
                 candidates = json.load(f)
@@ -55,7 +68,7 @@ def load_candidates_data():
             return df
         
         # Si no existe ninguno, cargar desde el JSON original
-        all_candidates_json = os.path.join(INE_SCRAPER_DIR, "data", "all_candidates.json")
+        all_candidates_json = os.path.join(EXTRACT_DIR, "all_candidates.json")
         if os.path.exists(all_candidates_json):
             with open(all_candidates_json, 'r', encoding='utf-8') as f:
                 candidates = json.load(f)
@@ -72,31 +85,36 @@ def load_candidates_data():
 
 def load_raw_candidates_data():
     """
-    Carga los datos crudos de candidatos para obtener información adicional.
+    Carga los datos crudos de candidatos de todas las categorías para obtener información adicional.
+    Usa el almacén de candidatos si está poblado; si no, los archivos raw_*.json.
     """
-    try:
-        # Cargar datos crudos de jueces de distrito como ejemplo
-        raw_json = os.path.join(INE_SCRAPER_DIR, "data", "raw_jueces_distrito.json")
-        if os.path.exists(raw_json):
+    with CandidateStore(STORE_PATH) as store:
+        if store.count("raw_candidates"):
+            logger.info(f"Datos crudos de candidatos cargados desde el almacén: {STORE_PATH}")
+            return store.raw_by_folio()
+    
+    candidates_dict = {}
+    for category in RAW_CATEGORIES:
+        raw_json = os.path.join(EXTRACT_DIR, f"raw_{category}.json")
+        if not os.path.exists(raw_json):
+            continue
+        try:
             with open(raw_json, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
             if "candidatos" in data and isinstance(data["candidatos"], list):
                 # Crear un diccionario para búsqueda rápida por ID
-                candidates_dict = {}
                 for candidate in data["candidatos"]:
                     if "idCandidato" in candidate:
                         candidates_dict[str(candidate["idCandidato"])] = candidate
-                
                 logger.info(f"Datos crudos de candidatos cargados desde: {raw_json}")
-                return candidates_dict
         
-        logger.warning("No se encontraron datos crudos de candidatos")
-        return {}
+        except Exception as e:
+            logger.error(f"Error al cargar datos crudos de candidatos desde {raw_json}: {e}")
     
-    except Exception as e:
-        logger.error(f"Error al cargar datos crudos de candidatos: {e}")
-        return {}
+    if not candidates_dict:
+        logger.warning("No se encontraron datos crudos de candidatos")
+    return candidates_dict
 
 def load_districts_data():
     """
@@ -110,11 +128,10 @@ def load_districts_data():
             logger.info(f"Datos de distritos judiciales cargados desde CSV: {csv_path}")
             return df
         
-        # Si no existe el CSV, intentar cargar desde el shapefile
+        # Si no existe el CSV, intentar cargar desde el shapefile (solo atributos, vía la caché GeoParquet)
         shp_path = os.path.join(OUTPUT_DIR, "distritos_judiciales_mexico.shp")
         if os.path.exists(shp_path):
-            gdf = gpd.read_file(shp_path)
-            df = pd.DataFrame(gdf.drop(columns='geometry'))
+            df = read_attributes(shp_path)
             logger.info(f"Datos de distritos judiciales cargados desde shapefile: {shp_path}")
             return df
         
@@ -125,9 +142,23 @@ def load_districts_data():
         logger.error(f"Error al cargar datos de distritos judiciales: {e}")
         return None
 
+def _join_key(series):
+    """
+    Normaliza una columna de identificadores para usarla como llave de join:
+    los valores numéricos enteros se comparan como enteros (1, 1.0 y "1" coinciden)
+    y el resto como texto en mayúsculas. Los valores vacíos quedan como NaN.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    key = series.astype(str).str.strip().str.upper()
+    is_int = numeric.notna() & (numeric % 1 == 0)
+    key = key.mask(is_int, numeric[is_int].astype('int64').astype(str))
+    return key.mask(series.isna() | key.isin(['', 'NAN', 'NONE']))
+
 def associate_candidates_with_districts(candidates_df, districts_df, raw_candidates=None):
     """
     Asocia candidatos con distritos judiciales basado en los campos comunes.
+    Primero une por (idCircuito, idDistritoJudicial) y, para los candidatos sin coincidencia,
+    por nombre de estado. La columna tipo_asociacion indica cómo se asoció cada fila.
     """
     try:
         if candidates_df is None or districts_df is None:
@@ -142,6 +173,7 @@ def associate_candidates_with_districts(candidates_df, districts_df, raw_candida
         result_df['circuito_judicial'] = None
         result_df['nombre_distrito'] = None
         result_df['entidad_distrito'] = None
+        result_df['tipo_asociacion'] = 'sin_coincidencia'
         
         # Normalizar nombres de columnas en el DataFrame de distritos
         districts_df.columns = [col.lower() for col in districts_df.columns]
@@ -162,73 +194,69 @@ def associate_candidates_with_districts(candidates_df, districts_df, raw_candida
             logger.error("Columnas necesarias no encontradas en el DataFrame de distritos")
             return None
         
-        # Contador de asociaciones exitosas
-        successful_matches = 0
-        
-        # Procesar cada candidato
-        for idx, candidate in tqdm(result_df.iterrows(), total=len(result_df), desc="Asociando candidatos"):
-            try:
-                # Obtener ID del candidato
-                candidate_id = str(candidate.get('folio', ''))
-                
-                # Buscar información adicional en datos crudos si está disponible
-                raw_data = None
-                if raw_candidates and candidate_id in raw_candidates:
-                    raw_data = raw_candidates[candidate_id]
-                
-                # Intentar asociar por idCircuito y idDistritoJudicial si están disponibles en datos crudos
-                if raw_data and 'idCircuito' in raw_data and 'idDistritoJudicial' in raw_data:
-                    circuit_id = raw_data['idCircuito']
-                    district_id = raw_data['idDistritoJudicial']
-                    
-                    # Buscar en el DataFrame de distritos
-                    matching_districts = districts_df[
-                        (districts_df[circuit_id_col] == circuit_id) & 
-                        (districts_df[district_id_col] == district_id)
-                    ]
-                    
-                    if not matching_districts.empty:
-                        # Tomar el primer distrito que coincida
-                        district = matching_districts.iloc[0]
-                        
-                        # Asignar valores
-                        result_df.at[idx, 'distrito_judicial'] = district[district_id_col]
-                        result_df.at[idx, 'circuito_judicial'] = district[circuit_id_col]
-                        if district_name_col and district_name_col in district:
-                            result_df.at[idx, 'nombre_distrito'] = district[district_name_col]
-                        if entity_col and entity_col in district:
-                            result_df.at[idx, 'entidad_distrito'] = district[entity_col]
-                        
-                        successful_matches += 1
-                        continue
-                
-                # Si no se encontró coincidencia o no hay datos crudos, intentar asociar por estado
-                if 'nombreEstado' in raw_data:
-                    estado = raw_data['nombreEstado']
-                    
-                    # Buscar distritos en ese estado
-                    matching_districts = districts_df[
-                        districts_df[entity_col].str.upper() == estado.upper()
-                    ]
-                    
-                    if not matching_districts.empty:
-                        # Tomar el primer distrito del estado (simplificación)
-                        district = matching_districts.iloc[0]
-                        
-                        # Asignar valores
-                        result_df.at[idx, 'distrito_judicial'] = district[district_id_col]
-                        result_df.at[idx, 'circuito_judicial'] = district[circuit_id_col]
-                        if district_name_col and district_name_col in district:
-                            result_df.at[idx, 'nombre_distrito'] = district[district_name_col]
-                        if entity_col and entity_col in district:
-                            result_df.at[idx, 'entidad_distrito'] = district[entity_col]
-                        
-                        successful_matches += 1
-            
-            except Exception as e:
-                logger.warning(f"Error al procesar candidato {candidate_id}: {e}")
+        # Columnas de resultado -> columna de origen en el DataFrame de distritos
+        target_cols = {
+            'distrito_judicial': district_id_col,
+            'circuito_judicial': circuit_id_col,
+            'entidad_distrito': entity_col,
+        }
+        if district_name_col:
+            target_cols['nombre_distrito'] = district_name_col
+        source_cols = list(dict.fromkeys(target_cols.values()))
+        
+        # Datos crudos alineados por posición con los candidatos (búsqueda por folio)
+        raw_cols = ['idCircuito', 'idDistritoJudicial', 'nombreEstado']
+        raw_df = pd.DataFrame.from_dict(raw_candidates or {}, orient='index')
+        raw_df = raw_df.reindex(columns=raw_cols)
+        folios = result_df['folio'].astype(str) if 'folio' in result_df.columns else pd.Series('', index=result_df.index)
+        keys = raw_df.reindex(folios.to_numpy()).reset_index(drop=True)
+        keys['_row'] = range(len(keys))
+        
+        # 1) Join exacto por circuito y distrito (primer distrito que coincida, como antes)
+        exact_table = districts_df[source_cols].assign(
+            _circ=_join_key(districts_df[circuit_id_col]),
+            _dist=_join_key(districts_df[district_id_col]),
+        ).dropna(subset=['_circ', '_dist']).drop_duplicates(['_circ', '_dist'])
+        left = pd.DataFrame({
+            '_row': keys['_row'],
+            '_circ': _join_key(keys['idCircuito']),
+            '_dist': _join_key(keys['idDistritoJudicial']),
+        }).dropna(subset=['_circ', '_dist'])
+        exact = left.merge(exact_table, on=['_circ', '_dist'], how='inner')
+        exact['tipo_asociacion'] = 'circuito_distrito'
         
-        logger.info(f"Asociación completada. Coincidencias exitosas: {successful_matches}/{len(result_df)}")
+        # 2) Respaldo por estado para los candidatos sin coincidencia exacta. Solo se asigna
+        # el distrito si es el único del estado y el circuito si todos sus distritos lo comparten
+        # (antes se tomaba el primer distrito del estado, que casi nunca es el del candidato)
+        states = districts_df[source_cols].assign(
+            _estado=districts_df[entity_col].astype(str).str.strip().str.upper()
+        )
+        shape = states.groupby('_estado').agg(_circuitos=(circuit_id_col, 'nunique'),
+                                              _distritos=(district_id_col, 'nunique'))
+        state_table = states.drop_duplicates('_estado').join(shape, on='_estado')
+        # Como object para que los ids enteros no pasen a float (2 -> 2.0) al enmascarar
+        for target, source in target_cols.items():
+            if target in ('distrito_judicial', 'nombre_distrito'):
+                state_table[source] = state_table[source].astype(object).mask(state_table['_distritos'] > 1, None)
+            elif target == 'circuito_judicial':
+                state_table[source] = state_table[source].astype(object).mask(state_table['_circuitos'] > 1, None)
+        pending = keys[~keys['_row'].isin(exact['_row']) & keys['nombreEstado'].notna()]
+        left = pd.DataFrame({
+            '_row': pending['_row'],
+            '_estado': pending['nombreEstado'].astype(str).str.strip().str.upper(),
+        })
+        by_state = left.merge(state_table, on='_estado', how='inner')
+        by_state['tipo_asociacion'] = 'estado'
+        
+        # Escribir los resultados por posición
+        matches = pd.concat([exact, by_state], ignore_index=True)
+        rows = matches['_row'].to_numpy()
+        for target, source in target_cols.items():
+            result_df.iloc[rows, result_df.columns.get_loc(target)] = matches[source].to_numpy()
+        result_df.iloc[rows, result_df.columns.get_loc('tipo_asociacion')] = matches['tipo_asociacion'].to_numpy()
+        
+        logger.info(f"Asociación completada. Coincidencias exitosas: {len(matches)}/{len(result_df)} "
+                    f"(circuito/distrito: {len(exact)}, estado: {len(by_state)})")
         return result_df
     
     except Exception as e:
@@ -283,10 +311,8 @@ def create_geojson_with_candidates(candidates_with_districts):
             logger.error(f"No se encontró el shapefile: {shp_path}")
             return None
         
-        gdf = gpd.read_file(shp_path)
-        
-        # Normalizar nombres de columnas
-        gdf.columns = [col.lower() for col in gdf.columns]
+        # La caché GeoParquet ya tiene las columnas en minúsculas
+        gdf = read_geodataframe(shp_path)
         
         # Mapeo de columnas
         district_id_cols = ['distrito_j', 'distrito_judicial', 'dist_jud']
@@ -354,7 +380,8 @@ def main():
         return
     
     # Asociar candidatos con distritos
-    candidates_with_districts = associate_candidates_with_districts(candidates_df, districts_df, raw_candidates)
+    with timer("step_seconds", "Duración de cada paso de la etapa", step="associate"):
+        candidates_with_districts = associate_candidates_with_districts(candidates_df, districts_df, raw_candidates)
     if candidates_with_districts is None:
         logger.error("No se pudieron asociar candidatos con distritos")
         return
@@ -363,10 +390,26 @@ def main():
     output_path = os.path.join(RESULT_DIR, "candidatos_con_distritos.csv")
     candidates_with_districts.to_csv(output_path, index=False)
     logger.info(f"Candidatos con distritos guardados en: {output_path}")
+    if 'folio' in candidates_with_districts.columns:
+        with CandidateStore(STORE_PATH) as store:
+            store.upsert_districts(candidates_with_districts.to_dict('records'))
     
     # Crear tabla de búsqueda
     lookup_df = create_lookup_table(candidates_with_districts)
     
     # Crear GeoJSON con candidatos
+    geojson_path = create_geojson_with_candidates(candidates_with_districts)
     
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+    rows = counter("rows_processed_total", "Filas procesadas por la etapa")
+    for tipo, count in candidates_with_districts['tipo_asociacion'].value_counts().items():
+        rows.inc(int(count), kind="candidates", status=tipo)
+    export_metrics("associate")
+    logger.info("Proceso de asociación completado")
+    if lookup_df is not None:
+        logger.info(f"Distritos con candidatos: {len(lookup_df)}")
+    if geojson_path:
+        logger.info(f"GeoJSON: {geojson_path}")
+
+if __name__ == "__main__":
+    with profile_from_argv("associate"):
+        main()
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de extremo a extremo de las etapas del pipeline sobre datos sintéticos.
+Para cada tamaño de conjunto de datos genera candidatos con synthetic_data.py, levanta
+los servidores de mock_servers.py y mide tiempo (varias repeticiones) y memoria pico
+(tracemalloc, en una corrida aparte) de cada etapa. Los resultados se guardan en JSON
+para compararlos entre commits con --compare.
+
+Uso:
+    python benchmarks.py --sizes 1000,10000 --output bench_main.json
+    python benchmarks.py --sizes 1000,10000 --compare bench_main.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import synthetic_data
+from mock_servers import MockConfig, fake_scoring, start_servers
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [1000, 5000]
+# Las etapas con red o PDFs solo corren hasta este tamaño (o el que indique --io-max-size)
+IO_MAX_SIZE = 5000
+# Número máximo de llamadas al servidor simulado en el benchmark de scoring
+ROUNDTRIP_LIMIT = 300
+ROUNDTRIP_BENCHMARKS = {"score_candidate_with_retries", "score_all_async", "score_all_batched"}
+BENCH_BATCH_SIZE = 5
+REGRESSION_THRESHOLD = 0.15
+
+BENCHMARKS = {}
+
+
+def benchmark(name, io_bound=False):
+    """
+    Registra un benchmark. La función recibe (contexto, tamaño) y regresa (run, reset):
+    run es lo que se mide y reset (opcional) restaura el estado antes de cada repetición.
+    """
+    def register(setup):
+        BENCHMARKS[name] = {"setup": setup, "io": io_bound}
+        return setup
+    return register
+
+
+class Dataset:
+    """Datos sintéticos de un tamaño, con los registros ya cargados en memoria."""
+
+    def __init__(self, size, root, documents, seed=0):
+        self.size = size
+        self.dir = os.path.join(root, f"data_{size}")
+        synthetic_data.generate(size, self.dir, seed=seed, documents=documents)
+        json_dir = os.path.join(self.dir, "cycc", "documentos", "json")
+        self.raw = []
+        for category, (filename, _, _, _) in synthetic_data.CATEGORIES.items():
+            with open(os.path.join(json_dir, filename), "r", encoding="utf-8") as f:
+                for candidate in json.load(f)["candidatos"]:
+                    candidate["categoria"] = category
+                    self.raw.append(candidate)
+        self.cv_dir = os.path.join(self.dir, "cycc", "documentos", "cv")
+        self.profiles_dir = os.path.join(self.dir, "candidato")
+        self.lookup_path = os.path.join(self.dir, "distritos_judiciales", "output", "distritos_judiciales_lookup.csv")
+        self._normalized = None
+
+    @property
+    def normalized(self):
+        if self._normalized is None:
+            from extract_candidates import normalize_candidates
+            with contextlib.redirect_stdout(io.StringIO()):
+                self._normalized = normalize_candidates(self.raw)
+        return self._normalized
+
+    def scored_entries(self):
+        """Entradas de scoring como las del journal (una de cada 20 con respuesta en texto crudo)."""
+        entries = []
+        for index, candidate in enumerate(self.raw):
+            scoring = fake_scoring(str(candidate["idCandidato"]))
+            if index % 20 == 0:
+                scoring = {"raw_response": "```json\n" + json.dumps(scoring, ensure_ascii=False) + "\n```"}
+            entries.append({"folio": candidate["idCandidato"], "nombre": candidate["nombreCandidato"],
+                            "scoring": scoring})
+        return entries
+
+
+@benchmark("normalize_candidates")
+def bench_normalize(ctx, size):
+    from extract_candidates import normalize_candidates
+    raw = ctx.dataset(size).raw
+    return (lambda: normalize_candidates(raw)), None
+
+
+@benchmark("download_documents", io_bound=True)
+def bench_download(ctx, size):
+    import download_profiles
+    candidates = [{"folio": str(c["idCandidato"]), "cv_file": c["descripcionHLC"], "url_perfil": ""}
+                  for c in ctx.dataset(size).raw]
+
+    def reset():
+        shutil.rmtree(download_profiles.OUTPUT_DIR, ignore_errors=True)
+        for path in (download_profiles.DOCUMENTS_DIR, download_profiles.PHOTOS_DIR, download_profiles.TMP_DIR):
+            os.makedirs(path, exist_ok=True)
+
+    def run():
+        results, summary = asyncio.run(download_profiles.process_candidates(candidates, concurrency=64, per_host=64))
+        if summary["errores"]:
+            raise RuntimeError(f"{summary['errores']} descargas fallaron")
+        return results
+    return run, reset
+
+
+@benchmark("convert_pdfs", io_bound=True)
+def bench_convert(ctx, size):
+    import convert_pdfs_to_text
+    dataset = ctx.dataset(size)
+    text_dir = os.path.join(ctx.workdir, f"texts_{size}")
+    convert_pdfs_to_text.PDF_DIR = dataset.cv_dir
+    convert_pdfs_to_text.TEXT_DIR = text_dir
+    convert_pdfs_to_text.INDEX_PATH = os.path.join(text_dir, ".conversion_index.json")
+    convert_pdfs_to_text.REPORT_PATH = os.path.join(text_dir, "conversion_report.csv")
+
+    def reset():
+        shutil.rmtree(text_dir, ignore_errors=True)
+
+    def run():
+        results = convert_pdfs_to_text.convert_all(force=True)
+        errors = [r for r in results if r["status"] == "error"]
+        if errors:
+            raise RuntimeError(f"{len(errors)} PDFs fallaron: {errors[0]['error']}")
+        return results
+    return run, reset
+
+
+@benchmark("parse_profiles_html", io_bound=True)
+def bench_parse_profiles(ctx, size):
+    import parse_profiles_html
+    dataset = ctx.dataset(size)
+    # Misma estructura que download_profiles.py: {folio}_profile.html en un directorio
+    profiles_dir = os.path.join(ctx.workdir, f"profiles_{size}")
+    if not os.path.isdir(profiles_dir):
+        os.makedirs(profiles_dir)
+        for folio in os.listdir(dataset.profiles_dir):
+            shutil.copyfile(os.path.join(dataset.profiles_dir, folio, "index.html"),
+                            os.path.join(profiles_dir, folio + parse_profiles_html.PROFILE_SUFFIX))
+    paths = parse_profiles_html.profile_paths(profiles_dir)
+
+    def run():
+        rows, errors = parse_profiles_html.parse_all(paths)
+        if errors:
+            raise RuntimeError(f"{len(errors)} perfiles fallaron: {errors[0][1]}")
+        return rows
+    return run, None
+
+
+@benchmark("parse_and_validate_scoring")
+def bench_parse(ctx, size):
+    from score_candidates_llm import is_valid_scoring, parse_scoring
+    responses = [entry["scoring"] for entry in ctx.dataset(size).scored_entries()]
+    return (lambda: sum(is_valid_scoring(parse_scoring(dict(r))) for r in responses)), None
+
+
+@benchmark("score_candidate_with_retries", io_bound=True)
+def bench_score_roundtrip(ctx, size):
+    from score_candidates_llm import score_candidate_with_retries
+    candidates = ctx.dataset(size).raw[:ROUNDTRIP_LIMIT]
+    return (lambda: [score_candidate_with_retries(candidate) for candidate in candidates]), None
+
+
+def bench_score_all(ctx, size, batch_size):
+    import score_candidates_llm as scoring
+    candidates = ctx.dataset(size).raw[:ROUNDTRIP_LIMIT]
+
+    def run():
+        # Cliente nuevo por corrida: sus conexiones pertenecen al event loop de asyncio.run
+        scoring.async_client = scoring.AsyncOpenAI(base_url=os.environ["OPENROUTER_BASE_URL"],
+                                                   api_key=os.environ["OPENROUTER_API_KEY"], max_retries=0)
+        # Límites holgados: se mide el costo por petición, no el rate limiting
+        limits = scoring.ScoringLimits(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+        return asyncio.run(scoring.score_all(candidates, limits, batch_size=batch_size))
+    return run, None
+
+
+@benchmark("score_all_async", io_bound=True)
+def bench_score_async(ctx, size):
+    return bench_score_all(ctx, size, 1)
+
+
+@benchmark("score_all_batched", io_bound=True)
+def bench_score_batched(ctx, size):
+    return bench_score_all(ctx, size, BENCH_BATCH_SIZE)
+
+
+@benchmark("save_results_csv")
+def bench_save_csv(ctx, size):
+    from score_candidates_llm import save_results_csv
+    entries = ctx.dataset(size).scored_entries()
+    path = os.path.join(ctx.workdir, f"scored_{size}.csv")
+    return (lambda: save_results_csv(entries, path, log_path=path + ".log")), None
+
+
+@benchmark("join_candidates_scores")
+def bench_join(ctx, size):
+    import pandas as pd
+    import join_candidates_scores
+    from artifacts import write_records, write_table
+    from score_candidates_llm import save_results_csv
+    dataset = ctx.dataset(size)
+    base = os.path.join(ctx.workdir, f"join_{size}")
+    os.makedirs(base, exist_ok=True)
+    join_candidates_scores.SCORES_CSV = os.path.join(base, "candidates_scored_2.csv")
+    join_candidates_scores.ALL_CANDIDATES_JSON = os.path.join(base, "all_candidates.json")
+    join_candidates_scores.CANDIDATES_CSV = os.path.join(base, "candidates.csv")
+    join_candidates_scores.OUTPUT_CSV = os.path.join(base, "candidates_scored_full_2.csv")
+    join_candidates_scores.DEFAULT_STORE_PATH = os.path.join(base, "candidates.sqlite")
+    rows = save_results_csv(dataset.scored_entries(), join_candidates_scores.SCORES_CSV)
+    write_table(pd.DataFrame(rows), join_candidates_scores.SCORES_CSV)
+    with open(join_candidates_scores.ALL_CANDIDATES_JSON, "w", encoding="utf-8") as f:
+        f.write(json.dumps(dataset.raw, ensure_ascii=False))
+    write_records(dataset.raw, join_candidates_scores.ALL_CANDIDATES_JSON)
+    write_table(pd.DataFrame(dataset.normalized), join_candidates_scores.CANDIDATES_CSV)
+    return join_candidates_scores.main, None
+
+
+@benchmark("artifacts_roundtrip")
+def bench_artifacts_roundtrip(ctx, size):
+    import pandas as pd
+    from artifacts import read_table, write_records
+    # Uno de cada diez candidatos sin distrito: los ids deben volver como enteros, no como 2.0
+    records = [dict(c) for c in ctx.dataset(size).raw]
+    for record in records[::10]:
+        record.pop("idDistritoJudicial", None)
+    path = os.path.join(ctx.workdir, f"roundtrip_{size}.json")
+    expected = [str(r["idDistritoJudicial"]) if "idDistritoJudicial" in r else None for r in records]
+
+    def run():
+        write_records(records, path)
+        values = read_table(path, columns=["idDistritoJudicial"])["idDistritoJudicial"]
+        found = [None if pd.isna(v) else str(v) for v in values]
+        if found != expected:
+            raise RuntimeError("los ids enteros con faltantes no sobrevivieron la ida y vuelta a Parquet")
+        return found
+    return run, None
+
+
+@benchmark("associate_candidates_with_districts")
+def bench_associate(ctx, size):
+    import pandas as pd
+    from associate_candidates import associate_candidates_with_districts
+    dataset = ctx.dataset(size)
+    candidates_df = pd.DataFrame(dataset.normalized)
+    districts_df = pd.read_csv(dataset.lookup_path)
+    raw_by_folio = {str(c["idCandidato"]): c for c in dataset.raw}
+
+    def run():
+        result = associate_candidates_with_districts(candidates_df, districts_df.copy(), raw_by_folio)
+        if result is None:
+            raise RuntimeError("la asociación no regresó resultados")
+        return result
+    return run, None
+
+
+@benchmark("district_point_lookup")
+def bench_point_lookup(ctx, size):
+    import numpy as np
+    import pandas as pd
+    import shapely
+    from district_lookup import DistrictIndex
+    # Cuadrícula de 32 estados x 12 distritos sobre el territorio nacional y puntos al azar
+    columns, rows = len(synthetic_data.ESTADOS), 12
+    west, south, width, height = -117.0, 14.5, 30.0 / columns, 18.0 / rows
+    cells = [(column, row) for column in range(columns) for row in range(rows)]
+    geometries = [shapely.box(west + c * width, south + r * height, west + (c + 1) * width, south + (r + 1) * height)
+                  for c, r in cells]
+    attributes = pd.DataFrame({"distrito_judicial": [r + 1 for _, r in cells],
+                               "circuito_judicial": [c + 1 for c, _ in cells],
+                               "entidad_distrito": [synthetic_data.ESTADOS[c] for c, _ in cells]})
+    index = DistrictIndex(geometries, attributes)
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(west, west + 30.0, size)
+    lats = rng.uniform(south, south + 18.0, size)
+
+    def run():
+        positions = index.lookup_many(lons, lats)
+        if (positions < 0).any():
+            raise RuntimeError("puntos sin distrito")
+        return positions
+    return run, None
+
+
+@benchmark("section_lookup")
+def bench_section_lookup(ctx, size):
+    import random
+    from district_lookup import SectionIndex
+    dataset = ctx.dataset(size)
+    with open(os.path.join(dataset.dir, "cycc", "documentos", "json", "catalogoEstadosSecciones.json"),
+              "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    rng = random.Random(0)
+    estados = [rng.choice(synthetic_data.ESTADOS) for _ in range(size)]
+    secciones = [rng.randint(1, synthetic_data.SECTIONS_PER_STATE) for _ in range(size)]
+
+    def run():
+        found = SectionIndex(catalog).lookup_many(estados, secciones)
+        if found["distrito_judicial"].isna().any():
+            raise RuntimeError("secciones sin distrito")
+        return found
+    return run, None
+
+
+class BenchmarkContext:
+    """Directorio de trabajo temporal, conjuntos de datos por tamaño y servidores simulados."""
+
+    def __init__(self, workdir, needs_documents):
+        self.workdir = workdir
+        self.needs_documents = needs_documents
+        self._datasets = {}
+        self.servers = None
+
+    def dataset(self, size):
+        if size not in self._datasets:
+            self._datasets[size] = Dataset(size, self.workdir, self.needs_documents(size))
+        return self._datasets[size]
+
+    def start_servers(self, data_dir):
+        """Servidores simulados (sin latencia ni errores) y variables de entorno para las etapas."""
+        if self.servers:
+            for server in self.servers:
+                server.shutdown()
+        ine, llm, env = start_servers(data_dir, ine_port=0, llm_port=0, ine_config=MockConfig(), llm_config=MockConfig())
+        self.servers = (ine, llm)
+        os.environ.update(env)
+        # Los módulos leen las URLs base al importarse: actualizarlas si ya están cargados
+        if "download_profiles" in sys.modules:
+            sys.modules["download_profiles"].BASE_URL = env["INE_BASE_URL"] + "/"
+        if "score_candidates_llm" in sys.modules:
+            module = sys.modules["score_candidates_llm"]
+            module.client = module.OpenAI(base_url=env["OPENROUTER_BASE_URL"], api_key=env["OPENROUTER_API_KEY"])
+            module.async_client = module.AsyncOpenAI(base_url=env["OPENROUTER_BASE_URL"],
+                                                     api_key=env["OPENROUTER_API_KEY"], max_retries=0)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silencia los mensajes de progreso de las etapas durante las mediciones."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def measure(run, reset, repeat):
+    """Tiempos de `repeat` corridas y memoria pico de una corrida extra bajo tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        if reset:
+            reset()
+        with quiet():
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        with quiet():
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names, sizes, repeat=3, io_max_size=IO_MAX_SIZE, keep_workdir=False):
+    """Corre los benchmarks pedidos en un directorio temporal y regresa el reporte."""
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="pjmx_bench_")
+    needs_io = any(BENCHMARKS[name]["io"] for name in names)
+    ctx = BenchmarkContext(workdir, lambda size: needs_io and size <= io_max_size)
+    results = []
+    # Los módulos del pipeline usan rutas relativas al directorio actual
+    os.chdir(workdir)
+    try:
+        for size in sizes:
+            print(f"Generando {size} candidatos sintéticos...", flush=True)
+            dataset = ctx.dataset(size)
+            ctx.start_servers(dataset.dir)
+            for name in names:
+                entry = {"benchmark": name, "tamano": size}
+                if BENCHMARKS[name]["io"] and size > io_max_size:
+                    entry["omitido"] = f"tamaño mayor que --io-max-size ({io_max_size})"
+                    results.append(entry)
+                    continue
+                try:
+                    run, reset = BENCHMARKS[name]["setup"](ctx, size)
+                    times, peak = measure(run, reset, repeat)
+                except Exception as e:
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                    print(f"  {name:<38} error: {entry['error']}", flush=True)
+                    results.append(entry)
+                    continue
+                items = min(size, ROUNDTRIP_LIMIT) if name in ROUNDTRIP_BENCHMARKS else size
+                median = statistics.median(times)
+                entry.update({
+                    "elementos": items,
+                    "repeticiones": repeat,
+                    "segundos": [round(t, 6) for t in times],
+                    "segundos_min": round(min(times), 6),
+                    "segundos_mediana": round(median, 6),
+                    "elementos_por_segundo": round(items / median, 1) if median else None,
+                    "memoria_pico_mb": round(peak / 1e6, 3),
+                })
+                results.append(entry)
+                print(f"  {name:<38} n={size:<7} {median:9.4f} s  {entry['memoria_pico_mb']:9.2f} MB", flush=True)
+    finally:
+        os.chdir(original_cwd)
+        if ctx.servers:
+            for server in ctx.servers:
+                server.shutdown()
+        if not keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeticiones": repeat,
+        },
+        "resultados": results,
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Compara medianas contra un reporte anterior; regresa la lista de regresiones."""
+    previous = {(r["benchmark"], r["tamano"]): r for r in baseline["resultados"] if "segundos_mediana" in r}
+    regressions = []
+    print(f"\nComparación contra {baseline['meta'].get('commit')} (umbral {threshold:.0%}):")
+    for result in report["resultados"]:
+        old = previous.get((result["benchmark"], result["tamano"]))
+        if not old or "segundos_mediana" not in result:
+            continue
+        ratio = result["segundos_mediana"] / old["segundos_mediana"] if old["segundos_mediana"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESIÓN"
+            regressions.append({"benchmark": result["benchmark"], "tamano": result["tamano"], "razon": round(ratio, 3)})
+        print(f"  {result['benchmark']:<38} n={result['tamano']:<7} {old['segundos_mediana']:9.4f} s -> "
+              f"{result['segundos_mediana']:9.4f} s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks de las etapas del pipeline con datos sintéticos")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Tamaños de conjunto de datos separados por coma")
+    parser.add_argument("--only", default=None, help="Benchmarks a correr separados por coma (por defecto todos)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones medidas por benchmark")
+    parser.add_argument("--io-max-size", type=int, default=IO_MAX_SIZE,
+                        help="Tamaño máximo para benchmarks con red o PDFs")
+    parser.add_argument("--output", default="benchmark_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", default=None, help="Reporte anterior contra el cual comparar")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Aumento relativo de la mediana que cuenta como regresión")
+    parser.add_argument("--keep-workdir", action="store_true", help="No borrar el directorio temporal")
+    parser.add_argument("--list", action="store_true", help="Listar los benchmarks disponibles")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for name, spec in BENCHMARKS.items():
+            print(f"{name}{' (red/PDF)' if spec['io'] else ''}")
+        return
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Benchmarks desconocidos: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    output = os.path.abspath(args.output)
+    report = run_benchmarks(names, sizes, args.repeat, args.io_max_size, args.keep_workdir)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regresiones"] = compare(report, baseline, args.threshold)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if report["regresiones"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Pool de navegador (Playwright) para capturar páginas de perfil en lote.
+Un solo Chromium con varios contextos aislados (cookies y caché separadas) que trabajan
+en paralelo; cada contexto reutiliza su página entre candidatos y se recicla cada cierto
+número de páginas o tras un error. Las peticiones a imágenes, fuentes, medios y
+analítica se abortan antes de salir a la red.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from playwright.async_api import async_playwright
+
+DEFAULT_BROWSERS = 4
+# Páginas por contexto antes de recrearlo (evita que crezca la memoria del navegador)
+PAGES_PER_CONTEXT = 200
+NAVIGATION_TIMEOUT_MS = 30000
+READY_TIMEOUT_MS = 10000
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net",
+    "connect.facebook.net", "hotjar.com", "clarity.ms", "newrelic.com", "nr-data.net",
+)
+
+
+def should_block(resource_type, url):
+    """True si la petición es de un tipo pesado o va a un dominio de analítica."""
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlsplit(url).hostname or ""
+    return any(host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_HOSTS)
+
+
+class BrowserPool:
+    """
+    Uso:
+        async with BrowserPool(size=4) as pool:
+            async with pool.page() as page:
+                await page.goto(url)
+    """
+
+    def __init__(self, size=DEFAULT_BROWSERS, block_resources=True, headless=True,
+                 pages_per_context=PAGES_PER_CONTEXT):
+        self.size = size
+        self.block_resources = block_resources
+        self.headless = headless
+        self.pages_per_context = pages_per_context
+        self.blocked = {}
+        self._playwright = None
+        self._browser = None
+        self._slots = asyncio.Queue()
+        self._contexts = set()
+
+    async def __aenter__(self):
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        # Los contextos se crean al primer uso de cada lugar del pool
+        for _ in range(self.size):
+            self._slots.put_nowait([None, None, 0])
+        return self
+
+    async def __aexit__(self, *exc):
+        for context in list(self._contexts):
+            await self._close_context(context)
+        await self._browser.close()
+        await self._playwright.stop()
+
+    async def _route(self, route):
+        request = route.request
+        if should_block(request.resource_type, request.url):
+            self.blocked[request.resource_type] = self.blocked.get(request.resource_type, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_slot(self):
+        """Contexto nuevo con su página; regresa [contexto, página, páginas usadas]."""
+        context = await self._browser.new_context(service_workers="block")
+        context.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+        if self.block_resources:
+            await context.route("**/*", self._route)
+        self._contexts.add(context)
+        return [context, await context.new_page(), 0]
+
+    async def _close_context(self, context):
+        self._contexts.discard(context)
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        """Presta una página de un contexto libre; se espera si todos están ocupados."""
+        slot = await self._slots.get()
+        failed = False
+        try:
+            if slot[0] is None:
+                slot = await self._new_slot()
+            yield slot[1]
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            slot[2] += 1
+            if slot[0] is not None and (failed or slot[1].is_closed() or slot[2] >= self.pages_per_context):
+                # El contexto se recrea en el siguiente préstamo
+                await self._close_context(slot[0])
+                slot = [None, None, 0]
+            self._slots.put_nowait(slot)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Almacén local (SQLite) de candidatos compartido por todas las etapas del pipeline.
+Guarda candidatos crudos y normalizados, documentos, textos de CV, scores y distritos,
+indexados por folio (idCandidato) y categoría.
+"""
+
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_STORE_PATH = "extract_candidates_output/candidates.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_candidates (
+    folio TEXT PRIMARY KEY,
+    categoria TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_raw_categoria ON raw_candidates(categoria);
+
+CREATE TABLE IF NOT EXISTS normalized_candidates (
+    folio TEXT PRIMARY KEY,
+    categoria TEXT,
+    nombre TEXT,
+    primer_apellido TEXT,
+    segundo_apellido TEXT,
+    genero TEXT,
+    puesto TEXT,
+    url_perfil TEXT,
+    id_tipo_candidatura TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_normalized_categoria ON normalized_candidates(categoria);
+
+CREATE TABLE IF NOT EXISTS documents (
+    folio TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT,
+    path TEXT,
+    sha256 TEXT,
+    bytes INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (folio, kind)
+);
+
+CREATE TABLE IF NOT EXISTS texts (
+    folio TEXT PRIMARY KEY,
+    path TEXT,
+    source_sha256 TEXT,
+    pages INTEGER,
+    chars INTEGER,
+    truncated INTEGER,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scores (
+    folio TEXT PRIMARY KEY,
+    nombre TEXT,
+    status TEXT,
+    scoring TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS districts (
+    folio TEXT PRIMARY KEY,
+    distrito_judicial TEXT,
+    circuito_judicial TEXT,
+    nombre_distrito TEXT,
+    entidad_distrito TEXT,
+    tipo_asociacion TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+NORMALIZED_COLUMNS = ["categoria", "nombre", "primer_apellido", "segundo_apellido", "genero", "puesto", "url_perfil"]
+
+
+def _text(value):
+    # NaN (p. ej. de pandas) se guarda como NULL
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+class CandidateStore:
+    """API mínima de lectura y upsert sobre el almacén de candidatos."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _upsert(self, table, key_cols, rows):
+        """INSERT ... ON CONFLICT DO UPDATE para una lista de dicts con las mismas llaves."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        now = time.time()
+        cols = list(rows[0].keys()) + ["updated_at"]
+        updates = ", ".join(f"{col} = excluded.{col}" for col in cols if col not in key_cols)
+        sql = (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+               f"ON CONFLICT ({', '.join(key_cols)}) DO UPDATE SET {updates}")
+        with self._conn:
+            self._conn.executemany(sql, ([row[col] for col in cols[:-1]] + [now] for row in rows))
+        return len(rows)
+
+    # Escritura
+    def upsert_raw(self, candidates):
+        """Candidatos crudos tal como vienen de los endpoints del INE (con 'categoria')."""
+        return self._upsert("raw_candidates", ["folio"], (
+            {"folio": str(c["idCandidato"]), "categoria": c.get("categoria"),
+             "data": json.dumps(c, ensure_ascii=False)}
+            for c in candidates if isinstance(c, dict) and c.get("idCandidato") is not None
+        ))
+
+    def upsert_normalized(self, candidates):
+        return self._upsert("normalized_candidates", ["folio"], (
+            dict({col: _text(c.get(col)) for col in NORMALIZED_COLUMNS},
+                 folio=str(c["folio"]), id_tipo_candidatura=_text(c.get("idTipoCandidatura")),
+                 data=json.dumps(c, ensure_ascii=False))
+            for c in candidates if c.get("folio")
+        ))
+
+    def upsert_documents(self, documents):
+        """documents: dicts con folio, kind ('photo'/'cv'), url, path, sha256 y bytes."""
+        return self._upsert("documents", ["folio", "kind"], (
+            {"folio": str(d["folio"]), "kind": d["kind"], "url": d.get("url"), "path": d.get("path"),
+             "sha256": d.get("sha256"), "bytes": d.get("bytes")}
+            for d in documents
+        ))
+
+    def upsert_texts(self, texts):
+        """texts: dicts con folio, path, source_sha256, pages, chars y truncated."""
+        return self._upsert("texts", ["folio"], (
+            {"folio": str(t["folio"]), "path": t.get("path"), "source_sha256": t.get("source_sha256"),
+             "pages": t.get("pages"), "chars": t.get("chars"), "truncated": int(bool(t.get("truncated")))}
+            for t in texts
+        ))
+
+    def upsert_scores(self, entries, status_for=None):
+        """entries: resultados de scoring {folio, nombre, scoring}; status_for(scoring) -> 'OK'/'ERROR'."""
+        return self._upsert("scores", ["folio"], (
+            {"folio": str(e["folio"]), "nombre": e.get("nombre"),
+             "status": status_for(e["scoring"]) if status_for else None,
+             "scoring": json.dumps(e["scoring"], ensure_ascii=False)}
+            for e in entries
+        ))
+
+    def upsert_districts(self, rows):
+        cols = ["distrito_judicial", "circuito_judicial", "nombre_distrito", "entidad_distrito", "tipo_asociacion"]
+        return self._upsert("districts", ["folio"], (
+            dict({col: _text(row.get(col)) for col in cols}, folio=str(row["folio"]))
+            for row in rows if row.get("folio") is not None
+        ))
+
+    def delete_candidates(self, folios):
+        """Elimina a los candidatos indicados de todas las tablas (p. ej. folios dados de baja)."""
+        folios = [(str(folio),) for folio in folios]
+        with self._conn:
+            for table in ("raw_candidates", "normalized_candidates", "documents", "texts", "scores", "districts"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE folio = ?", folios)
+        return len(folios)
+
+    # Lectura
+    def count(self, table):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def raw_candidates(self, categories=None):
+        """Lista de candidatos crudos, opcionalmente filtrados por categoría."""
+        sql = "SELECT data FROM raw_candidates"
+        params = []
+        if categories:
+            sql += f" WHERE categoria IN ({', '.join('?' for _ in categories)})"
+            params = list(categories)
+        return [json.loads(row["data"]) for row in self._conn.execute(sql + " ORDER BY rowid", params)]
+
+    def raw_by_folio(self, categories=None):
+        """Dict folio -> candidato crudo."""
+        return {str(c["idCandidato"]): c for c in self.raw_candidates(categories)}
+
+    def get_raw(self, folio):
+        row = self._conn.execute("SELECT data FROM raw_candidates WHERE folio = ?", (str(folio),)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def normalized_candidates(self, categories=None):
+        sql = "SELECT data FROM normalized_candidates"
+        params = []
+        if categories:
+            sql += f" WHERE categoria IN ({', '.join('?' for _ in categories)})"
+            params = list(categories)
+        return [json.loads(row["data"]) for row in self._conn.execute(sql + " ORDER BY rowid", params)]
+
+    def profile_urls(self):
+        """Dict folio -> url_perfil de los candidatos normalizados."""
+        return {row["folio"]: row["url_perfil"] or ""
+                for row in self._conn.execute("SELECT folio, url_perfil FROM normalized_candidates")}
+
+    def documents(self, folio=None):
+        sql = "SELECT folio, kind, url, path, sha256, bytes FROM documents"
+        params = ()
+        if folio is not None:
+            sql += " WHERE folio = ?"
+            params = (str(folio),)
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def scores(self):
+        """Dict folio -> {folio, nombre, scoring}."""
+        return {row["folio"]: {"folio": row["folio"], "nombre": row["nombre"], "scoring": json.loads(row["scoring"])}
+                for row in self._conn.execute("SELECT folio, nombre, scoring FROM scores")}
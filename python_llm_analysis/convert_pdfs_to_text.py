@@ -1,21 +1,261 @@
+#!/usr/bin/env python3
+"""
+Script para convertir los CVs en PDF a texto plano.
+La conversión corre en un pool de procesos y es incremental: se omiten los PDFs
+cuyo texto es más reciente que el PDF o cuyo contenido (sha256) no cambió.
+Opcionalmente se detiene al alcanzar un presupuesto de caracteres o páginas, y junto a
+cada .txt se guarda un índice por página ({nombre}.pages.json) con offsets en bytes.
+"""
+
 import os
+import csv
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import fitz  # PyMuPDF
+from candidate_store import CandidateStore
+from delta_manifest import affected_folios, load_delta
+from metrics import counter, export as export_metrics, histogram
+from profiling import add_profile_arguments, profile_from_argv
 
 PDF_DIR = 'download_profiles_output/documents'
 TEXT_DIR = 'download_profiles_output/texts'
-os.makedirs(TEXT_DIR, exist_ok=True)
+INDEX_PATH = os.path.join(TEXT_DIR, '.conversion_index.json')
+REPORT_PATH = os.path.join(TEXT_DIR, 'conversion_report.csv')
+STORE_PATH = 'extract_candidates_output/candidates.sqlite'
+
+# Campos crudos que afectan al CV (para el modo --delta)
+CV_FIELDS = ["descripcionHLC"]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_path_for(filename):
+    return os.path.join(TEXT_DIR, os.path.splitext(filename)[0] + '.txt')
+
+
+def page_index_path(text_path):
+    return os.path.splitext(text_path)[0] + '.pages.json'
+
+
+def extract_pages(doc, max_chars=None, max_pages=None):
+    """
+    Extrae el texto página por página y se detiene al alcanzar el presupuesto.
+    Regresa (bytes UTF-8 del texto, lista de páginas con offsets en bytes).
+    """
+    chunks = []
+    pages = []
+    offset = 0
+    chars = 0
+    for number in range(doc.page_count):
+        if max_pages is not None and number >= max_pages:
+            break
+        if max_chars is not None and chars >= max_chars:
+            break
+        data = doc.load_page(number).get_text().encode('utf-8')
+        chunks.append(data)
+        page_chars = len(data.decode('utf-8'))
+        pages.append({"page": number + 1, "start": offset, "end": offset + len(data), "chars": page_chars})
+        offset += len(data)
+        chars += page_chars
+    return b''.join(chunks), pages
+
+
+def convert_pdf(pdf_path, text_path, previous=None, max_chars=None, max_pages=None):
+    """
+    Convierte un PDF a texto (se ejecuta en un proceso del pool).
+    previous es la entrada del índice de la corrida anterior. Regresa un dict con el
+    resultado, tiempos y hash del PDF.
+    """
+    started = time.perf_counter()
+    result = {"file": os.path.basename(pdf_path), "status": "converted", "pages": 0, "chars": 0,
+              "seconds": 0.0, "sha256": None, "truncated": False, "error": ""}
+    budget = {"max_chars": max_chars, "max_pages": max_pages}
+    try:
+        result["sha256"] = file_sha256(pdf_path)
+        if (previous and previous.get("sha256") == result["sha256"] and previous.get("budget") == budget
+                and os.path.exists(text_path)):
+            # Mismo contenido y presupuesto: solo actualizar la fecha del texto para la próxima corrida
+            os.utime(text_path)
+            result["status"] = "unchanged"
+        else:
+            with fitz.open(pdf_path) as doc:
+                data, pages = extract_pages(doc, max_chars, max_pages)
+                total_pages = doc.page_count
+            tmp_path = text_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, text_path)
+            page_index = {
+                "source_sha256": result["sha256"],
+                "total_pages": total_pages,
+                "extracted_pages": len(pages),
+                "truncated": len(pages) < total_pages,
+                "budget": budget,
+                "pages": pages,
+            }
+            index_path = page_index_path(text_path)
+            with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(page_index, f)
+            os.replace(index_path + '.tmp', index_path)
+            result["pages"] = len(pages)
+            result["chars"] = sum(page["chars"] for page in pages)
+            result["truncated"] = page_index["truncated"]
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def load_index():
+    if os.path.exists(INDEX_PATH):
+        with open(INDEX_PATH, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        # Índices anteriores guardaban solo el sha256 del PDF
+        return {name: entry if isinstance(entry, dict) else {"sha256": entry, "budget": None}
+                for name, entry in index.items()}
+    return {}
 
-for filename in os.listdir(PDF_DIR):
-    if filename.lower().endswith('.pdf'):
+
+def save_index(index):
+    tmp_path = INDEX_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, sort_keys=True)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+def save_report(results):
+    fieldnames = ["file", "status", "pages", "chars", "seconds", "sha256", "truncated", "error"]
+    with open(REPORT_PATH, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in sorted(results, key=lambda r: r["file"]):
+            writer.writerow(result)
+
+
+def remove_texts(folios):
+    """
+    Borra los textos e índices por página de los candidatos eliminados (modo delta) y sus
+    entradas del índice de conversión. Regresa el número de archivos borrados.
+    """
+    folios = {str(folio) for folio in folios}
+    index = load_index()
+    names = [name for name in index if name.rsplit('_cv', 1)[0] in folios]
+    removed = 0
+    for name in names:
+        text_path = text_path_for(name)
+        for path in (text_path, page_index_path(text_path)):
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        del index[name]
+    # Textos sin entrada en el índice (p. ej. de una conversión interrumpida)
+    if os.path.isdir(TEXT_DIR):
+        for name in os.listdir(TEXT_DIR):
+            if name.endswith('.txt') and name.rsplit('_cv', 1)[0] in folios:
+                os.remove(os.path.join(TEXT_DIR, name))
+                removed += 1
+                pages_path = page_index_path(os.path.join(TEXT_DIR, name))
+                if os.path.exists(pages_path):
+                    os.remove(pages_path)
+                    removed += 1
+    if names:
+        save_index(index)
+    return removed
+
+
+def convert_all(workers=None, force=False, max_chars=None, max_pages=None, folios=None):
+    """
+    Convierte todos los PDFs de PDF_DIR en paralelo y regresa la lista de resultados.
+    Con folios (modo delta) solo se consideran los CVs de esos candidatos.
+    """
+    os.makedirs(TEXT_DIR, exist_ok=True)
+    index = {} if force else load_index()
+    budget = {"max_chars": max_chars, "max_pages": max_pages}
+    results = []
+    pending = []
+    for filename in sorted(os.listdir(PDF_DIR)):
+        if not filename.lower().endswith('.pdf'):
+            continue
+        if folios is not None and filename.rsplit('_cv', 1)[0] not in folios:
+            continue
         pdf_path = os.path.join(PDF_DIR, filename)
-        text_path = os.path.join(TEXT_DIR, filename.replace('.pdf', '.txt'))
-        try:
-            doc = fitz.open(pdf_path)
-            text = ''
-            for page in doc:
-                text += page.get_text()
-            with open(text_path, 'w', encoding='utf-8') as f:
-                f.write(text)
-            print(f"Convertido: {filename} -> {text_path}")
-        except Exception as e:
-            print(f"Error al convertir {filename}: {e}") 
\ No newline at end of file
+        text_path = text_path_for(filename)
+        # Texto más reciente que el PDF y ya registrado: no hay nada que hacer
+        previous = index.get(filename)
+        if (previous and previous.get("budget") == budget and os.path.exists(text_path)
+                and os.path.getmtime(text_path) >= os.path.getmtime(pdf_path)):
+            results.append({"file": filename, "status": "skipped", "pages": 0, "chars": 0, "seconds": 0.0,
+                            "sha256": previous["sha256"], "truncated": "", "error": ""})
+            continue
+        pending.append((pdf_path, text_path, previous, max_chars, max_pages))
+
+    print(f"PDFs a convertir: {len(pending)} (omitidos por estar al día: {len(results)})")
+    started = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(convert_pdf, *args) for args in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                histogram("pdf_conversion_seconds", "Duración de la conversión por PDF").observe(
+                    result["seconds"], status=result["status"])
+                counter("pdf_pages_total", "Páginas extraídas").inc(result["pages"])
+                counter("pdf_chars_total", "Caracteres extraídos").inc(result["chars"])
+                if result["status"] == "error":
+                    print(f"Error al convertir {result['file']}: {result['error']}")
+                else:
+                    index[result["file"]] = {"sha256": result["sha256"], "budget": budget}
+                    if result["status"] == "converted":
+                        print(f"Convertido: {result['file']} ({result['pages']} páginas, {result['seconds']} s)")
+    save_index(index)
+    save_report(results)
+    # Registrar los textos nuevos en el almacén ({folio}_cv.pdf -> folio)
+    with CandidateStore(STORE_PATH) as store:
+        store.upsert_texts(
+            {"folio": r["file"].rsplit('_cv', 1)[0], "path": text_path_for(r["file"]), "source_sha256": r["sha256"],
+             "pages": r["pages"], "chars": r["chars"], "truncated": r["truncated"]}
+            for r in results if r["status"] == "converted" and '_cv' in r["file"]
+        )
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    for status, count in counts.items():
+        counter("rows_processed_total", "Filas procesadas por la etapa").inc(count, kind="pdf", status=status)
+    print(f"Conversión terminada en {time.perf_counter() - started:.1f} s: {counts}")
+    print(f"Reporte guardado en {REPORT_PATH}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte los CVs en PDF a texto")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, núcleos disponibles)")
+    parser.add_argument("--force", action="store_true", help="Reconvertir todos los PDFs")
+    parser.add_argument("--max-chars", type=int, default=None,
+                        help="Detener la extracción de cada PDF al alcanzar N caracteres")
+    parser.add_argument("--max-pages", type=int, default=None, help="Extraer como máximo las primeras N páginas")
+    parser.add_argument("--delta", default=None,
+                        help="Manifiesto delta de extract_candidates.py: convertir solo los CVs afectados")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    delta = load_delta(args.delta) if args.delta else None
+    folios = affected_folios(delta, CV_FIELDS) if delta else None
+    if delta and delta["removed"]:
+        print(f"Textos borrados de candidatos eliminados: {remove_texts(delta['removed'])}")
+    convert_all(args.workers, args.force, args.max_chars, args.max_pages, folios)
+    export_metrics("convert")
+
+
+if __name__ == "__main__":
+    with profile_from_argv("convert"):
+        main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Detección de cambios entre extracciones sucesivas de candidatos.
+Guarda un hash por candidato (y por campo) y genera un manifiesto delta con los
+folios agregados, modificados (con los campos que cambiaron) y eliminados, para que
+las etapas siguientes procesen solo a los candidatos afectados.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+def _hash(value):
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_hashes(candidates):
+    """Dict folio -> {"hash": hash del registro, "fields": {campo: hash}}."""
+    snapshot = {}
+    for candidate in candidates:
+        if not isinstance(candidate, dict) or candidate.get("idCandidato") is None:
+            continue
+        fields = {field: _hash(value) for field, value in candidate.items()}
+        snapshot[str(candidate["idCandidato"])] = {
+            "hash": _hash(fields), "categoria": candidate.get("categoria"), "fields": fields
+        }
+    return snapshot
+
+
+def compute_delta(previous, current):
+    """Compara dos snapshots y regresa el manifiesto delta."""
+    added = sorted(folio for folio in current if folio not in previous)
+    removed = sorted(folio for folio in previous if folio not in current)
+    modified = {}
+    for folio, entry in current.items():
+        old = previous.get(folio)
+        if old is None or old["hash"] == entry["hash"]:
+            continue
+        fields = set(entry["fields"]) | set(old["fields"])
+        modified[folio] = sorted(f for f in fields if entry["fields"].get(f) != old["fields"].get(f))
+    return {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "primera_extraccion": not previous,
+        "total": len(current),
+        "added": added,
+        "modified": dict(sorted(modified.items())),
+        "removed": removed,
+    }
+
+
+def load_snapshot(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_snapshot(snapshot, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_delta(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def affected_folios(delta, relevant_fields=None):
+    """
+    Folios que una etapa debe reprocesar: los agregados y los modificados. Si se indican
+    relevant_fields, solo cuentan las modificaciones en alguno de esos campos.
+    """
+    folios = set(delta.get("added", []))
+    for folio, fields in delta.get("modified", {}).items():
+        if relevant_fields is None or set(fields) & set(relevant_fields):
+            folios.add(folio)
+    return folios
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de distrito y circuito judicial por coordenada o por sección electoral.
+- Puntos: un STRtree (shapely 2) sobre los polígonos de distritos_judiciales_mexico.shp
+  (leídos de la caché GeoParquet de geo_cache.py), con las geometrías preparadas. Se
+  construye una vez por proceso y por versión del shapefile; una consulta individual toma
+  microsegundos y lookup_many resuelve millones de puntos en bloques vectorizados.
+- Secciones: tabla (estado, sección) -> distrito a partir del catálogo
+  catalogoEstadosSecciones.json guardado por extract_candidates.py. Si el catálogo trae
+  coordenadas de la sección en lugar del distrito, se resuelven con el índice de puntos.
+
+Uso:
+    python district_lookup.py --point -99.1332 19.4326
+    python district_lookup.py --section "CIUDAD DE MÉXICO" 1234
+    python district_lookup.py --points puntos.csv --output puntos_con_distrito.csv
+    python district_lookup.py --sections secciones.csv --output secciones_con_distrito.csv
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+from geo_cache import read_geodataframe
+
+DISTRITOS_DIR = os.environ.get("DISTRITOS_DIR", os.path.join(os.getcwd(), "distritos_judiciales"))
+SHAPEFILE_PATH = os.path.join(DISTRITOS_DIR, "output", "distritos_judiciales_mexico.shp")
+SECTIONS_CATALOG_PATH = os.path.join("extract_candidates_output", "catalog_estados.json")
+# Puntos por bloque en lookup_many (acota la memoria de los arreglos intermedios)
+CHUNK_SIZE = 1_000_000
+GEOGRAPHIC_CRS = "EPSG:4326"
+
+# Columnas de resultado (las mismas que agrega associate_candidates.py)
+RESULT_COLUMNS = ["distrito_judicial", "circuito_judicial", "nombre_distrito", "entidad_distrito"]
+# Columnas posibles en el shapefile (en minúsculas) para cada columna de resultado
+SHAPEFILE_COLUMNS = {
+    "distrito_judicial": ["distrito_j", "distrito_judicial", "dist_jud"],
+    "circuito_judicial": ["circuito", "circuito_judicial", "circ_jud"],
+    "nombre_distrito": ["nombre_dis", "nombre_distrito_judicial", "nombre_dj"],
+    "entidad_distrito": ["entidad", "cve_ent"],
+}
+# Llaves posibles en el catálogo de secciones
+SECTION_KEYS = ("seccion", "idSeccion", "numeroSeccion", "cveSeccion")
+CATALOG_FIELDS = {
+    "estado": ("idEstado", "idEntidad", "cveEntidad"),
+    "nombre_estado": ("nombreEstado", "nombreEntidad"),
+    "seccion": SECTION_KEYS,
+    "circuito_judicial": ("idCircuito", "idCircuitoJudicial", "circuito"),
+    "distrito_judicial": ("idDistritoJudicial", "distritoJudicial", "idDistrito"),
+    "lon": ("longitud", "lon", "lng"),
+    "lat": ("latitud", "lat"),
+}
+
+_district_indexes = {}
+_section_indexes = {}
+
+
+def file_version(path):
+    """Llave de caché: el índice se reconstruye si el archivo cambia."""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+class DistrictIndex:
+    """
+    Índice espacial de distritos. `attributes` está alineado con `geometries` y tiene las
+    columnas de RESULT_COLUMNS; las coordenadas van en grados (lon, lat).
+    """
+
+    def __init__(self, geometries, attributes):
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.attributes = attributes.reindex(columns=RESULT_COLUMNS).reset_index(drop=True)
+        self._records = self.attributes.to_dict("records")
+
+    @classmethod
+    def from_frame(cls, gdf):
+        """Índice a partir de un GeoDataFrame con las columnas del shapefile."""
+        gdf = gdf.rename(columns=str.lower)
+        if gdf.crs is not None and not gdf.crs.equals(GEOGRAPHIC_CRS):
+            gdf = gdf.to_crs(GEOGRAPHIC_CRS)
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+        attributes = pd.DataFrame(index=gdf.index)
+        for target, candidates in SHAPEFILE_COLUMNS.items():
+            source = next((col for col in candidates if col in gdf.columns), None)
+            attributes[target] = gdf[source] if source else None
+        return cls(gdf.geometry.to_numpy(), attributes)
+
+    @classmethod
+    def from_file(cls, path=SHAPEFILE_PATH):
+        return cls.from_frame(read_geodataframe(path))
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def position(self, lon, lat):
+        """Posición del distrito que contiene el punto (el de menor posición si cae en un borde) o -1."""
+        hits = self.tree.query(shapely.Point(lon, lat), predicate="intersects")
+        return int(hits.min()) if len(hits) else -1
+
+    def lookup(self, lon, lat):
+        """Dict con RESULT_COLUMNS del distrito que contiene el punto, o None."""
+        position = self.position(lon, lat)
+        return self._records[position] if position >= 0 else None
+
+    def lookup_many(self, lons, lats, chunk_size=CHUNK_SIZE):
+        """Arreglo int64 con la posición del distrito de cada punto (-1 si ninguno lo contiene)."""
+        lons = np.asarray(lons, dtype="float64")
+        lats = np.asarray(lats, dtype="float64")
+        if lons.shape != lats.shape:
+            raise ValueError("lons y lats deben tener la misma longitud")
+        positions = np.full(len(lons), -1, dtype="int64")
+        for start in range(0, len(lons), chunk_size):
+            stop = start + chunk_size
+            points, districts = self.tree.query(shapely.points(lons[start:stop], lats[start:stop]),
+                                                predicate="intersects")
+            if not len(points):
+                continue
+            # Un punto en el borde toca varios distritos: queda el de menor posición, como en position()
+            order = np.lexsort((districts, points))
+            points, districts = points[order], districts[order]
+            first = np.ones(len(points), dtype=bool)
+            first[1:] = points[1:] != points[:-1]
+            positions[start + points[first]] = districts[first]
+        return positions
+
+    def lookup_frame(self, lons, lats, chunk_size=CHUNK_SIZE):
+        """DataFrame con RESULT_COLUMNS alineado con los puntos (NaN si no hay distrito)."""
+        positions = self.lookup_many(lons, lats, chunk_size)
+        return self.attributes.reindex(positions).reset_index(drop=True)
+
+
+def get_district_index(path=SHAPEFILE_PATH):
+    """Índice del shapefile, construido una vez por proceso y por versión del archivo."""
+    key = file_version(path)
+    index = _district_indexes.get(key)
+    if index is None:
+        index = DistrictIndex.from_file(path)
+        _district_indexes.clear()
+        _district_indexes[key] = index
+    return index
+
+
+def first_value(node, keys):
+    for key in keys:
+        value = node.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def section_records(node, inherited=None, key=""):
+    """
+    Recorre el catálogo (anidado por estado, circuito, distrito...) y genera un dict por
+    sección con los campos de CATALOG_FIELDS heredados de sus contenedores. Las listas de
+    números bajo una llave que mencione "seccion" se toman como números de sección.
+    """
+    inherited = inherited or {}
+    if isinstance(node, list):
+        for item in node:
+            if isinstance(item, (dict, list)):
+                yield from section_records(item, inherited, key)
+            elif "seccion" in key.lower() and item is not None:
+                yield dict(inherited, seccion=item)
+        return
+    if not isinstance(node, dict):
+        return
+    fields = dict(inherited)
+    for field, keys in CATALOG_FIELDS.items():
+        value = first_value(node, keys)
+        if value is not None and not isinstance(value, (dict, list)):
+            fields[field] = value
+    section = first_value(node, SECTION_KEYS)
+    if section is not None and not isinstance(section, (dict, list)):
+        yield fields
+        return
+    for child_key, child in node.items():
+        if isinstance(child, (dict, list)):
+            yield from section_records(child, fields, child_key)
+
+
+def normalize_state_name(values):
+    return pd.Series(values, dtype="object").astype(str).str.strip().str.upper()
+
+
+class SectionIndex:
+    """Tabla (estado, sección) -> distrito; el estado puede darse por id o por nombre."""
+
+    def __init__(self, catalog, district_index=None):
+        table = pd.DataFrame(list(section_records(catalog)), columns=list(CATALOG_FIELDS))
+        # Nombre del estado -> id, también para estados sin secciones
+        states = pd.DataFrame(list(self._states(catalog)), columns=["estado", "nombre_estado"]).dropna()
+        self._state_ids = dict(zip(normalize_state_name(states["nombre_estado"]),
+                                   pd.to_numeric(states["estado"], errors="coerce")))
+        table["estado"] = self.state_keys(table["estado"].fillna(table["nombre_estado"]))
+        table["seccion"] = pd.to_numeric(table["seccion"], errors="coerce")
+        table = table.dropna(subset=["estado", "seccion"])
+
+        result = pd.DataFrame({
+            "distrito_judicial": table["distrito_judicial"],
+            "circuito_judicial": table["circuito_judicial"],
+            "nombre_distrito": None,
+            "entidad_distrito": table["nombre_estado"],
+        }, index=table.index)
+        # Secciones con coordenadas y sin distrito: se ubican con el índice espacial
+        located = table["distrito_judicial"].isna() & table["lon"].notna() & table["lat"].notna()
+        if district_index is not None and located.any():
+            found = district_index.lookup_frame(pd.to_numeric(table.loc[located, "lon"], errors="coerce"),
+                                                pd.to_numeric(table.loc[located, "lat"], errors="coerce"))
+            found.index = table.index[located]
+            result.loc[located, RESULT_COLUMNS] = found[RESULT_COLUMNS]
+        result.index = pd.MultiIndex.from_arrays([table["estado"].astype("int64"), table["seccion"].astype("int64")],
+                                                 names=["estado", "seccion"])
+        self.table = result[~result.index.duplicated()]
+
+    @staticmethod
+    def _states(node):
+        if isinstance(node, list):
+            for item in node:
+                yield from SectionIndex._states(item)
+        elif isinstance(node, dict):
+            state_id = first_value(node, CATALOG_FIELDS["estado"])
+            name = first_value(node, CATALOG_FIELDS["nombre_estado"])
+            if state_id is not None and name is not None:
+                yield state_id, name
+            for child in node.values():
+                if isinstance(child, (dict, list)):
+                    yield from SectionIndex._states(child)
+
+    @classmethod
+    def from_file(cls, path=SECTIONS_CATALOG_PATH, district_index=None):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), district_index)
+
+    def __len__(self):
+        return len(self.table)
+
+    def state_keys(self, values):
+        """Ids numéricos de estado a partir de ids o nombres (NaN si no se reconoce)."""
+        values = pd.Series(values, dtype="object")
+        numeric = pd.to_numeric(values, errors="coerce")
+        return numeric.fillna(normalize_state_name(values).map(self._state_ids)).astype("float64")
+
+    def lookup(self, estado, seccion):
+        """Dict con RESULT_COLUMNS de la sección, o None si no está en el catálogo."""
+        state = self.state_keys([estado]).iloc[0]
+        try:
+            row = self.table.loc[(int(state), int(seccion))]
+        except (KeyError, TypeError, ValueError):
+            return None
+        return row.to_dict()
+
+    def lookup_many(self, estados, secciones):
+        """DataFrame con RESULT_COLUMNS alineado con los pares (NaN si la sección no existe)."""
+        keys = pd.DataFrame({
+            "estado": self.state_keys(estados).to_numpy(),
+            "seccion": pd.to_numeric(pd.Series(secciones, dtype="object"), errors="coerce").to_numpy(),
+        }).round().astype("Int64")
+        # merge left conserva el orden de las llaves; las llaves faltantes no coinciden con nada
+        return keys.merge(self.table.reset_index().astype({"estado": "Int64", "seccion": "Int64"}),
+                          on=["estado", "seccion"], how="left")[RESULT_COLUMNS]
+
+
+def get_section_index(path=SECTIONS_CATALOG_PATH, shapefile_path=SHAPEFILE_PATH):
+    """Índice del catálogo de secciones, construido una vez por proceso y por versión del archivo."""
+    key = file_version(path)
+    index = _section_indexes.get(key)
+    if index is None:
+        district_index = get_district_index(shapefile_path) if os.path.exists(shapefile_path) else None
+        index = SectionIndex.from_file(path, district_index)
+        _section_indexes.clear()
+        _section_indexes[key] = index
+    return index
+
+
+def lookup_point(lon, lat):
+    return get_district_index().lookup(lon, lat)
+
+
+def lookup_section(estado, seccion):
+    return get_section_index().lookup(estado, seccion)
+
+
+def find_column(df, candidates):
+    lowered = {col.lower(): col for col in df.columns}
+    return next((lowered[name] for name in candidates if name in lowered), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca el distrito judicial de coordenadas o secciones electorales")
+    parser.add_argument("--point", nargs=2, type=float, action="append", metavar=("LON", "LAT"), default=[],
+                        help="Coordenada en grados (se puede repetir)")
+    parser.add_argument("--section", nargs=2, action="append", metavar=("ESTADO", "SECCION"), default=[],
+                        help="Estado (id o nombre) y sección electoral (se puede repetir)")
+    parser.add_argument("--points", help="CSV con columnas lon/lat (o longitud/latitud)")
+    parser.add_argument("--sections", help="CSV con columnas estado y seccion")
+    parser.add_argument("--output", help="CSV de salida para --points o --sections")
+    parser.add_argument("--shapefile", default=SHAPEFILE_PATH, help="Shapefile de distritos judiciales")
+    parser.add_argument("--catalog", default=SECTIONS_CATALOG_PATH, help="Catálogo de estados y secciones")
+    args = parser.parse_args()
+    if not (args.point or args.section or args.points or args.sections):
+        parser.error("indica --point, --section, --points o --sections")
+
+    started = time.perf_counter()
+    districts = get_district_index(args.shapefile) if args.point or args.points else None
+    sections = get_section_index(args.catalog, args.shapefile) if args.section or args.sections else None
+    print(f"Índices cargados en {time.perf_counter() - started:.2f} s")
+
+    for lon, lat in args.point:
+        print(f"({lon}, {lat}): {districts.lookup(lon, lat)}")
+    for estado, seccion in args.section:
+        print(f"{estado} sección {seccion}: {sections.lookup(estado, seccion)}")
+
+    for path, kind in ((args.points, "points"), (args.sections, "sections")):
+        if not path:
+            continue
+        df = pd.read_csv(path)
+        started = time.perf_counter()
+        if kind == "points":
+            lon_col = find_column(df, CATALOG_FIELDS["lon"])
+            lat_col = find_column(df, CATALOG_FIELDS["lat"])
+            if not lon_col or not lat_col:
+                parser.error(f"{path} no tiene columnas de longitud y latitud")
+            found = districts.lookup_frame(df[lon_col], df[lat_col])
+        else:
+            state_col = find_column(df, ("estado",) + CATALOG_FIELDS["estado"] + CATALOG_FIELDS["nombre_estado"])
+            section_col = find_column(df, SECTION_KEYS)
+            if not state_col or not section_col:
+                parser.error(f"{path} no tiene columnas de estado y sección")
+            found = sections.lookup_many(df[state_col], df[section_col])
+        elapsed = time.perf_counter() - started
+        result = pd.concat([df.reset_index(drop=True), found], axis=1)
+        print(f"{len(df)} filas de {path} en {elapsed:.3f} s "
+              f"({len(df) / max(elapsed, 1e-9):.0f}/s); sin distrito: {int(found['distrito_judicial'].isna().sum())}")
+        if args.output:
+            result.to_csv(args.output, index=False)
+            print(f"Resultado guardado en {args.output}")
+        else:
+            print(result.head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
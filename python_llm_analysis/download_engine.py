@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Motor de descargas asíncronas para los documentos de candidatos.
+Usa un pool de conexiones keep-alive compartido, un número acotado de workers
+y un límite de conexiones simultáneas por host.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import aiohttp
+
+# Valores por defecto del motor
+DEFAULT_CONCURRENCY = 32
+DEFAULT_PER_HOST = 8
+DEFAULT_TIMEOUT = 60
+PROGRESS_INTERVAL = 5.0
+CHUNK_SIZE = 64 * 1024
+USER_AGENT = "transparencia-pjmx/1.0"
+
+# Firmas esperadas por extensión: (bytes mágicos, content-types aceptados)
+EXPECTED_TYPES = {
+    ".pdf": (b"%PDF-", ("application/pdf", "application/octet-stream", "binary/octet-stream")),
+    ".jpg": (b"\xff\xd8\xff", ("image/jpeg", "image/jpg", "image/pjpeg", "application/octet-stream")),
+    ".jpeg": (b"\xff\xd8\xff", ("image/jpeg", "image/jpg", "image/pjpeg", "application/octet-stream")),
+}
+
+
+class DownloadRejected(ValueError):
+    """El contenido descargado no cumple con el tamaño o el tipo esperado."""
+
+
+class DownloadManifest:
+    """
+    Manifiesto persistente de descargas: URL -> ETag, Last-Modified, tamaño, sha256 y ruta local.
+    Permite hacer peticiones condicionales y omitir archivos que no cambiaron.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def conditional_headers(self, url, save_path):
+        """Encabezados If-None-Match/If-Modified-Since si el archivo local sigue vigente."""
+        entry = self.entries.get(url)
+        if not entry or entry.get("path") != save_path or not os.path.exists(save_path):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, url, info, etag=None, last_modified=None):
+        self.entries[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": info["bytes"],
+            "sha256": info["sha256"],
+            "path": info["path"],
+        }
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class DownloadStats:
+    """Acumula contadores de descargas y calcula el throughput."""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.completed = 0
+        self.ok = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def record(self, ok, nbytes=0, unchanged=False):
+        self.completed += 1
+        if unchanged:
+            self.unchanged += 1
+        elif ok:
+            self.ok += 1
+            self.bytes += nbytes
+        else:
+            self.failed += 1
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def throughput(self):
+        """Regresa (archivos/s, bytes/s) desde el inicio."""
+        elapsed = max(self.elapsed(), 1e-9)
+        return self.completed / elapsed, self.bytes / elapsed
+
+    def maybe_report(self, force=False):
+        """Imprime una línea de progreso como máximo cada PROGRESS_INTERVAL segundos."""
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        files_per_s, bytes_per_s = self.throughput()
+        print(f"[{self.completed}/{self.total}] ok={self.ok} sin_cambios={self.unchanged} errores={self.failed} "
+              f"{self.bytes / 1e6:.1f} MB ({files_per_s:.1f} archivos/s, {bytes_per_s / 1e6:.2f} MB/s)")
+
+    def summary(self):
+        files_per_s, bytes_per_s = self.throughput()
+        return {
+            "total": self.total,
+            "completados": self.completed,
+            "ok": self.ok,
+            "sin_cambios": self.unchanged,
+            "errores": self.failed,
+            "bytes": self.bytes,
+            "segundos": round(self.elapsed(), 2),
+            "archivos_por_segundo": round(files_per_s, 2),
+            "mb_por_segundo": round(bytes_per_s / 1e6, 3),
+        }
+
+
+def create_session(concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT):
+    """Crea una sesión aiohttp con un pool de conexiones compartido y límites por host."""
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        limit_per_host=per_host,
+        keepalive_timeout=30,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=15),
+        headers={"User-Agent": USER_AGENT},
+        raise_for_status=False,
+    )
+
+
+def check_content_type(content_type, save_path):
+    """Valida el Content-Type de la respuesta contra la extensión del archivo destino."""
+    expected = EXPECTED_TYPES.get(os.path.splitext(save_path)[1].lower())
+    if not expected or not content_type:
+        return
+    mime = content_type.split(";")[0].strip().lower()
+    if mime not in expected[1]:
+        raise DownloadRejected(f"Content-Type inesperado {mime!r} para {os.path.basename(save_path)}")
+
+
+def check_magic(head, save_path):
+    """Valida los primeros bytes del contenido contra la firma esperada."""
+    expected = EXPECTED_TYPES.get(os.path.splitext(save_path)[1].lower())
+    if expected and not head.startswith(expected[0]):
+        raise DownloadRejected(f"Firma de archivo inválida para {os.path.basename(save_path)}: {head[:8]!r}")
+
+
+async def fetch_to_file(session, url, save_path, max_bytes=None, tmp_dir=None, manifest=None):
+    """
+    Descarga una URL en bloques hacia un archivo temporal y, si el contenido es válido,
+    lo mueve de forma atómica a save_path. Nunca deja archivos parciales en el destino.
+    Con un manifiesto, hace una petición condicional y no toca el archivo si el servidor
+    responde 304. Regresa un dict con ruta, bytes, sha256, content_type y unchanged.
+    """
+    headers = manifest.conditional_headers(url, save_path) if manifest else {}
+    tmp_dir = tmp_dir or os.path.dirname(save_path) or "."
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".descarga-", suffix=".part", dir=tmp_dir)
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and headers:
+                entry = manifest.get(url)
+                return {"path": save_path, "bytes": entry["size"], "sha256": entry["sha256"],
+                        "content_type": "", "unchanged": True}
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            content_type = response.headers.get("Content-Type", "")
+            check_content_type(content_type, save_path)
+            if max_bytes and response.content_length and response.content_length > max_bytes:
+                raise DownloadRejected(f"{url} excede el tamaño máximo ({response.content_length} > {max_bytes} bytes)")
+            digest = hashlib.sha256()
+            nbytes = 0
+            head = b""
+            with os.fdopen(fd, 'wb') as f:
+                fd = None
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    if len(head) < 8:
+                        head += chunk[:8 - len(head)]
+                    nbytes += len(chunk)
+                    if max_bytes and nbytes > max_bytes:
+                        raise DownloadRejected(f"{url} excede el tamaño máximo ({max_bytes} bytes)")
+                    digest.update(chunk)
+                    f.write(chunk)
+        check_magic(head, save_path)
+        os.replace(tmp_path, save_path)
+        tmp_path = None
+        info = {"path": save_path, "bytes": nbytes, "sha256": digest.hexdigest(),
+                "content_type": content_type, "unchanged": False}
+        if manifest:
+            manifest.update(url, info, etag, last_modified)
+        return info
+    finally:
+        if fd is not None:
+            os.close(fd)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def local_file_info(save_path, entry=None):
+    """Describe un archivo ya descargado, usando el manifiesto si coincide la ruta."""
+    if entry and entry.get("path") == save_path and entry.get("size") == os.path.getsize(save_path):
+        return {"path": save_path, "bytes": entry["size"], "sha256": entry["sha256"],
+                "content_type": "", "unchanged": True}
+    digest = hashlib.sha256()
+    with open(save_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return {"path": save_path, "bytes": os.path.getsize(save_path), "sha256": digest.hexdigest(),
+            "content_type": "", "unchanged": True}
+
+
+async def run_pool(jobs, handler, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Ejecuta handler(job) para cada trabajo con un número acotado de workers.
+    Regresa la lista de resultados en el mismo orden que jobs; si un trabajo lanza
+    una excepción, su resultado es la excepción.
+    """
+    queue = asyncio.Queue()
+    for index, job in enumerate(jobs):
+        queue.put_nowait((index, job))
+    results = [None] * len(jobs)
+
+    async def worker():
+        while True:
+            try:
+                index, job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results[index] = await handler(job)
+            except Exception as e:
+                results[index] = e
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(jobs))))]
+    await asyncio.gather(*workers)
+    return results
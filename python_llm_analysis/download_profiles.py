@@ -5,16 +5,27 @@ Este script complementa la extracción de datos básicos con la descarga de recu
 """
 
 import os
+import glob
 import json
 import pandas as pd
-import requests
+import argparse
 from urllib.parse import urljoin
 import asyncio
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import time
 from datetime import datetime
 import re
 import traceback
+from artifacts import read_table, write_table
+from candidate_store import CandidateStore
+from delta_manifest import affected_folios, load_delta
+from metrics import LATENCY_BUCKETS, SIZE_BUCKETS, counter, export as export_metrics, histogram
+from profiling import add_profile_arguments, profile_from_argv
+from browser_pool import DEFAULT_BROWSERS, READY_TIMEOUT_MS, BrowserPool
+from download_engine import (
+    DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DownloadManifest, DownloadStats, create_session,
+    fetch_to_file, local_file_info, run_pool
+)
 
 # Configuración de directorios
 BASE_DIR = os.getcwd()
@@ -25,36 +36,60 @@ DOCUMENTS_DIR = os.path.join(OUTPUT_DIR, "documents")
 PHOTOS_DIR = os.path.join(OUTPUT_DIR, "photos")
 os.makedirs(PROFILES_DIR, exist_ok=True)
 os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+# Directorio para descargas en curso (mismo sistema de archivos para renombrar de forma atómica)
+TMP_DIR = os.path.join(OUTPUT_DIR, ".tmp")
 os.makedirs(PHOTOS_DIR, exist_ok=True)
+os.makedirs(TMP_DIR, exist_ok=True)
 
 # Directorio de entrada de candidatos
 INPUT_DIR = os.path.join(BASE_DIR, "extract_candidates_output")
 
 # URLs base
-BASE_URL = "https://candidaturaspoderjudicial.ine.mx/"
+BASE_URL = os.getenv("INE_BASE_URL", "https://candidaturaspoderjudicial.ine.mx").rstrip("/") + "/"
 MEDIA_URL = urljoin(BASE_URL, "media/cycc/")
 PROFILE_URL_PATTERN = urljoin(BASE_URL, "candidato/{folio}")
+# La página de perfil está lista cuando aparece alguno de estos contenedores
+PROFILE_READY_SELECTOR = ".candidate-profile, .profile-container, .candidate-detail"
 ERROR_LOG_PATH = os.path.join(OUTPUT_DIR, "error_log.txt")
+CHECKSUMS_PATH = os.path.join(OUTPUT_DIR, "checksums.sha256")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "download_manifest.json")
+STORE_PATH = os.path.join(INPUT_DIR, "candidates.sqlite")
+
+# Campos crudos que afectan qué documentos se descargan (para el modo --delta)
+DOCUMENT_FIELDS = ["descripcionHLC", "urlFoto"]
+
+def load_candidates_from_files():
+    """Carga los candidatos normalizados y los datos originales desde los archivos JSON."""
+    with open(os.path.join(INPUT_DIR, "normalized_candidates.json"), 'r', encoding='utf-8') as f:
+        candidates = json.load(f)
+    # Cargar también los datos originales para complementar información
+    raw_data = {}
+    for category in ["jueces_distrito", "magistrados_circuito", "magistrados_sala_superior", 
+                     "magistrados_sala_regional", "magistrados_tribunal_disciplina", 
+                     "ministros_suprema_corte"]:
+        try:
+            with open(os.path.join(INPUT_DIR, f"raw_{category}.json"), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if "candidatos" in data and isinstance(data["candidatos"], list):
+                    for candidate in data["candidatos"]:
+                        if "idCandidato" in candidate:
+                            raw_data[str(candidate["idCandidato"])] = candidate
+        except Exception as e:
+            print(f"Error al cargar datos originales de {category}: {e}")
+    return candidates, raw_data
 
 def load_candidates(limit=None):
-    """Carga los candidatos normalizados desde el archivo JSON."""
+    """
+    Carga los candidatos normalizados y los complementa con los datos originales.
+    Usa el almacén de candidatos si ya fue poblado por extract_candidates.py; si no, los JSON.
+    """
     try:
-        with open(os.path.join(INPUT_DIR, "normalized_candidates.json"), 'r', encoding='utf-8') as f:
-            candidates = json.load(f)
-        # Cargar también los datos originales para complementar información
-        raw_data = {}
-        for category in ["jueces_distrito", "magistrados_circuito", "magistrados_sala_superior", 
-                         "magistrados_sala_regional", "magistrados_tribunal_disciplina", 
-                         "ministros_suprema_corte"]:
-            try:
-                with open(os.path.join(INPUT_DIR, f"raw_{category}.json"), 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if "candidatos" in data and isinstance(data["candidatos"], list):
-                        for candidate in data["candidatos"]:
-                            if "idCandidato" in candidate:
-                                raw_data[str(candidate["idCandidato"])] = candidate
-            except Exception as e:
-                print(f"Error al cargar datos originales de {category}: {e}")
+        with CandidateStore(STORE_PATH) as store:
+            if store.count("normalized_candidates"):
+                candidates = store.normalized_candidates()
+                raw_data = store.raw_by_folio()
+            else:
+                candidates, raw_data = load_candidates_from_files()
         # Enriquecer los candidatos normalizados con datos originales
         for candidate in candidates:
             if candidate["folio"] in raw_data:
@@ -80,119 +115,264 @@ def load_candidates(limit=None):
         print(f"Error al cargar candidatos: {e}")
         return []
 
-async def download_profile_html(candidate, page):
-    """Descarga el HTML del perfil de un candidato usando Playwright."""
+async def save_profile_page(candidate, page, screenshot=False):
+    """
+    Guarda el HTML (y opcionalmente un screenshot) del perfil de un candidato. En lugar de
+    esperar a networkidle, la página se considera lista cuando aparece el contenedor del perfil.
+    Lanza la excepción si la navegación falla.
+    """
     folio = candidate["folio"]
     profile_url = PROFILE_URL_PATTERN.format(folio=folio)
-    
+    await page.goto(profile_url, wait_until="domcontentloaded")
     try:
-        print(f"Descargando perfil HTML para candidato {folio}...")
-        
-        # Navegar a la página del perfil
-        await page.goto(profile_url, timeout=60000)
-        await page.wait_for_load_state("networkidle")
-        
-        # Esperar a que cargue el contenido principal
-        try:
-            await page.wait_for_selector(".candidate-profile, .profile-container, .candidate-detail", timeout=10000)
-        except:
-            print(f"No se encontró contenedor de perfil para candidato {folio}")
-        
-        # Capturar screenshot
-        screenshot_path = os.path.join(PROFILES_DIR, f"{folio}_screenshot.png")
-        await page.screenshot(path=screenshot_path)
-        
-        # Obtener el HTML completo
-        html_content = await page.content()
-        
-        # Guardar el HTML
-        html_path = os.path.join(PROFILES_DIR, f"{folio}_profile.html")
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        print(f"Perfil HTML guardado en {html_path}")
-        return html_path
-    
-    except Exception as e:
-        print(f"Error al descargar perfil HTML para candidato {folio}: {e}")
-        return None
+        await page.wait_for_selector(PROFILE_READY_SELECTOR, timeout=READY_TIMEOUT_MS)
+    except PlaywrightTimeoutError:
+        print(f"No se encontró contenedor de perfil para candidato {folio}")
+    if screenshot:
+        await page.screenshot(path=os.path.join(PROFILES_DIR, f"{folio}_screenshot.png"))
+    html_content = await page.content()
+    html_path = os.path.join(PROFILES_DIR, f"{folio}_profile.html")
+    tmp_path = html_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    os.replace(tmp_path, html_path)
+    return html_path
+
+async def capture_profiles(candidates, browsers=DEFAULT_BROWSERS, screenshots=False, block_resources=True,
+                           only_missing=False):
+    """
+    Captura las páginas de perfil de todos los candidatos con un pool de contextos de
+    navegador en paralelo. Regresa {folio: ruta del HTML} de las capturas exitosas.
+    """
+    paths = {}
+    jobs = []
+    for candidate in candidates:
+        html_path = os.path.join(PROFILES_DIR, f"{candidate['folio']}_profile.html")
+        if only_missing and os.path.exists(html_path):
+            paths[candidate["folio"]] = html_path
+        else:
+            jobs.append(candidate)
+    stats = DownloadStats(total=len(jobs))
+    print(f"Capturando {len(jobs)} perfiles con {browsers} contextos de navegador "
+          f"({len(paths)} ya existían)")
+
+    async with BrowserPool(browsers, block_resources=block_resources) as pool:
+        async def handle(candidate):
+            started = time.perf_counter()
+            try:
+                async with pool.page() as page:
+                    html_path = await save_profile_page(candidate, page, screenshots)
+            except Exception:
+                histogram("profile_capture_seconds", "Tiempo de captura de páginas de perfil", LATENCY_BUCKETS).observe(
+                    time.perf_counter() - started, status="error")
+                stats.record(False)
+                raise
+            histogram("profile_capture_seconds", "Tiempo de captura de páginas de perfil", LATENCY_BUCKETS).observe(
+                time.perf_counter() - started, status="ok")
+            stats.record(True, os.path.getsize(html_path))
+            stats.maybe_report()
+            return html_path
+
+        job_results = await run_pool(jobs, handle, browsers)
+        blocked = counter("browser_blocked_requests_total", "Peticiones del navegador bloqueadas")
+        for resource_type, count in pool.blocked.items():
+            blocked.inc(count, resource_type=resource_type)
+    stats.maybe_report(force=True)
+
+    error_log = []
+    for candidate, result in zip(jobs, job_results):
+        if isinstance(result, Exception):
+            error_log.append(f"Error al capturar perfil {candidate['folio']}: {result}")
+        elif result:
+            paths[candidate["folio"]] = result
+    if error_log:
+        with open(ERROR_LOG_PATH, 'a', encoding='utf-8') as f:
+            for line in error_log:
+                f.write(line + '\n')
+    print(f"Perfiles capturados: {stats.ok}/{stats.total} ({stats.failed} errores, "
+          f"{sum(pool.blocked.values())} peticiones bloqueadas)")
+    return paths
 
-def download_document(url, save_path):
-    """Descarga un documento desde una URL y lo guarda en la ruta especificada."""
+async def download_document(session, url, save_path, stats=None, max_bytes=None, manifest=None):
+    """
+    Descarga un documento desde una URL y lo guarda en la ruta especificada.
+    Regresa un dict con ruta, bytes y sha256, o None si la descarga falla o se rechaza.
+    Con un manifiesto, los archivos sin cambios en el servidor (304) no se vuelven a descargar.
+    """
+    kind = os.path.splitext(save_path)[1].lstrip('.').lower() or "otro"
+    started = time.perf_counter()
     try:
         # Asegurar que la URL sea absoluta
         if not url.startswith(('http://', 'https://')):
             url = urljoin(MEDIA_URL, url.lstrip('/'))
         
-        print(f"Descargando documento desde {url}...")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-        
-        print(f"Documento guardado en {save_path}")
-        return save_path
+        info = await fetch_to_file(session, url, save_path, max_bytes=max_bytes, tmp_dir=TMP_DIR, manifest=manifest)
+        if stats:
+            stats.record(True, info["bytes"], unchanged=info["unchanged"])
+        status = "sin_cambios" if info["unchanged"] else "ok"
+        histogram("document_download_seconds", "Latencia de descargas de documentos", LATENCY_BUCKETS).observe(
+            time.perf_counter() - started, kind=kind, status=status)
+        counter("downloads_total", "Descargas de documentos por resultado").inc(kind=kind, status=status)
+        if not info["unchanged"]:
+            counter("http_bytes_total", "Bytes descargados").inc(info["bytes"], kind=kind)
+            histogram("document_bytes", "Tamaño de documentos descargados", SIZE_BUCKETS).observe(info["bytes"], kind=kind)
+        return info
     
     except Exception as e:
         print(f"Error al descargar documento desde {url}: {e}")
+        if stats:
+            stats.record(False)
+        histogram("document_download_seconds", "Latencia de descargas de documentos", LATENCY_BUCKETS).observe(
+            time.perf_counter() - started, kind=kind, status="error")
+        counter("downloads_total", "Descargas de documentos por resultado").inc(kind=kind, status="error")
         return None
 
-def download_candidate_documents(candidate):
-    """Descarga los documentos asociados a un candidato (foto, CV, etc.)."""
+def candidate_document_jobs(candidate):
+    """Construye la lista de descargas (url, ruta destino) de un candidato (foto, CV, etc.)."""
     folio = candidate["folio"]
-    documents_paths = []
+    jobs = []
     
-    # Descargar foto si está disponible
+    # Foto del candidato
     # Usar la ruta real: https://candidaturaspoderjudicial.ine.mx/cycc/img/fotocandidato/{folio}.jpg
-    photo_url = f"https://candidaturaspoderjudicial.ine.mx/cycc/img/fotocandidato/{folio}.jpg"
+    photo_url = urljoin(BASE_URL, f"cycc/img/fotocandidato/{folio}.jpg")
     photo_extension = ".jpg"
-        photo_path = os.path.join(PHOTOS_DIR, f"{folio}_photo{photo_extension}")
-        result = download_document(photo_url, photo_path)
-        if result:
-            documents_paths.append(result)
+    photo_path = os.path.join(PHOTOS_DIR, f"{folio}_photo{photo_extension}")
+    jobs.append((photo_url, photo_path))
     
-    # Descargar CV si está disponible
+    # CV si está disponible
     if "cv_file" in candidate and candidate["cv_file"]:
         cv_file = candidate["cv_file"]
         # Usar la ruta real: https://candidaturaspoderjudicial.ine.mx/cycc/documentos/cv/{cv_file}
-        cv_url = f"https://candidaturaspoderjudicial.ine.mx/cycc/documentos/cv/{cv_file}"
+        cv_url = urljoin(BASE_URL, f"cycc/documentos/cv/{cv_file}")
         cv_extension = os.path.splitext(cv_file)[1] or ".pdf"
         cv_path = os.path.join(DOCUMENTS_DIR, f"{folio}_cv{cv_extension}")
-        result = download_document(cv_url, cv_path)
-        if result:
-            documents_paths.append(result)
+        jobs.append((cv_url, cv_path))
     
-    return documents_paths
+    return jobs
 
-async def process_candidates(candidates):
-    """Procesa los candidatos para descargar documentos, omitiendo errores y registrando en log."""
-    results = []
+async def process_candidates(candidates, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                             max_bytes=None, only_missing=False):
+    """
+    Procesa los candidatos para descargar documentos en paralelo, omitiendo errores
+    y registrando en log. Todas las descargas (fotos y CVs) comparten un pool de
+    workers acotado y un pool de conexiones keep-alive.
+    Las descargas son incrementales: se usa el manifiesto para pedir solo lo que cambió,
+    y con only_missing no se consulta al servidor por archivos que ya existen localmente.
+    """
+    manifest = DownloadManifest(MANIFEST_PATH)
+    # Aplanar las descargas de todos los candidatos para repartirlas entre los workers
+    jobs = []
+    for index, candidate in enumerate(candidates):
+        try:
+            for url, save_path in candidate_document_jobs(candidate):
+                jobs.append((index, url, save_path))
+        except Exception as e:
+            print(f"Error al preparar descargas del candidato {candidate.get('folio', 'desconocido')}: {e}")
+    
+    stats = DownloadStats(total=len(jobs))
+    print(f"Descargando {len(jobs)} documentos con {concurrency} workers ({per_host} conexiones por host)")
+    
+    async with create_session(concurrency, per_host) as session:
+        async def handle(job):
+            _, url, save_path = job
+            if only_missing and os.path.exists(save_path):
+                result = local_file_info(save_path, manifest.get(url))
+                stats.record(True, unchanged=True)
+            else:
+                result = await download_document(session, url, save_path, stats, max_bytes, manifest)
+            stats.maybe_report()
+            return result
+        
+        try:
+            job_results = await run_pool(jobs, handle, concurrency)
+        finally:
+            manifest.save()
+    stats.maybe_report(force=True)
+    
+    # Reagrupar los documentos descargados por candidato
+    docs_by_candidate = {}
+    store_rows = []
     error_log = []
-        for candidate in candidates:
-            try:
-                folio = candidate["folio"]
-                print(f"\nProcesando candidato {folio}: {candidate['nombre']}")
-                result = candidate.copy()
-                # Descargar documentos
-                document_paths = download_candidate_documents(candidate)
-                result["document_paths"] = document_paths
-            # Construir URL de perfil (ya está en el campo url_perfil)
-            result["profile_url"] = candidate.get("url_perfil", "")
-                results.append(result)
-            except Exception as e:
-            error_msg = f"Error al procesar candidato {candidate.get('folio', 'desconocido')}: {e}\n{traceback.format_exc()}"
-            print(error_msg)
-            error_log.append(error_msg)
+    for (index, url, save_path), result in zip(jobs, job_results):
+        if isinstance(result, Exception):
+            error_log.append(f"Error al descargar {url}: {result}")
+        elif result:
+            docs_by_candidate.setdefault(index, []).append(result)
+            store_rows.append({
+                "folio": candidates[index]["folio"],
+                "kind": "photo" if os.path.dirname(save_path) == PHOTOS_DIR else "cv",
+                "url": url, "path": result["path"], "sha256": result["sha256"], "bytes": result["bytes"],
+            })
+    with CandidateStore(STORE_PATH) as store:
+        store.upsert_documents(store_rows)
+    
+    results = []
+    for index, candidate in enumerate(candidates):
+        result = candidate.copy()
+        documents = docs_by_candidate.get(index, [])
+        result["document_paths"] = [doc["path"] for doc in documents]
+        result["document_sha256"] = [doc["sha256"] for doc in documents]
+        # Construir URL de perfil (ya está en el campo url_perfil)
+        result["profile_url"] = candidate.get("url_perfil", "")
+        results.append(result)
+    
     # Guardar log de errores
     if error_log:
         with open(ERROR_LOG_PATH, 'a', encoding='utf-8') as f:
             for line in error_log:
                 f.write(line + '\n')
-    return results
+    save_checksums(doc for documents in docs_by_candidate.values() for doc in documents)
+    return results, stats.summary()
+
+def remove_candidate_files(folios):
+    """
+    Borra la foto, el CV y las capturas de perfil de los candidatos eliminados (modo delta)
+    y sus entradas del manifiesto y de checksums, para que las etapas siguientes no los
+    vuelvan a encontrar en disco. Regresa el número de archivos borrados.
+    """
+    patterns = []
+    for folio in folios:
+        folio = glob.escape(str(folio))
+        patterns += [os.path.join(PHOTOS_DIR, f"{folio}_photo.*"), os.path.join(DOCUMENTS_DIR, f"{folio}_cv.*"),
+                     os.path.join(PROFILES_DIR, f"{folio}_profile.html"),
+                     os.path.join(PROFILES_DIR, f"{folio}_screenshot.png")]
+    removed = {path for pattern in patterns for path in glob.glob(pattern)}
+    for path in removed:
+        os.remove(path)
+    if not removed:
+        return 0
+    manifest = DownloadManifest(MANIFEST_PATH)
+    manifest.entries = {url: entry for url, entry in manifest.entries.items() if entry.get("path") not in removed}
+    manifest.save()
+    if os.path.exists(CHECKSUMS_PATH):
+        relative = {os.path.relpath(path, OUTPUT_DIR) for path in removed}
+        with open(CHECKSUMS_PATH, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.rstrip('\n').partition('  ')[2] not in relative]
+        with open(CHECKSUMS_PATH, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+    return len(removed)
 
-def save_results_to_csv(results):
-    """Guarda los resultados en un archivo CSV."""
+def save_checksums(documents):
+    """Registra los sha256 de los documentos descargados en formato compatible con sha256sum."""
+    checksums = {}
+    # Conservar las entradas previas de archivos que no se descargaron en esta corrida
+    if os.path.exists(CHECKSUMS_PATH):
+        with open(CHECKSUMS_PATH, 'r', encoding='utf-8') as f:
+            for line in f:
+                digest, _, path = line.rstrip('\n').partition('  ')
+                if path:
+                    checksums[path] = digest
+    for doc in documents:
+        checksums[os.path.relpath(doc["path"], OUTPUT_DIR)] = doc["sha256"]
+    with open(CHECKSUMS_PATH, 'w', encoding='utf-8') as f:
+        for path in sorted(checksums):
+            f.write(f"{checksums[path]}  {path}\n")
+
+def save_results_to_csv(results, keep_existing=False, removed=()):
+    """
+    Guarda los resultados en un archivo CSV. Con keep_existing (modo delta) se conservan
+    las filas previas de los candidatos no procesados y se quitan las de los eliminados.
+    """
     # Preparar datos para CSV
     csv_data = []
     for result in results:
@@ -206,33 +386,80 @@ def save_results_to_csv(results):
             "categoria": result["categoria"],
             "profile_url": result.get("profile_url", ""),
             "profile_html_path": result.get("profile_html_path", ""),
-            "document_paths": "|".join(result.get("document_paths", []))
+            "document_paths": "|".join(result.get("document_paths", [])),
+            "document_sha256": "|".join(result.get("document_sha256", []))
         }
         csv_data.append(row)
     
     # Crear DataFrame y guardar como CSV
     df = pd.DataFrame(csv_data)
     csv_path = os.path.join(OUTPUT_DIR, "candidates_with_documents.csv")
-    df.to_csv(csv_path, index=False, encoding='utf-8')
+    if keep_existing and os.path.exists(csv_path):
+        existing = read_table(csv_path)
+        replaced = {str(row["folio"]) for row in csv_data} | {str(folio) for folio in removed}
+        existing = existing[~existing["folio"].astype(str).isin(replaced)]
+        df = pd.concat([existing, df], ignore_index=True)
+    write_table(df, csv_path)
     
     print(f"\nResultados guardados en {csv_path}")
     return csv_path
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Descarga fotos y CVs de los candidatos")
+    parser.add_argument("--limit", type=int, default=None, help="Procesar solo los primeros N candidatos")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Descargas simultáneas")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help="Conexiones simultáneas por host")
+    parser.add_argument("--max-size-mb", type=float, default=None, help="Tamaño máximo por documento en MB")
+    parser.add_argument("--only-missing", action="store_true",
+                        help="Descargar solo los documentos que no existen localmente")
+    parser.add_argument("--delta", default=None,
+                        help="Manifiesto delta de extract_candidates.py: procesar solo candidatos afectados")
+    parser.add_argument("--profiles", action="store_true",
+                        help="Capturar también el HTML de la página de perfil con un pool de navegadores")
+    parser.add_argument("--browsers", type=int, default=DEFAULT_BROWSERS,
+                        help="Contextos de navegador en paralelo para --profiles")
+    parser.add_argument("--screenshots", action="store_true", help="Guardar un screenshot de cada perfil")
+    parser.add_argument("--no-block-resources", action="store_true",
+                        help="No bloquear imágenes, fuentes ni analítica al capturar perfiles")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
 async def main():
     """Función principal para extraer perfiles y documentos de candidatos."""
+    args = parse_args()
     print("Iniciando extracción de perfiles y documentos de candidatos...")
     print(f"Fecha y hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    # Cargar todos los candidatos (sin límite)
-    candidates = load_candidates()
+    # Cargar candidatos (sin límite salvo que se indique)
+    candidates = load_candidates(args.limit)
+    delta = load_delta(args.delta) if args.delta else None
+    if delta:
+        folios = affected_folios(delta, DOCUMENT_FIELDS)
+        candidates = [c for c in candidates if str(c["folio"]) in folios]
+        print(f"Modo delta: {len(candidates)} candidatos afectados, {len(delta['removed'])} eliminados")
+        if delta["removed"]:
+            print(f"Archivos borrados de candidatos eliminados: {remove_candidate_files(delta['removed'])}")
     print(f"Se cargarán {len(candidates)} candidatos para procesamiento")
     # Procesar candidatos
-    results = await process_candidates(candidates)
+    max_bytes = int(args.max_size_mb * 1024 * 1024) if args.max_size_mb else None
+    results, summary = await process_candidates(candidates, args.concurrency, args.per_host, max_bytes,
+                                                only_missing=args.only_missing)
+    if args.profiles:
+        profile_paths = await capture_profiles(candidates, args.browsers, args.screenshots,
+                                               not args.no_block_resources, args.only_missing)
+        for result in results:
+            result["profile_html_path"] = profile_paths.get(result["folio"], "")
     # Guardar resultados
-    csv_path = save_results_to_csv(results)
+    csv_path = save_results_to_csv(results, keep_existing=bool(delta), removed=delta["removed"] if delta else ())
     print("\nResumen de la extracción:")
     print(f"Candidatos procesados: {len(results)}")
+    print(f"Documentos descargados: {summary['ok']}/{summary['total']} "
+          f"({summary['sin_cambios']} sin cambios, {summary['errores']} errores)")
+    print(f"Tiempo: {summary['segundos']} s, {summary['archivos_por_segundo']} archivos/s, {summary['mb_por_segundo']} MB/s")
     print(f"Resultados guardados en: {csv_path}")
+    counter("rows_processed_total", "Filas procesadas por la etapa").inc(len(results), kind="candidates", status="ok")
+    export_metrics("download")
     print("\nExtracción completada.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    with profile_from_argv("download"):
+        asyncio.run(main())
@@ -5,48 +5,133 @@ Este script obtiene y consolida la información de candidatos de diferentes cate
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import time
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
+from artifacts import write_records, write_table
+from candidate_store import CandidateStore
+from delta_manifest import compute_delta, load_snapshot, save_snapshot, snapshot_hashes
+from metrics import LATENCY_BUCKETS, SIZE_BUCKETS, counter, export as export_metrics, histogram, timer
+from profiling import profile_from_argv
 
 # Crear directorio para almacenar datos
 output_dir = os.path.join(os.getcwd(), "extract_candidates_output")
 os.makedirs(output_dir, exist_ok=True)
 
+# URL base del INE (se puede apuntar a un servidor local, p. ej. mock_servers.py)
+INE_BASE_URL = os.getenv("INE_BASE_URL", "https://candidaturaspoderjudicial.ine.mx").rstrip("/")
+
 # Endpoints identificados para candidatos judiciales
 ENDPOINTS = {
-    "jueces_distrito": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/juecesDistrito.json",
-    "magistrados_circuito": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/magistraturaTribunales.json",
-    "magistrados_sala_superior": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/magistraturaSalaSuperior.json",
-    "magistrados_sala_regional": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/magistraturaSalasRegionales.json",
-    "magistrados_tribunal_disciplina": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/magistraturaTribunalDJ.json",
-    "ministros_suprema_corte": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/ministrosSupremaCorte.json"
+    "jueces_distrito": f"{INE_BASE_URL}/cycc/documentos/json/juecesDistrito.json",
+    "magistrados_circuito": f"{INE_BASE_URL}/cycc/documentos/json/magistraturaTribunales.json",
+    "magistrados_sala_superior": f"{INE_BASE_URL}/cycc/documentos/json/magistraturaSalaSuperior.json",
+    "magistrados_sala_regional": f"{INE_BASE_URL}/cycc/documentos/json/magistraturaSalasRegionales.json",
+    "magistrados_tribunal_disciplina": f"{INE_BASE_URL}/cycc/documentos/json/magistraturaTribunalDJ.json",
+    "ministros_suprema_corte": f"{INE_BASE_URL}/cycc/documentos/json/ministrosSupremaCorte.json"
 }
 
 # Endpoint para catálogos
 CATALOG_ENDPOINTS = {
-    "estados": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/catalogoEstadosSecciones.json",
-    "tipos_candidaturas": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/catalogoTiposCandidaturas.json",
-    "grados_academicos": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/catalogoGradoAcademico.json",
-    "poderes_union": "https://candidaturaspoderjudicial.ine.mx/cycc/documentos/json/catalogoPoderesUnion.json"
+    "estados": f"{INE_BASE_URL}/cycc/documentos/json/catalogoEstadosSecciones.json",
+    "tipos_candidaturas": f"{INE_BASE_URL}/cycc/documentos/json/catalogoTiposCandidaturas.json",
+    "grados_academicos": f"{INE_BASE_URL}/cycc/documentos/json/catalogoGradoAcademico.json",
+    "poderes_union": f"{INE_BASE_URL}/cycc/documentos/json/catalogoPoderesUnion.json"
 }
 
-def fetch_json(url):
-    """Obtiene datos JSON desde una URL."""
+# Parámetros de red
+REQUEST_TIMEOUT = (10, 60)  # (conexión, lectura) en segundos
+MAX_WORKERS = 10
+MAX_RETRIES = 4
+
+def create_session():
+    """Crea una sesión con pool de conexiones, reintentos con backoff y compresión gzip."""
+    session = requests.Session()
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+    return session
+
+def record_http_metrics(url, response, elapsed):
+    """Registra latencia, bytes, estado y reintentos de una respuesta en las métricas de la corrida."""
+    endpoint = os.path.basename(url)
+    histogram("http_request_seconds", "Latencia de peticiones HTTP", LATENCY_BUCKETS).observe(
+        elapsed, endpoint=endpoint, status=response.status_code)
+    histogram("http_response_bytes", "Tamaño de respuestas HTTP", SIZE_BUCKETS).observe(
+        len(response.content), endpoint=endpoint)
+    counter("http_bytes_total", "Bytes descargados").inc(len(response.content), kind="json")
+    # Reintentos hechos por urllib3 antes de obtener esta respuesta
+    history = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+    if history:
+        counter("http_retries_total", "Reintentos de peticiones HTTP").inc(len(history), endpoint=endpoint)
+
+def fetch_json(url, session=None, metrics=None):
+    """Obtiene datos JSON desde una URL. Si se pasa metrics, registra latencia y tamaño."""
+    started = time.perf_counter()
     try:
-        response = requests.get(url)
+        response = (session or requests).get(url, timeout=REQUEST_TIMEOUT)
+        record_http_metrics(url, response, time.perf_counter() - started)
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if metrics is not None:
+            metrics[url] = {
+                "status": response.status_code,
+                "seconds": round(time.perf_counter() - started, 3),
+                "bytes": len(response.content),
+                "bytes_transferidos": int(response.headers.get("Content-Length") or len(response.content)),
+                "encoding": response.headers.get("Content-Encoding", "identity"),
+            }
+        return data
     except Exception as e:
         print(f"Error al obtener datos de {url}: {e}")
+        counter("http_errors_total", "Peticiones HTTP fallidas").inc(endpoint=os.path.basename(url))
+        if metrics is not None:
+            metrics[url] = {"status": "error", "seconds": round(time.perf_counter() - started, 3), "error": str(e)}
         return None
 
-def save_json(data, filename):
-    """Guarda datos en formato JSON."""
+def fetch_all(urls, session):
+    """
+    Descarga en paralelo todas las URLs de un dict nombre -> url sobre una misma sesión.
+    Regresa (dict nombre -> datos, dict url -> métricas).
+    """
+    metrics = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {name: executor.submit(fetch_json, url, session, metrics) for name, url in urls.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    return results, metrics
+
+def report_fetch_metrics(metrics, elapsed):
+    """Imprime y guarda las métricas por endpoint."""
+    print("\nMétricas de descarga por endpoint:")
+    for url, m in sorted(metrics.items(), key=lambda item: -item[1]["seconds"]):
+        if m["status"] == "error":
+            print(f"  {m['seconds']:>7.2f} s  ERROR  {url}")
+        else:
+            print(f"  {m['seconds']:>7.2f} s  {m['bytes'] / 1024:>9.1f} KB ({m['encoding']})  {url}")
+    print(f"Tiempo total de descarga: {elapsed:.2f} s "
+          f"(endpoint más lento: {max((m['seconds'] for m in metrics.values()), default=0):.2f} s)")
+    save_json({"segundos_total": round(elapsed, 3), "endpoints": metrics}, "fetch_metrics.json")
+
+def save_json(data, filename, indent=2):
+    """Guarda datos en formato JSON. Con indent=None se escribe compacto."""
     filepath = os.path.join(output_dir, filename)
     with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        # json.dumps (a diferencia de json.dump) usa el codificador en C cuando indent=None
+        f.write(json.dumps(data, ensure_ascii=False, indent=indent))
     print(f"Datos guardados en {filepath}")
     return filepath
 
@@ -54,18 +139,26 @@ def extract_candidates():
     """Extrae y consolida la lista de candidatos de todos los endpoints."""
     all_candidates = []
     
+    # Descargar catálogos y endpoints de candidatos en paralelo
+    urls = {("catalogo", name): url for name, url in CATALOG_ENDPOINTS.items()}
+    urls.update({("candidatos", category): url for category, url in ENDPOINTS.items()})
+    started = time.perf_counter()
+    with create_session() as session:
+        fetched, metrics = fetch_all(urls, session)
+    report_fetch_metrics(metrics, time.perf_counter() - started)
+    
     # Obtener catálogos para referencias
     catalogs = {}
-    for name, url in CATALOG_ENDPOINTS.items():
-        catalog_data = fetch_json(url)
+    for name in CATALOG_ENDPOINTS:
+        catalog_data = fetched[("catalogo", name)]
         if catalog_data:
             catalogs[name] = catalog_data
             save_json(catalog_data, f"catalog_{name}.json")
     
     # Procesar cada endpoint de candidatos
-    for category, url in ENDPOINTS.items():
+    for category in ENDPOINTS:
         print(f"\nObteniendo candidatos de: {category}")
-        data = fetch_json(url)
+        data = fetched[("candidatos", category)]
         
         if not data:
             print(f"No se pudieron obtener datos para {category}")
@@ -108,98 +201,180 @@ def extract_candidates():
     
     print(f"\nTotal de candidatos encontrados: {len(all_candidates)}")
     
-    # Guardar todos los candidatos en un solo archivo
+    # Guardar todos los candidatos en un solo archivo (JSON y Parquet columnar)
     save_json(all_candidates, "all_candidates.json")
+    write_records(all_candidates, os.path.join(output_dir, "all_candidates.json"))
     
     return all_candidates
 
+# Campos normalizados -> campos alternativos en orden de prioridad (y conversión opcional)
+FIELD_ALIASES = [
+    ("folio", ['folio', 'id', 'idCandidato', 'clave', 'folioRegistro'], str),
+    ("nombre", ['nombre', 'nombres', 'name', 'nombreCandidato'], None),
+    ("primer_apellido", ['primerApellido', 'apellido1', 'paterno', 'apellidoPaterno'], None),
+    ("segundo_apellido", ['segundoApellido', 'apellido2', 'materno', 'apellidoMaterno'], None),
+    ("genero", ['genero', 'sexo', 'gender'], None),
+    ("puesto", ['puesto', 'cargo', 'tipoCandidatura', 'position', 'nombreCargo'], None),
+    ("idCandidato", ['idCandidato', 'id'], str),
+    ("idTipoCandidatura", ['idTipoCandidatura'], str),
+]
+DOCUMENT_FIELDS = ['documentos', 'docs', 'archivos', 'attachments']
+CONSUMED_FIELDS = ({field for _, aliases, _ in FIELD_ALIASES for field in aliases}
+                   | set(DOCUMENT_FIELDS) | {'categoria', 'nombreCompleto'})
+REPORT_SAMPLE_SIZE = 50
+
+def first_truthy(fields, convert=None):
+    """
+    Lector del primer valor "verdadero" entre los campos presentes (en orden de prioridad),
+    con la conversión opcional; None si ninguno tiene valor.
+    """
+    if not fields:
+        def read(candidate):
+            return None
+        return read
+    getters = [itemgetter(field) for field in fields]
+
+    def read(candidate):
+        for getter in getters:
+            value = getter(candidate)
+            if value:
+                return convert(value) if convert else value
+        return None
+    return read
+
+def compile_normalizer(keys):
+    """
+    Resuelve una sola vez qué campos alternativos existen en un esquema (conjunto de llaves)
+    y regresa una función que normaliza registros de ese esquema leyendo solo esos campos.
+    La salida es idéntica a probar los campos uno por uno.
+    """
+    present = set(keys)
+    readers = [(target, first_truthy([field for field in aliases if field in present], convert))
+               for target, aliases, convert in FIELD_ALIASES]
+    document_getters = [itemgetter(field) for field in DOCUMENT_FIELDS if field in present]
+    has_full_name = 'nombreCompleto' in present
+    get_category = itemgetter('categoria') if 'categoria' in present else None
+
+    def normalize(candidate):
+        values = {target: read(candidate) for target, read in readers}
+        # Documentos: el primer campo que sea lista, en orden de prioridad
+        documentos = []
+        for getter in document_getters:
+            value = getter(candidate)
+            if isinstance(value, list):
+                documentos = value
+                break
+        if has_full_name and not values["nombre"]:
+            # Si no encontramos nombre pero hay nombreCompleto
+            parts = candidate['nombreCompleto'].split()
+            if len(parts) >= 3:
+                values["nombre"], values["primer_apellido"] = parts[0], parts[1]
+                values["segundo_apellido"] = ' '.join(parts[2:])
+            elif len(parts) == 2:
+                values["nombre"], values["primer_apellido"] = parts[0], parts[1]
+        id_candidato, id_tipo = values["idCandidato"], values["idTipoCandidatura"]
+        return {
+            "folio": values["folio"],
+            "nombre": values["nombre"],
+            "primer_apellido": values["primer_apellido"],
+            "segundo_apellido": values["segundo_apellido"],
+            "genero": values["genero"],
+            "puesto": values["puesto"],
+            "categoria": get_category(candidate) if get_category else '',
+            "url_perfil": (f"https://candidaturaspoderjudicial.ine.mx/detalleCandidato/{id_candidato}/{id_tipo}"
+                           if id_candidato and id_tipo else None),
+            "documentos": documentos,
+            "idCandidato": id_candidato,
+            "idTipoCandidatura": id_tipo,
+        }
+    return normalize
+
+def schema_report(keys, sample):
+    """Campos sin mapear y campos alternativos con valores en conflicto dentro de una muestra."""
+    conflicts = {}
+    for target, aliases, _ in FIELD_ALIASES:
+        fields = [field for field in aliases if field in keys]
+        if len(fields) < 2:
+            continue
+        for candidate in sample:
+            values = {str(candidate[field]) for field in fields if candidate[field]}
+            if len(values) > 1:
+                conflicts.setdefault(target, {"campos": fields, "registros": 0})["registros"] += 1
+    return {
+        "campos_sin_mapear": sorted(field for field in keys if field not in CONSUMED_FIELDS),
+        "conflictos": conflicts,
+    }
+
 def normalize_candidates(candidates):
     """Normaliza los datos de candidatos para tener una estructura uniforme."""
     normalized = []
+    # Un normalizador compilado por esquema (normalmente uno por endpoint/categoría)
+    normalizers = {}
+    samples = {}
     
     for candidate in candidates:
         try:
-            normalized_candidate = {
-                "folio": None,
-                "nombre": None,
-                "primer_apellido": None,
-                "segundo_apellido": None,
-                "genero": None,
-                "puesto": None,
-                "categoria": candidate.get('categoria', ''),
-                "url_perfil": None,
-                "documentos": [],
-                "idCandidato": None,
-                "idTipoCandidatura": None
-            }
-            # Folio
-            for field in ['folio', 'id', 'idCandidato', 'clave', 'folioRegistro']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["folio"] = str(candidate[field])
-                    break
-            # Nombre
-            for field in ['nombre', 'nombres', 'name', 'nombreCandidato']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["nombre"] = candidate[field]
-                    break
-            # Primer apellido
-            for field in ['primerApellido', 'apellido1', 'paterno', 'apellidoPaterno']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["primer_apellido"] = candidate[field]
-                    break
-            # Segundo apellido
-            for field in ['segundoApellido', 'apellido2', 'materno', 'apellidoMaterno']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["segundo_apellido"] = candidate[field]
-                    break
-            # Género
-            for field in ['genero', 'sexo', 'gender']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["genero"] = candidate[field]
-                    break
-            # Puesto
-            for field in ['puesto', 'cargo', 'tipoCandidatura', 'position', 'nombreCargo']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["puesto"] = candidate[field]
-                    break
-            # idCandidato
-            for field in ['idCandidato', 'id']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["idCandidato"] = str(candidate[field])
-                    break
-            # idTipoCandidatura
-            for field in ['idTipoCandidatura']:
-                if field in candidate and candidate[field]:
-                    normalized_candidate["idTipoCandidatura"] = str(candidate[field])
-                    break
-            # URL del perfil
-            if normalized_candidate["idCandidato"] and normalized_candidate["idTipoCandidatura"]:
-                normalized_candidate["url_perfil"] = f"https://candidaturaspoderjudicial.ine.mx/detalleCandidato/{normalized_candidate['idCandidato']}/{normalized_candidate['idTipoCandidatura']}"
-            # Documentos
-            for field in ['documentos', 'docs', 'archivos', 'attachments']:
-                if field in candidate and isinstance(candidate[field], list):
-                    normalized_candidate["documentos"] = candidate[field]
-                    break
-            # Si no encontramos nombre pero hay nombreCompleto
-            if not normalized_candidate["nombre"] and 'nombreCompleto' in candidate:
-                parts = candidate['nombreCompleto'].split()
-                if len(parts) >= 3:
-                    normalized_candidate["nombre"] = parts[0]
-                    normalized_candidate["primer_apellido"] = parts[1]
-                    normalized_candidate["segundo_apellido"] = ' '.join(parts[2:])
-                elif len(parts) == 2:
-                    normalized_candidate["nombre"] = parts[0]
-                    normalized_candidate["primer_apellido"] = parts[1]
+            schema = tuple(candidate)
+            normalize = normalizers.get(schema)
+            if normalize is None:
+                normalize = normalizers[schema] = compile_normalizer(schema)
+                samples[schema] = sample = []
+            else:
+                sample = samples[schema]
+            if len(sample) < REPORT_SAMPLE_SIZE:
+                sample.append(candidate)
+            normalized_candidate = normalize(candidate)
             # Verificar si tenemos al menos nombre o folio para identificar al candidato
             if normalized_candidate["nombre"] or normalized_candidate["folio"]:
                 normalized.append(normalized_candidate)
         except Exception as e:
             print(f"Error al normalizar candidato: {e}")
             print(f"Datos del candidato: {candidate}")
-    print(f"Candidatos normalizados: {len(normalized)}")
-    save_json(normalized, "normalized_candidates.json")
+    
+    # Reporte de campos sin mapear o en conflicto por categoría
+    report = {}
+    for schema, sample in samples.items():
+        category = str(sample[0].get('categoria', '')) if sample else ''
+        entry = report.setdefault(category, {"esquemas": 0, "campos_sin_mapear": set(), "conflictos": {}})
+        schema_info = schema_report(set(schema), sample)
+        entry["esquemas"] += 1
+        entry["campos_sin_mapear"].update(schema_info["campos_sin_mapear"])
+        # Varios esquemas pueden chocar en el mismo campo: se suman registros y se unen los campos
+        for target, conflict in schema_info["conflictos"].items():
+            merged = entry["conflictos"].setdefault(target, {"campos": [], "registros": 0})
+            merged["campos"] += [field for field in conflict["campos"] if field not in merged["campos"]]
+            merged["registros"] += conflict["registros"]
+    for entry in report.values():
+        entry["campos_sin_mapear"] = sorted(entry["campos_sin_mapear"])
+        if entry["conflictos"]:
+            print(f"Advertencia: campos en conflicto al normalizar: {entry['conflictos']}")
+    save_json(report, "normalization_report.json")
+    
+    print(f"Candidatos normalizados: {len(normalized)} ({len(normalizers)} esquemas)")
+    save_json(normalized, "normalized_candidates.json", indent=None)
     return normalized
 
+def detect_changes(candidates):
+    """
+    Compara los hashes por candidato con los de la extracción anterior y guarda el
+    manifiesto delta (agregados, modificados con sus campos, eliminados).
+    """
+    snapshot_path = os.path.join(output_dir, "snapshot_hashes.json")
+    previous = load_snapshot(snapshot_path)
+    current = snapshot_hashes(candidates)
+    # Si un endpoint falló, sus candidatos no se dan por eliminados: se conservan del snapshot anterior
+    fetched_categories = {c.get('categoria') for c in candidates if isinstance(c, dict)}
+    failed_categories = set(ENDPOINTS) - fetched_categories
+    for folio, entry in previous.items():
+        if folio not in current and entry.get("categoria") in failed_categories:
+            current[folio] = entry
+    delta = compute_delta(previous, current)
+    save_json(delta, "delta_manifest.json")
+    save_snapshot(current, snapshot_path)
+    print(f"Cambios desde la extracción anterior: {len(delta['added'])} agregados, "
+          f"{len(delta['modified'])} modificados, {len(delta['removed'])} eliminados")
+    return delta
+
 def create_candidates_dataframe(candidates, limit=None):
     """Crea un DataFrame con los candidatos normalizados."""
     # Limitar a los primeros N candidatos si se especifica
@@ -209,10 +384,10 @@ def create_candidates_dataframe(candidates, limit=None):
     # Crear DataFrame
     df = pd.DataFrame(candidates)
     
-    # Guardar como CSV
+    # Guardar como CSV y Parquet
     csv_path = os.path.join(output_dir, "candidates.csv")
-    df.to_csv(csv_path, index=False, encoding='utf-8')
-    print(f"DataFrame guardado en {csv_path}")
+    write_table(df, csv_path)
+    print(f"DataFrame guardado en {csv_path} (y .parquet)")
     
     return df
 
@@ -225,7 +400,17 @@ def main():
     all_candidates = extract_candidates()
     
     # Normalizar datos de candidatos
-    normalized_candidates = normalize_candidates(all_candidates)
+    with timer("step_seconds", "Duración de cada paso de la etapa", step="normalize"):
+        normalized_candidates = normalize_candidates(all_candidates)
+    
+    # Detectar cambios respecto a la extracción anterior
+    delta = detect_changes(all_candidates)
+    
+    # Registrar candidatos crudos y normalizados en el almacén compartido
+    with CandidateStore(os.path.join(output_dir, "candidates.sqlite")) as store:
+        store.upsert_raw(all_candidates)
+        store.upsert_normalized(normalized_candidates)
+        store.delete_candidates(delta["removed"])
     
     # Crear DataFrame limitado a 10 candidatos para prueba
     candidates_df = create_candidates_dataframe(normalized_candidates)
@@ -235,7 +420,15 @@ def main():
     print(f"Candidatos normalizados: {len(normalized_candidates)}")
     print(f"Candidatos en DataFrame de prueba: {len(candidates_df)}")
     
+    rows = counter("rows_processed_total", "Filas procesadas por la etapa")
+    rows.inc(len(all_candidates), kind="raw", status="ok")
+    rows.inc(len(normalized_candidates), kind="normalized", status="ok")
+    for change in ("added", "modified", "removed"):
+        counter("candidates_changed_total", "Candidatos con cambios respecto a la extracción anterior").inc(
+            len(delta[change]), change=change)
+    export_metrics("extract")
     print("\nExtracción completada.")
 
 if __name__ == "__main__":
-    main()
+    with profile_from_argv("extract"):
+        main()
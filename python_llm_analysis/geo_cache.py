@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Caché binaria de capas geográficas. La primera lectura de un shapefile lo convierte a
+GeoParquet (geometrías en WKB, columnas en minúsculas, zstd) junto al original; las
+siguientes cargan el GeoParquet, y las lecturas sin geometría leen solo las columnas de
+atributos. La caché se identifica por el sha256 del shapefile y sus archivos
+auxiliares (.shx, .dbf, .prj, .cpg): si cualquiera cambia, se reconstruye.
+
+Uso:
+    python geo_cache.py                      # convierte distritos_judiciales_mexico.shp
+    python geo_cache.py ruta/capa.shp --rebuild
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+
+DISTRITOS_DIR = os.environ.get("DISTRITOS_DIR", os.path.join(os.getcwd(), "distritos_judiciales"))
+SHAPEFILE_PATH = os.path.join(DISTRITOS_DIR, "output", "distritos_judiciales_mexico.shp")
+CACHE_DIRNAME = ".geo_cache"
+# Hashes ya calculados por (tamaño, fecha) de los archivos, para no releer el shapefile
+HASHES_FILENAME = "hashes.json"
+SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def source_files(path):
+    """El shapefile y sus auxiliares existentes (cualquier otro formato es un solo archivo)."""
+    stem, ext = os.path.splitext(path)
+    if ext.lower() != ".shp":
+        return [path]
+    return [stem + part for part in SHAPEFILE_PARTS if os.path.exists(stem + part)]
+
+
+def source_hash(path):
+    """sha256 del contenido de todos los archivos de la capa."""
+    digest = hashlib.sha256()
+    for part in source_files(path):
+        digest.update(os.path.splitext(part)[1].lower().encode("ascii"))
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRNAME)
+
+
+def load_hashes(path):
+    hashes_path = os.path.join(cache_dir(path), HASHES_FILENAME)
+    if os.path.exists(hashes_path):
+        with open(hashes_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_hashes(path, hashes):
+    hashes_path = os.path.join(cache_dir(path), HASHES_FILENAME)
+    with open(hashes_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(hashes, f, sort_keys=True)
+    os.replace(hashes_path + ".tmp", hashes_path)
+
+
+def cached_source_hash(path):
+    """
+    sha256 de la capa, reutilizando el de la corrida anterior si ningún archivo cambió de
+    tamaño ni de fecha (igual que convert_pdfs_to_text.py con los PDFs).
+    """
+    stat = [[os.path.basename(part), os.stat(part).st_size, os.stat(part).st_mtime_ns] for part in source_files(path)]
+    hashes = load_hashes(path)
+    name = os.path.basename(path)
+    previous = hashes.get(name)
+    if previous and previous["stat"] == stat:
+        return previous["sha256"]
+    digest = source_hash(path)
+    os.makedirs(cache_dir(path), exist_ok=True)
+    hashes[name] = {"stat": stat, "sha256": digest}
+    save_hashes(path, hashes)
+    return digest
+
+
+def cache_path(path, digest):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir(path), f"{stem}-{digest[:16]}.parquet")
+
+
+def build_cache(path, target):
+    """Lee la capa original, normaliza columnas a minúsculas y la guarda como GeoParquet."""
+    gdf = gpd.read_file(path).rename(columns=str.lower)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + ".tmp"
+    gdf.to_parquet(tmp_path, index=False, compression="zstd")
+    os.replace(tmp_path, target)
+    # Versiones anteriores de la misma capa ya no sirven; solo se borra {stem}-<16 hex>.parquet
+    # para no tocar la caché de otra capa cuyo nombre empiece igual (p. ej. {stem}-norte)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stale = re.compile(re.escape(stem) + r"-[0-9a-f]{16}\.parquet")
+    for name in os.listdir(os.path.dirname(target)):
+        if stale.fullmatch(name) and name != os.path.basename(target):
+            os.remove(os.path.join(os.path.dirname(target), name))
+    return gdf
+
+
+def ensure_cache(path, rebuild=False):
+    """Ruta del GeoParquet de la capa, construyéndolo si no existe o si se pide rebuild."""
+    target = cache_path(path, cached_source_hash(path))
+    if rebuild or not os.path.exists(target):
+        build_cache(path, target)
+    return target
+
+
+def read_geodataframe(path=SHAPEFILE_PATH, columns=None):
+    """
+    GeoDataFrame de la capa (columnas en minúsculas) desde la caché. Con columns se cargan
+    solo esas columnas de atributos, además de la geometría.
+    """
+    target = ensure_cache(path)
+    if columns is not None:
+        available = set(pq.read_schema(target).names)
+        columns = [col for col in columns if col in available] + ["geometry"]
+    return gpd.read_parquet(target, columns=columns)
+
+
+def read_attributes(path=SHAPEFILE_PATH, columns=None):
+    """Atributos de la capa sin la geometría (no se leen ni decodifican los WKB)."""
+    target = ensure_cache(path)
+    names = [name for name in pq.read_schema(target).names if name != "geometry"]
+    if columns is not None:
+        names = [name for name in names if name in columns]
+    return pd.read_parquet(target, columns=names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte una capa geográfica a la caché GeoParquet")
+    parser.add_argument("path", nargs="?", default=SHAPEFILE_PATH, help="Shapefile de origen")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruir aunque la caché esté al día")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    gpd.read_file(args.path)
+    shapefile_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    target = ensure_cache(args.path, args.rebuild)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    gdf = read_geodataframe(args.path)
+    cache_seconds = time.perf_counter() - started
+    size_mb = sum(os.path.getsize(part) for part in source_files(args.path)) / 1e6
+    print(f"{len(gdf)} geometrías en {target} ({os.path.getsize(target) / 1e6:.1f} MB; origen {size_mb:.1f} MB)")
+    print(f"Lectura del shapefile: {shapefile_seconds:.2f} s; preparar caché: {build_seconds:.2f} s; "
+          f"lectura de la caché: {cache_seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
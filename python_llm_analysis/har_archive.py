@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Grabación y reproducción de archivos HAR del sitio del INE.
+- record: proxy local hacia el sitio real que guarda cada petición y respuesta completa
+  (encabezados y cuerpo) en un HAR 1.2. Las etapas se apuntan al proxy con INE_BASE_URL.
+- replay: servidor local que responde desde uno o más HAR (del proxy o grabados con
+  analyze_structure.py --record-har), sin red. Las peticiones se buscan por método,
+  ruta y query; lo que no esté grabado responde 404.
+Con `-- comando` se corre el comando con INE_BASE_URL apuntando al servidor y al
+terminar se detiene (y en record se guarda el HAR).
+
+Uso:
+    python har_archive.py record har_archives/ine.har -- python extract_candidates.py
+    python har_archive.py record har_archives/ine.har -- python download_profiles.py --profiles
+    python har_archive.py replay har_archives/ine.har -- python extract_candidates.py
+    python har_archive.py replay har_archives/*.har --port 8083   # servidor en primer plano
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+from mock_servers import MockConfig, MockHandler, start_server
+
+HAR_DIR = "har_archives"
+DEFAULT_UPSTREAM = "https://candidaturaspoderjudicial.ine.mx"
+DEFAULT_PORT = 8083
+UPSTREAM_TIMEOUT = 60
+SAVE_INTERVAL = 10
+# Al grabar se piden respuestas completas y sin comprimir, para que el HAR tenga el cuerpo
+SKIP_REQUEST_HEADERS = {"host", "connection", "accept-encoding", "if-none-match", "if-modified-since",
+                        "keep-alive", "proxy-connection", "te", "upgrade"}
+# Encabezados que dependen de la transferencia original y no del contenido
+SKIP_RESPONSE_HEADERS = {"content-encoding", "content-length", "content-type", "transfer-encoding",
+                         "connection", "keep-alive"}
+TEXT_TYPES = ("text/", "json", "javascript", "xml")
+
+
+def har_headers(headers):
+    return [{"name": name, "value": value} for name, value in headers.items()]
+
+
+def make_entry(method, url, request_headers, status, reason, response_headers, body, started, elapsed_ms):
+    """Entrada HAR 1.2; el cuerpo va como texto si es UTF-8 legible y en base64 si no."""
+    mime_type = response_headers.get("Content-Type", "")
+    content = {"size": len(body), "mimeType": mime_type}
+    if any(kind in mime_type for kind in TEXT_TYPES):
+        try:
+            content["text"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    if "text" not in content:
+        content["text"] = base64.b64encode(body).decode("ascii")
+        content["encoding"] = "base64"
+    return {
+        "startedDateTime": started.isoformat(),
+        "time": round(elapsed_ms, 3),
+        "request": {
+            "method": method, "url": url, "httpVersion": "HTTP/1.1",
+            "headers": har_headers(request_headers), "cookies": [],
+            "queryString": [{"name": k, "value": v} for k, v in parse_qsl(urlsplit(url).query)],
+            "headersSize": -1, "bodySize": 0,
+        },
+        "response": {
+            "status": status, "statusText": reason or "", "httpVersion": "HTTP/1.1",
+            "headers": har_headers(response_headers), "cookies": [], "content": content,
+            "redirectURL": "", "headersSize": -1, "bodySize": len(body),
+        },
+        "cache": {},
+        "timings": {"send": 0, "wait": round(elapsed_ms, 3), "receive": 0},
+    }
+
+
+def entry_body(entry):
+    content = entry["response"].get("content", {})
+    text = content.get("text")
+    if text is None:
+        return b""
+    return base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+
+
+class HarWriter:
+    """Acumula entradas de varios hilos y escribe el HAR de forma atómica."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+
+    def save(self):
+        with self._lock:
+            har = {"log": {"version": "1.2", "creator": {"name": "har_archive.py", "version": "1.0"},
+                           "entries": list(self.entries)}}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(har, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        return len(har["log"]["entries"])
+
+
+class HarArchive:
+    """Índice de respuestas grabadas por (método, ruta, query); la última grabación gana."""
+
+    def __init__(self, paths):
+        self.entries = {}
+        self.count = 0
+        self.misses = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for entry in json.load(f)["log"]["entries"]:
+                    self.add(entry)
+
+    def add(self, entry):
+        status = entry["response"].get("status", 0)
+        # Peticiones abortadas o revalidaciones sin cuerpo no sirven para responder
+        if status <= 0 or status == 304:
+            return
+        method = entry["request"]["method"].upper()
+        parts = urlsplit(entry["request"]["url"])
+        self.entries[(method, parts.path, parts.query)] = entry
+        self.entries[(method, parts.path, None)] = entry
+        self.count += 1
+
+    def find(self, method, path):
+        """Respuesta para la ruta pedida; si la query no coincide, la última de la misma ruta."""
+        method = "GET" if method.upper() == "HEAD" else method.upper()
+        parts = urlsplit(path)
+        return self.entries.get((method, parts.path, parts.query)) or self.entries.get((method, parts.path, None))
+
+
+class RecordHandler(MockHandler):
+    """Reenvía cada petición al sitio real y la guarda en el HAR."""
+    upstream = DEFAULT_UPSTREAM
+    writer = None
+
+    def do_GET(self):
+        url = self.upstream + self.path
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in SKIP_REQUEST_HEADERS}
+        request = urllib.request.Request(url, headers=headers, method=self.command)
+        started = datetime.now(timezone.utc)
+        clock = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT) as response:
+                status, reason, response_headers, body = response.status, response.reason, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, reason, response_headers, body = e.code, e.reason, e.headers, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Error al consultar {url}: {e}", file=sys.stderr)
+            self.send_body(502, json.dumps({"error": str(e)}).encode("utf-8"))
+            return
+        self.writer.add(make_entry(self.command, url, headers, status, reason, response_headers, body,
+                                   started, (time.perf_counter() - clock) * 1000))
+        forwarded = {name: value for name, value in response_headers.items() if name.lower() not in SKIP_RESPONSE_HEADERS}
+        self.send_body(status, body, response_headers.get("Content-Type", "application/octet-stream"), forwarded)
+
+    do_HEAD = do_GET
+
+
+class ReplayHandler(MockHandler):
+    """Responde desde el HAR, con ETag/304 si la respuesta grabada trae ETag."""
+    archive = None
+
+    def do_GET(self):
+        if self.send_simulated_error():
+            return
+        entry = self.archive.find(self.command, self.path)
+        if entry is None:
+            self.archive.misses.append(self.path)
+            self.send_body(404, b'{"error": "not recorded"}')
+            return
+        response = entry["response"]
+        content_type = response.get("content", {}).get("mimeType") or "application/octet-stream"
+        headers = {h["name"]: h["value"] for h in response.get("headers", [])
+                   if h["name"].lower() not in SKIP_RESPONSE_HEADERS}
+        etag = next((value for name, value in headers.items() if name.lower() == "etag"), None)
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_body(response["status"], entry_body(entry), content_type, headers)
+
+    do_HEAD = do_GET
+
+
+def start_recorder(output, upstream=DEFAULT_UPSTREAM, host="127.0.0.1", port=DEFAULT_PORT):
+    """Arranca el proxy de grabación; regresa (servidor, HarWriter, variables de entorno)."""
+    writer = HarWriter(output)
+    server = start_server(RecordHandler, host, port, MockConfig(), upstream=upstream.rstrip("/"), writer=writer)
+    return server, writer, {"INE_BASE_URL": f"http://{host}:{server.server_address[1]}"}
+
+
+def start_replay(paths, host="127.0.0.1", port=DEFAULT_PORT, config=None):
+    """Arranca el servidor de reproducción; regresa (servidor, HarArchive, variables de entorno)."""
+    archive = HarArchive(paths)
+    server = start_server(ReplayHandler, host, port, config or MockConfig(), archive=archive)
+    return server, archive, {"INE_BASE_URL": f"http://{host}:{server.server_address[1]}"}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Graba o reproduce archivos HAR del sitio del INE")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    record = subparsers.add_parser("record", help="Proxy hacia el sitio real que graba un HAR")
+    record.add_argument("output", nargs="?", default=os.path.join(HAR_DIR, "ine.har"), help="HAR de salida")
+    record.add_argument("--upstream", default=DEFAULT_UPSTREAM, help="Sitio real al que se reenvían las peticiones")
+    replay = subparsers.add_parser("replay", help="Servidor que responde desde archivos HAR")
+    replay.add_argument("archives", nargs="+", help="Archivos HAR (los posteriores tienen prioridad)")
+    replay.add_argument("--latency-ms", type=float, default=0.0, help="Latencia simulada por petición")
+    replay.add_argument("--jitter-ms", type=float, default=0.0, help="Variación uniforme de la latencia")
+    for subparser in (record, replay):
+        subparser.add_argument("--host", default="127.0.0.1")
+        subparser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto local (0 = cualquiera libre)")
+    return parser.parse_args(argv)
+
+
+def main():
+    # Lo que sigue a "--" es el comando a ejecutar contra el servidor
+    argv = sys.argv[1:]
+    command = []
+    if "--" in argv:
+        index = argv.index("--")
+        argv, command = argv[:index], argv[index + 1:]
+    args = parse_args(argv)
+
+    if args.mode == "record":
+        server, writer, env = start_recorder(args.output, args.upstream, args.host, args.port)
+        print(f"Grabando {args.upstream} en {args.output}")
+    else:
+        config = MockConfig(args.latency_ms, args.jitter_ms)
+        server, archive, env = start_replay(args.archives, args.host, args.port, config)
+        print(f"Reproduciendo {archive.count} respuestas de {len(args.archives)} archivos HAR")
+
+    def finish():
+        server.shutdown()
+        if args.mode == "record":
+            print(f"{writer.save()} peticiones guardadas en {args.output}")
+        elif archive.misses:
+            print(f"{len(archive.misses)} peticiones sin respuesta grabada, p. ej. {archive.misses[0]}")
+
+    if command:
+        returncode = subprocess.run(command, env=dict(os.environ, **env)).returncode
+        finish()
+        sys.exit(returncode)
+    print("Servidor en ejecución. Para usarlo en el pipeline:")
+    for name, value in env.items():
+        print(f"  export {name}={value}")
+    try:
+        while True:
+            time.sleep(SAVE_INTERVAL)
+            if args.mode == "record":
+                writer.save()
+    except KeyboardInterrupt:
+        finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,104 @@
-import csv
-import json
+import os
+import pandas as pd
+from artifacts import read_table, write_table
+from candidate_store import DEFAULT_STORE_PATH, CandidateStore
+from metrics import counter, export as export_metrics, timer
+from profiling import profile_from_argv
 
 # Paths de entrada y salida
 SCORES_CSV = "extract_candidates_output/candidates_scored_2.csv"
 ALL_CANDIDATES_JSON = "extract_candidates_output/all_candidates.json"
 CANDIDATES_CSV = "extract_candidates_output/candidates.csv"
 OUTPUT_CSV = "extract_candidates_output/candidates_scored_full_2.csv"
+PROFILES_CSV = "download_profiles_output/profiles_parsed.csv"
 
-# Leer JSON de candidatos
-with open(ALL_CANDIDATES_JSON, "r", encoding="utf-8") as f:
-    all_candidates = json.load(f)
+# Columnas extra que se agregan a los scores
+EXTRA_COLS = [
+    "nombreEstado", "idDistritoJudicial", "idTipoCandidatura", "categoria", "nombreCorto", "sexo", "url_perfil"
+]
 
-# Indexar por idCandidato (como str por seguridad)
-cand_info = {str(c["idCandidato"]): c for c in all_candidates}
+# Columnas de los perfiles HTML (parse_profiles_html.py); se agregan solo si ya se parsearon
+PROFILE_COLS = ["formacion", "trayectoria", "cursos", "motivacion", "correo", "enlaces"]
 
-# Leer candidates.csv para obtener url_perfil por folio
-folio_to_url = {}
-with open(CANDIDATES_CSV, "r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        folio_to_url[str(row["folio"])] = row.get("url_perfil", "")
+def _as_key(series):
+    """Llave de unión como texto (p. ej. 123 y "123" coinciden)."""
+    return series.astype(str)
 
-# Leer CSV de scores y unir
-with open(SCORES_CSV, "r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
+def load_candidate_info(columns, store=None):
+    """
+    Lee solo idCandidato y las columnas pedidas de los candidatos crudos (del almacén si
+    está poblado, si no de all_candidates), indexado por idCandidato (str).
+    """
+    if store is not None and store.count("raw_candidates"):
+        info = pd.DataFrame(store.raw_candidates(), dtype=object).reindex(columns=["idCandidato"] + columns)
+    else:
+        info = read_table(ALL_CANDIDATES_JSON, columns=["idCandidato"] + columns)
+    info = info[info["idCandidato"].notna()]
+    info = info.assign(_folio=_as_key(info["idCandidato"])).drop(columns=["idCandidato"])
+    # Igual que un dict {idCandidato: candidato}: gana la última aparición
+    return info.drop_duplicates("_folio", keep="last")
 
-# Determinar columnas extra del JSON
-extra_cols = [
-    "nombreEstado", "idDistritoJudicial", "idTipoCandidatura", "categoria", "nombreCorto", "sexo", "url_perfil"
-]
+def load_profile_urls(store=None):
+    """Lee solo folio y url_perfil (del almacén si está poblado, si no de candidates.csv)."""
+    if store is not None and store.count("normalized_candidates"):
+        urls = pd.DataFrame(list(store.profile_urls().items()), columns=["folio", "url_perfil"])
+    else:
+        urls = read_table(CANDIDATES_CSV, columns=["folio", "url_perfil"])
+    urls = urls.assign(_folio=_as_key(urls["folio"])).drop(columns=["folio"])
+    return urls.drop_duplicates("_folio", keep="last")
+
+def load_profile_fields(columns):
+    """Lee folio y las columnas pedidas de los perfiles parseados; None si no existen o están vacíos."""
+    if not os.path.exists(PROFILES_CSV):
+        return None
+    profiles = read_table(PROFILES_CSV, columns=["folio"] + columns)
+    if profiles.empty:
+        return None
+    profiles = profiles.assign(_folio=_as_key(profiles["folio"])).drop(columns=["folio"])
+    return profiles.drop_duplicates("_folio", keep="last")
+
+def join_profiles(joined, profiles, profile_cols=PROFILE_COLS):
+    """Agrega las columnas de los perfiles HTML por folio (vacías si el perfil no se capturó)."""
+    cols = [col for col in profile_cols if col in profiles.columns]
+    joined = joined.assign(_folio=_as_key(joined["folio"]))
+    joined = joined.merge(profiles[["_folio"] + cols], on="_folio", how="left").drop(columns=["_folio"])
+    for col in cols:
+        joined[col] = joined[col].astype(object).where(joined[col].notna(), "")
+    return joined
+
+def join_scores(scores, info, urls, extra_cols=EXTRA_COLS):
+    """Une los scores con las columnas extra del candidato y la URL de perfil."""
+    base_cols = [col for col in scores.columns if col not in extra_cols]
+    joined = scores[base_cols].assign(_folio=_as_key(scores["folio"]))
+    info_cols = [col for col in extra_cols if col != "url_perfil" and col in info.columns]
+    joined = joined.merge(info[["_folio"] + info_cols], on="_folio", how="left")
+    if "url_perfil" in extra_cols and "url_perfil" in urls.columns:
+        joined = joined.merge(urls[["_folio", "url_perfil"]], on="_folio", how="left")
+    for col in extra_cols:
+        if col not in joined.columns:
+            joined[col] = ""
+        else:
+            joined[col] = joined[col].astype(object).where(joined[col].notna(), "")
+    return joined[base_cols + list(extra_cols)]
+
+def main():
+    with timer("step_seconds", "Duración de cada paso de la etapa", step="load"):
+        scores = read_table(SCORES_CSV)
+        with CandidateStore(DEFAULT_STORE_PATH) as store:
+            info = load_candidate_info([col for col in EXTRA_COLS if col != "url_perfil"], store)
+            urls = load_profile_urls(store)
+        profiles = load_profile_fields(PROFILE_COLS)
+    with timer("step_seconds", "Duración de cada paso de la etapa", step="join"):
+        joined = join_scores(scores, info, urls)
+        if profiles is not None:
+            joined = join_profiles(joined, profiles)
+    with timer("step_seconds", "Duración de cada paso de la etapa", step="write"):
+        write_table(joined, OUTPUT_CSV)
+    print(f"Archivo unido guardado en {OUTPUT_CSV}")
+    counter("rows_processed_total", "Filas procesadas por la etapa").inc(len(joined), kind="scores", status="ok")
+    counter("profile_urls_missing_total", "Filas unidas sin URL de perfil").inc(int(joined["url_perfil"].eq("").sum()))
+    export_metrics("join")
 
-# Columnas base del CSV de scores
-base_cols = list(rows[0].keys())
-
-# Crear cabecera final
-header = base_cols + extra_cols
-
-# Escribir nuevo CSV
-with open(OUTPUT_CSV, "w", encoding="utf-8", newline="") as f:
-    writer = csv.DictWriter(f, fieldnames=header)
-    writer.writeheader()
-    for row in rows:
-        folio = str(row["folio"])
-        info = cand_info.get(folio, {})
-        for col in extra_cols:
-            if col == "url_perfil":
-                row[col] = folio_to_url.get(folio, "")
-            else:
-                row[col] = info.get(col, "")
-        writer.writerow(row)
-
-print(f"Archivo unido guardado en {OUTPUT_CSV}") 
\ No newline at end of file
+if __name__ == "__main__":
+    with profile_from_argv("join"):
+        main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Caché en disco (SQLite) de respuestas del LLM, direccionada por contenido.
+La llave es el hash de (modelo, prompt, parámetros), así que solo se vuelve a
+pagar por los candidatos cuyo prompt realmente cambió.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = "extract_candidates_output/llm_cache.sqlite"
+
+
+def cache_key(model, prompt, params=None):
+    """Hash estable de la petición al modelo."""
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params or {}},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Guarda respuestas ya validadas. ttl_seconds descarta entradas viejas y
+    max_entries limita el tamaño expulsando las menos usadas recientemente (LRU).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=None, max_entries=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Regresa la respuesta guardada o None si no existe o ya expiró."""
+        row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            self.expired += 1
+            row = None
+        if not row:
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, model, json.dumps(response, ensure_ascii=False), now, now),
+        )
+        if self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.evicted += max(cursor.rowcount, 0)
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Capa mínima de instrumentación del pipeline: contadores, histogramas y temporizadores
+con etiquetas. Al final de cada etapa se exporta un reporte JSON de la corrida y un
+archivo de texto en formato Prometheus (para el textfile collector de node_exporter).
+
+Uso:
+    import metrics
+    metrics.counter("http_bytes_total", "Bytes descargados").inc(n, kind="pdf")
+    with metrics.timer("llm_request_seconds", "Latencia del LLM"):
+        ...
+    metrics.export("score")
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR = os.environ.get("PIPELINE_METRICS_DIR", "metrics")
+PREFIX = "pjmx_"
+
+# Buckets por defecto (segundos) para latencias de red y del LLM
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Valor acumulado por combinación de etiquetas."""
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in sorted(self._values.items())]
+
+    def prometheus(self, extra=()):
+        with self._lock:
+            return [f"{PREFIX}{self.name}{_format_labels(key, extra)} {value}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Distribución por buckets acumulativos, con suma, conteo, mínimo y máximo."""
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0,
+                                              "count": 0, "min": value, "max": value}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["min"] = min(series["min"], value)
+            series["max"] = max(series["max"], value)
+
+    def quantile(self, series, q):
+        """Estimación por interpolación lineal dentro del bucket (como histogram_quantile)."""
+        target = q * series["count"]
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (series["max"],), series["counts"]):
+            if count and cumulative + count >= target:
+                upper = min(bound, series["max"])
+                lower = max(lower, series["min"])
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = bound
+        return series["max"]
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted(self._series.items())
+            return [{
+                "labels": dict(key),
+                "count": s["count"],
+                "sum": round(s["sum"], 6),
+                "mean": round(s["sum"] / s["count"], 6) if s["count"] else 0.0,
+                "min": s["min"],
+                "max": s["max"],
+                "p50": round(self.quantile(s, 0.5), 6),
+                "p95": round(self.quantile(s, 0.95), 6),
+                "p99": round(self.quantile(s, 0.99), 6),
+            } for key, s in items]
+
+    def prometheus(self, extra=()):
+        lines = []
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, s["counts"]):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{self.name}_bucket{_format_labels(key, list(extra) + [('le', repr(float(bound)))])} {cumulative}")
+                lines.append(f"{PREFIX}{self.name}_bucket{_format_labels(key, list(extra) + [('le', '+Inf')])} {s['count']}")
+                lines.append(f"{PREFIX}{self.name}_sum{_format_labels(key, extra)} {s['sum']}")
+                lines.append(f"{PREFIX}{self.name}_count{_format_labels(key, extra)} {s['count']}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas de un proceso; las métricas se crean al primer uso."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _get(self, cls, name, help, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {name} ya existe como {metric.kind}")
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def report(self, stage=None):
+        return {
+            "etapa": stage,
+            "inicio": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "fin": datetime.now().isoformat(timespec="seconds"),
+            "segundos": round(time.time() - self.started, 3),
+            "metricas": {name: {"tipo": metric.kind, "ayuda": metric.help, "series": metric.snapshot()}
+                         for name, metric in sorted(self._metrics.items())},
+        }
+
+    def prometheus(self, stage=None):
+        """Formato de texto de Prometheus; con stage, todas las series llevan la etiqueta stage."""
+        extra = [("stage", stage)] if stage else []
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.help:
+                lines.append(f"# HELP {PREFIX}{name} {metric.help}")
+            lines.append(f"# TYPE {PREFIX}{name} {metric.kind}")
+            lines.extend(metric.prometheus(extra))
+        stage_labels = _format_labels((), extra)
+        lines.append(f"# TYPE {PREFIX}run_last_success_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}run_last_success_timestamp_seconds{stage_labels} {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help=""):
+    return REGISTRY.counter(name, help)
+
+
+def histogram(name, help="", buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, help, buckets)
+
+
+@contextmanager
+def timer(name, help="", **labels):
+    """Mide la duración del bloque y la registra en el histograma `name` (segundos)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.histogram(name, help).observe(time.perf_counter() - started, **labels)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def export(stage, output_dir=None):
+    """Escribe {stage}_report.json y {stage}.prom en METRICS_DIR; regresa las rutas."""
+    output_dir = output_dir or METRICS_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, f"{stage}_report.json")
+    prom_path = os.path.join(output_dir, f"{stage}.prom")
+    _write_atomic(report_path, json.dumps(REGISTRY.report(stage), ensure_ascii=False, indent=2))
+    _write_atomic(prom_path, REGISTRY.prometheus(stage))
+    print(f"Métricas de {stage} guardadas en {report_path} y {prom_path}")
+    return report_path, prom_path
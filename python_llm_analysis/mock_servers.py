@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Servidores HTTP locales que sustituyen al INE y a OpenRouter para pruebas sin red.
+- INE: sirve los archivos de synthetic_data.py con las mismas rutas del sitio
+  (/cycc/documentos/json/..., /cycc/img/fotocandidato/..., /cycc/documentos/cv/...,
+  /candidato/{folio}),
+  con ETag/Last-Modified (responde 304) y gzip para JSON.
+- LLM: endpoint compatible con OpenAI en .../chat/completions que regresa un JSON de
+  calificación determinista por prompt (un arreglo por folio si el prompt es por lotes).
+Ambos permiten configurar latencia, tasa de errores 5xx y tasa de 429 con Retry-After.
+
+Uso:
+    python mock_servers.py --data-dir mock_data --llm-latency-ms 300 --llm-429-rate 0.05
+    export INE_BASE_URL=http://127.0.0.1:8081 OPENROUTER_BASE_URL=http://127.0.0.1:8082/api/v1
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCORE_KEYS = ["CT", "IE", "EJ", "CR", "SS"]
+# Encabezado de cada perfil en los prompts por lotes de score_candidates_llm.py
+BATCH_PROFILE = re.compile(r"^Perfil del candidato con folio ([^\s:]+):$", re.MULTILINE)
+
+
+class MockConfig:
+    """Comportamiento simulado de un servidor: latencia (ms), errores 5xx y 429."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def simulate(self):
+        """Espera la latencia simulada y regresa el código de error a responder (o None)."""
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if roll < self.rate_limit_rate:
+            with self._lock:
+                self.rate_limited += 1
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return 503
+        return None
+
+    def stats(self):
+        return {"requests": self.requests, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_simulated_error(self):
+        """Responde un error simulado si toca; regresa True si ya se respondió."""
+        status = self.config.simulate()
+        if status == 429:
+            self.send_body(429, b'{"error": {"message": "rate limited"}}',
+                           headers={"Retry-After": str(self.config.retry_after)})
+        elif status:
+            self.send_body(status, b'{"error": {"message": "simulated error"}}')
+        return status is not None
+
+
+class IneHandler(MockHandler):
+    """Archivos estáticos bajo data_dir con validación condicional."""
+    data_dir = "mock_data"
+
+    def do_GET(self):
+        if self.send_simulated_error():
+            return
+        root = os.path.realpath(self.data_dir)
+        path = os.path.realpath(os.path.join(root, self.path.split("?", 1)[0].lstrip("/")))
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            self.send_body(404, b'{"error": "not found"}')
+            return
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True)}
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type == "application/json" and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self.send_body(200, body, content_type, headers)
+
+    do_HEAD = do_GET
+
+
+def fake_scoring(prompt):
+    """Calificación determinista (mismo prompt, misma respuesta) con el formato esperado."""
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12], 16)
+    rng = random.Random(seed)
+    scoring = {key: {"score": rng.randint(20, 95), "explanation": f"Evaluación simulada de {key}."}
+               for key in SCORE_KEYS}
+    scoring["ventaja"] = [f"Fortaleza simulada {i}" for i in range(1, 4)]
+    scoring["area_oportunidad"] = [f"Área de mejora simulada {i}" for i in range(1, 4)]
+    return scoring
+
+
+def fake_batch_scoring(prompt):
+    """Arreglo con una calificación (y su folio) por perfil de un prompt por lotes."""
+    # split regresa [instrucciones, folio1, perfil1, folio2, perfil2, ...]
+    parts = BATCH_PROFILE.split(prompt)
+    return [dict(folio=folio, **fake_scoring(profile)) for folio, profile in zip(parts[1::2], parts[2::2])]
+
+
+def message_text(content):
+    """Texto de un mensaje de chat: cadena o lista de partes {"type": "text", "text": ...}."""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+class LlmHandler(MockHandler):
+    """Endpoint de chat completions compatible con la API de OpenAI."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = self.rfile.read(length)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_body(404, b'{"error": {"message": "not found"}}')
+            return
+        if self.send_simulated_error():
+            return
+        try:
+            request = json.loads(payload)
+            prompt = "\n".join(message_text(message.get("content")) for message in request.get("messages", []))
+        except (ValueError, AttributeError):
+            self.send_body(400, b'{"error": {"message": "invalid JSON"}}')
+            return
+        scoring = fake_batch_scoring(prompt) if BATCH_PROFILE.search(prompt) else fake_scoring(prompt)
+        content = json.dumps(scoring, ensure_ascii=False)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        response = {
+            "id": "mock-" + hashlib.sha1(payload).hexdigest()[:16],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+        self.send_body(200, json.dumps(response, ensure_ascii=False).encode("utf-8"))
+
+
+def start_server(handler, host, port, config, **attrs):
+    """Arranca un servidor en un hilo; regresa el servidor (server.server_address tiene el puerto real)."""
+    handler_class = type(handler.__name__, (handler,), dict(attrs, config=config))
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_servers(data_dir="mock_data", host="127.0.0.1", ine_port=8081, llm_port=8082,
+                  ine_config=None, llm_config=None):
+    """Arranca ambos servidores y regresa (servidor INE, servidor LLM, variables de entorno a usar)."""
+    ine = start_server(IneHandler, host, ine_port, ine_config or MockConfig(), data_dir=data_dir)
+    llm = start_server(LlmHandler, host, llm_port, llm_config or MockConfig())
+    env = {
+        "INE_BASE_URL": f"http://{host}:{ine.server_address[1]}",
+        "OPENROUTER_BASE_URL": f"http://{host}:{llm.server_address[1]}/api/v1",
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY") or "mock-key",
+        # Tabla de distritos sintética para associate_candidates.py
+        "DISTRITOS_DIR": os.path.abspath(os.path.join(data_dir, "distritos_judiciales")),
+    }
+    return ine, llm, env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidores locales que simulan al INE y a OpenRouter")
+    parser.add_argument("--data-dir", default="mock_data", help="Directorio generado por synthetic_data.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ine-port", type=int, default=8081)
+    parser.add_argument("--llm-port", type=int, default=8082)
+    for name in ("ine", "llm"):
+        parser.add_argument(f"--{name}-latency-ms", type=float, default=0.0, help="Latencia media por petición")
+        parser.add_argument(f"--{name}-jitter-ms", type=float, default=0.0, help="Variación uniforme de la latencia")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help="Fracción de respuestas 503")
+        parser.add_argument(f"--{name}-429-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Segundos en el encabezado Retry-After de los 429")
+    args = parser.parse_args()
+
+    configs = {
+        name: MockConfig(getattr(args, f"{name}_latency_ms"), getattr(args, f"{name}_jitter_ms"),
+                         getattr(args, f"{name}_error_rate"), getattr(args, f"{name}_429_rate"), args.retry_after)
+        for name in ("ine", "llm")
+    }
+    ine, llm, env = start_servers(args.data_dir, args.host, args.ine_port, args.llm_port, configs["ine"], configs["llm"])
+    print("Servidores simulados en ejecución. Para usarlos en el pipeline:")
+    for name, value in env.items():
+        print(f"  export {name}={value}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"INE: {configs['ine'].stats()}  LLM: {configs['llm'].stats()}", flush=True)
+    except KeyboardInterrupt:
+        ine.shutdown()
+        llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Extrae columnas estructuradas de las páginas de perfil guardadas por download_profiles.py
+({folio}_profile.html). Cada sección del perfil (encabezado h2-h4 y el contenido hasta el
+siguiente encabezado) se asigna a una columna según su título; los pares etiqueta/valor
+(dt/dd o tablas de dos columnas) y las secciones no reconocidas se guardan como JSON.
+El parseo corre con lxml en un pool de procesos y el resultado se une por folio.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.html
+import pandas as pd
+from artifacts import read_table, write_table
+from delta_manifest import affected_folios, load_delta
+from metrics import counter, export as export_metrics, histogram
+from profiling import add_profile_arguments, profile_from_argv
+
+PROFILES_DIR = 'download_profiles_output/profiles'
+OUTPUT_PATH = 'download_profiles_output/profiles_parsed.csv'
+PROFILE_SUFFIX = '_profile.html'
+# Archivos por tarea enviada al pool (las páginas son pequeñas: se agrupan para amortizar el IPC)
+CHUNK_SIZE = 32
+
+CONTAINER_XPATH = ('//*[contains(concat(" ", normalize-space(@class), " "), " candidate-profile ")'
+                   ' or contains(concat(" ", normalize-space(@class), " "), " profile-container ")'
+                   ' or contains(concat(" ", normalize-space(@class), " "), " candidate-detail ")]')
+HEADING_TAGS = {"h2", "h3", "h4"}
+
+# Columna -> palabras clave del título de la sección (sin acentos, en minúsculas); gana la primera
+SECTION_COLUMNS = [
+    ("vision_imparticion_justicia", ("imparticion de justicia",)),
+    ("vision_jurisdiccional", ("vision jurisdiccional", "funcion jurisdiccional")),
+    ("formacion", ("formacion", "grado academico", "estudios", "escolaridad")),
+    ("cursos", ("curso", "diplomado", "especializacion", "capacitacion")),
+    ("trayectoria", ("trayectoria", "experiencia", "cargos")),
+    ("propuestas", ("propuesta",)),
+    ("motivacion", ("por que quiero", "motivo", "motivacion")),
+    ("contacto", ("contacto", "redes sociales")),
+]
+PROFILE_COLUMNS = (["folio", "nombre_perfil"] + [column for column, _ in SECTION_COLUMNS]
+                   + ["correo", "enlaces", "datos_generales", "otras_secciones"])
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_title(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return WHITESPACE.sub(" ", re.sub(r"[^\w\s]", " ", text.lower())).strip()
+
+
+def clean(text):
+    return WHITESPACE.sub(" ", text or "").strip()
+
+
+def section_column(title):
+    normalized = normalize_title(title)
+    for column, keywords in SECTION_COLUMNS:
+        if any(keyword in normalized for keyword in keywords):
+            return column
+    return None
+
+
+def element_text(element):
+    """Texto de un bloque; las listas se unen con '; ' un elemento por entrada."""
+    items = element.xpath(".//li")
+    if items:
+        return "; ".join(text for text in (clean(item.text_content()) for item in items) if text)
+    return clean(element.text_content())
+
+
+def section_text(heading):
+    """Contenido desde el encabezado hasta el siguiente encabezado del mismo bloque."""
+    parts = []
+    for sibling in heading.itersiblings():
+        if not isinstance(sibling.tag, str):
+            continue  # comentarios
+        if sibling.tag in HEADING_TAGS:
+            break
+        text = element_text(sibling)
+        if text:
+            parts.append(text)
+    return " ".join(parts)
+
+
+def label_pairs(container):
+    """Pares etiqueta/valor de listas de definición y filas de tabla de dos celdas."""
+    pairs = {}
+    for term in container.iter("dt"):
+        value = term.getnext()
+        if value is not None and value.tag == "dd":
+            pairs[clean(term.text_content()).rstrip(":")] = clean(value.text_content())
+    for row in container.iter("tr"):
+        cells = [cell for cell in row if cell.tag in ("th", "td")]
+        if len(cells) == 2:
+            pairs[clean(cells[0].text_content()).rstrip(":")] = clean(cells[1].text_content())
+    return {label: value for label, value in pairs.items() if label}
+
+
+def parse_profile_html(html, folio=""):
+    """Regresa un dict con las columnas de PROFILE_COLUMNS a partir del HTML de un perfil."""
+    document = lxml.html.fromstring(html)
+    for junk in document.xpath("//script | //style | //noscript"):
+        junk.drop_tree()
+    containers = document.xpath(CONTAINER_XPATH)
+    container = containers[0] if containers else document
+    row = {column: "" for column in PROFILE_COLUMNS}
+    row["folio"] = folio
+    names = container.xpath(".//h1") or document.xpath("//h1")
+    row["nombre_perfil"] = clean(names[0].text_content()) if names else ""
+
+    other_sections = {}
+    for heading in container.iter(*HEADING_TAGS):
+        title = clean(heading.text_content())
+        text = section_text(heading)
+        if not title or not text:
+            continue
+        column = section_column(title)
+        if column:
+            row[column] = f"{row[column]} {text}".strip() if row[column] else text
+        else:
+            other_sections[title] = text
+
+    emails = []
+    links = []
+    for href in container.xpath(".//a/@href"):
+        href = href.strip()
+        if href.lower().startswith("mailto:"):
+            emails.append(href[7:].split("?", 1)[0])
+        elif href.startswith(("http://", "https://")):
+            links.append(href)
+    row["correo"] = "|".join(dict.fromkeys(emails))
+    row["enlaces"] = "|".join(dict.fromkeys(links))
+    pairs = label_pairs(container)
+    row["datos_generales"] = json.dumps(pairs, ensure_ascii=False) if pairs else ""
+    row["otras_secciones"] = json.dumps(other_sections, ensure_ascii=False) if other_sections else ""
+    return row
+
+
+def parse_profile_file(path):
+    """Parsea un archivo (se ejecuta en un proceso del pool). Regresa (fila o None, error, segundos)."""
+    started = time.perf_counter()
+    folio = os.path.basename(path)[:-len(PROFILE_SUFFIX)]
+    try:
+        with open(path, "rb") as f:
+            row = parse_profile_html(f.read(), folio)
+        return row, "", time.perf_counter() - started
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - started
+
+
+def profile_paths(profiles_dir=None, folios=None):
+    profiles_dir = profiles_dir or PROFILES_DIR
+    if not os.path.isdir(profiles_dir):
+        return []
+    return [os.path.join(profiles_dir, name) for name in sorted(os.listdir(profiles_dir))
+            if name.endswith(PROFILE_SUFFIX) and (folios is None or name[:-len(PROFILE_SUFFIX)] in folios)]
+
+
+def parse_all(paths, workers=None):
+    """Parsea los archivos en paralelo (workers=1: en este proceso). Regresa (filas, errores)."""
+    if workers == 1:
+        results = map(parse_profile_file, paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(parse_profile_file, paths, chunksize=CHUNK_SIZE)
+    rows = []
+    errors = []
+    try:
+        for path, (row, error, seconds) in zip(paths, results):
+            histogram("profile_parse_seconds", "Duración del parseo por página de perfil").observe(
+                seconds, status="error" if error else "ok")
+            if error:
+                errors.append((path, error))
+            else:
+                rows.append(row)
+    finally:
+        if executor:
+            executor.shutdown()
+    return rows, errors
+
+
+def save_profiles(rows, keep_existing=False, removed=()):
+    """Guarda la tabla por folio; con keep_existing (modo delta) se conservan las demás filas."""
+    df = pd.DataFrame(rows, columns=PROFILE_COLUMNS)
+    if keep_existing and os.path.exists(OUTPUT_PATH):
+        existing = read_table(OUTPUT_PATH)
+        replaced = {str(row["folio"]) for row in rows} | {str(folio) for folio in removed}
+        existing = existing[~existing["folio"].astype(str).isin(replaced)]
+        df = pd.concat([existing, df], ignore_index=True)
+    write_table(df, OUTPUT_PATH)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrae columnas estructuradas de los perfiles HTML guardados")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, núcleos disponibles)")
+    parser.add_argument("--delta", default=None,
+                        help="Manifiesto delta de extract_candidates.py: parsear solo los perfiles afectados")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    delta = load_delta(args.delta) if args.delta else None
+    paths = profile_paths(folios=affected_folios(delta) if delta else None)
+    if not paths and not (delta and os.path.exists(OUTPUT_PATH)):
+        # Las páginas solo existen tras download_profiles.py --profiles; sin ellas no se escribe
+        # la tabla, para que la unión no agregue columnas vacías. En modo delta con tabla previa
+        # sí se reescribe, para quitar a los candidatos eliminados
+        print(f"No hay perfiles en {PROFILES_DIR} (se capturan con download_profiles.py --profiles); nada que parsear")
+        export_metrics("parse_profiles")
+        return
+    print(f"Perfiles HTML a parsear: {len(paths)}")
+    started = time.perf_counter()
+    rows, errors = parse_all(paths, args.workers)
+    elapsed = time.perf_counter() - started
+    for path, error in errors:
+        print(f"Error al parsear {path}: {error}")
+    df = save_profiles(rows, keep_existing=bool(delta), removed=delta["removed"] if delta else ())
+    counter("rows_processed_total", "Filas procesadas por la etapa").inc(len(rows), kind="profiles", status="ok")
+    counter("rows_processed_total", "Filas procesadas por la etapa").inc(len(errors), kind="profiles", status="error")
+    print(f"Parseo terminado en {elapsed:.1f} s ({len(rows) / max(elapsed, 1e-9):.0f} páginas/s, "
+          f"{len(errors)} errores). {len(df)} perfiles en {OUTPUT_PATH}")
+    export_metrics("parse_profiles")
+
+
+if __name__ == "__main__":
+    with profile_from_argv("parse_profiles"):
+        main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Orquestador del pipeline de candidatos.
+Modela las etapas (extracción, descarga, conversión, calificación, parseo de perfiles,
+unión y asociación) como un DAG con entradas y salidas declaradas. Una etapa se omite si
+el hash de su código, argumentos y entradas no cambió desde la última corrida y sus
+salidas siguen intactas; las etapas independientes corren en paralelo y se reportan sus duraciones.
+Las páginas de perfil que usa parse_profiles no se capturan aquí (requieren Playwright):
+se generan con `python download_profiles.py --profiles`; sin ellas la etapa no hace nada.
+
+Uso:
+    python pipeline.py                 # todo el pipeline
+    python pipeline.py score           # una etapa y las que la preceden
+    python pipeline.py --force extract # volver a consultar los endpoints del INE
+    python pipeline.py --force extract --replay-har har_archives/ine.har  # sin red
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACT_DIR = "extract_candidates_output"
+DOWNLOAD_DIR = "download_profiles_output"
+STATE_PATH = ".pipeline_state.json"
+REPORT_PATH = "pipeline_report.json"
+LOG_DIR = "pipeline_logs"
+DELTA_PATH = os.path.join(EXTRACT_DIR, "delta_manifest.json")
+DISTRITOS_DIR = os.environ.get("DISTRITOS_DIR", "distritos_judiciales")
+
+
+class Stage:
+    """
+    Una etapa del pipeline: un script con sus dependencias, entradas y salidas.
+    inputs/outputs son rutas (archivos, directorios o patrones glob) relativas al
+    directorio de trabajo; code son los módulos del repo cuyo cambio invalida la etapa.
+    """
+
+    def __init__(self, name, script, deps=(), inputs=(), outputs=(), code=(), args=(), delta=False):
+        self.name = name
+        self.script = script
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = [script] + list(code)
+        self.args = list(args)
+        self.delta = delta
+
+    def command(self, use_delta=False, profile=None):
+        args = list(self.args)
+        if use_delta and self.delta and os.path.exists(DELTA_PATH):
+            args += ["--delta", DELTA_PATH]
+        if profile:
+            args += ["--profile", profile]
+        return [sys.executable, os.path.join(SCRIPT_DIR, self.script)] + args
+
+
+STAGES = [
+    Stage("extract", "extract_candidates.py",
+          outputs=[os.path.join(EXTRACT_DIR, name) for name in
+                   ("all_candidates.json", "normalized_candidates.json", "candidates.csv", "raw_*.json")],
+          code=["artifacts.py", "candidate_store.py", "delta_manifest.py"]),
+    Stage("download", "download_profiles.py", deps=["extract"],
+          inputs=[os.path.join(EXTRACT_DIR, "normalized_candidates.json"), os.path.join(EXTRACT_DIR, "raw_*.json")],
+          outputs=[os.path.join(DOWNLOAD_DIR, "candidates_with_documents.csv"), os.path.join(DOWNLOAD_DIR, "documents")],
+          code=["download_engine.py", "artifacts.py", "candidate_store.py", "delta_manifest.py"], delta=True),
+    Stage("convert", "convert_pdfs_to_text.py", deps=["download"],
+          inputs=[os.path.join(DOWNLOAD_DIR, "documents")],
+          outputs=[os.path.join(DOWNLOAD_DIR, "texts", "*.txt")],
+          code=["candidate_store.py", "delta_manifest.py"], delta=True),
+    Stage("score", "score_candidates_llm.py", deps=["extract", "convert"],
+          inputs=[os.path.join(EXTRACT_DIR, "all_candidates.json"), os.path.join(DOWNLOAD_DIR, "texts", "*.txt")],
+          outputs=[os.path.join(EXTRACT_DIR, "candidates_scored_2.json"), os.path.join(EXTRACT_DIR, "candidates_scored_2.csv")],
+          code=["rate_limiter.py", "scoring_journal.py", "llm_cache.py", "artifacts.py", "candidate_store.py",
+                "delta_manifest.py"], delta=True),
+    Stage("parse_profiles", "parse_profiles_html.py", deps=["download"],
+          inputs=[os.path.join(DOWNLOAD_DIR, "profiles", "*_profile.html")],
+          outputs=[os.path.join(DOWNLOAD_DIR, "profiles_parsed.csv")],
+          code=["artifacts.py", "delta_manifest.py"], delta=True),
+    Stage("join", "join_candidates_scores.py", deps=["score", "parse_profiles"],
+          inputs=[os.path.join(EXTRACT_DIR, "candidates_scored_2.csv"), os.path.join(EXTRACT_DIR, "candidates.csv"),
+                  os.path.join(DOWNLOAD_DIR, "profiles_parsed.csv")],
+          outputs=[os.path.join(EXTRACT_DIR, "candidates_scored_full_2.csv")],
+          code=["artifacts.py", "candidate_store.py"]),
+    Stage("associate", "associate_candidates.py", deps=["download"],
+          inputs=[os.path.join(DOWNLOAD_DIR, "candidates_with_documents.csv"), os.path.join(EXTRACT_DIR, "raw_*.json"),
+                  os.path.join(DISTRITOS_DIR, "output", "distritos_judiciales_lookup.csv")],
+          outputs=[os.path.join("resultado_final", "candidatos_con_distritos.csv")],
+          code=["artifacts.py", "candidate_store.py", "geo_cache.py"]),
+]
+
+
+class FileHasher:
+    """
+    sha256 de archivos con caché por (tamaño, mtime): en una corrida sin cambios solo
+    se hace stat de cada archivo, sin volver a leerlo.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or {}
+        self._lock = threading.Lock()
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        with self._lock:
+            self.cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def expand(self, pattern):
+        """Archivos que corresponden a una ruta, directorio o patrón glob."""
+        if os.path.isdir(pattern):
+            return sorted(os.path.join(root, name) for root, _, names in os.walk(pattern)
+                          for name in names if not name.endswith(".tmp"))
+        return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+    def fingerprint(self, patterns):
+        """Regresa (hash combinado de todos los archivos, si existieron todas las rutas)."""
+        digest = hashlib.sha256()
+        complete = True
+        for pattern in patterns:
+            files = self.expand(pattern)
+            if not files:
+                complete = False
+                digest.update(f"{pattern}:faltante\n".encode("utf-8"))
+            for path in files:
+                digest.update(f"{path}:{self.file_hash(path)}\n".encode("utf-8"))
+        return digest.hexdigest(), complete
+
+
+def load_state(path=STATE_PATH):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "hashes": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def select_stages(targets):
+    """Etapas pedidas más todas las que las preceden, en el orden del DAG."""
+    by_name = {stage.name: stage for stage in STAGES}
+    if not targets:
+        return list(STAGES)
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise SystemExit(f"Etapa desconocida: {name} (disponibles: {', '.join(by_name)})")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name].deps)
+    return [stage for stage in STAGES if stage.name in selected]
+
+
+class Pipeline:
+    """Ejecuta las etapas respetando dependencias, con hasta `jobs` etapas en paralelo."""
+
+    def __init__(self, stages, jobs=2, force=(), use_delta=False, dry_run=False, profile=None):
+        self.stages = stages
+        self.jobs = jobs
+        self.force = set(force)
+        self.use_delta = use_delta
+        self.dry_run = dry_run
+        self.profile = profile
+        self.state = load_state()
+        self.hasher = FileHasher(self.state.get("hashes"))
+        self.results = {}
+
+    def stage_key(self, stage):
+        """Hash del código y los argumentos de la etapa."""
+        code_hash, _ = self.hasher.fingerprint([os.path.join(SCRIPT_DIR, name) for name in stage.code])
+        return hashlib.sha256(json.dumps([code_hash, stage.command(self.use_delta)[1:]]).encode("utf-8")).hexdigest()
+
+    def check(self, stage):
+        """Regresa (al_día, motivo, huella) para decidir si la etapa se omite."""
+        inputs_hash, _ = self.hasher.fingerprint(stage.inputs)
+        fingerprint = {"code": self.stage_key(stage), "inputs": inputs_hash}
+        previous = self.state["stages"].get(stage.name)
+        if "all" in self.force or stage.name in self.force:
+            return False, "forzada", fingerprint
+        if not previous:
+            return False, "sin corridas previas", fingerprint
+        if previous.get("code") != fingerprint["code"]:
+            return False, "cambió el código o los argumentos", fingerprint
+        if previous.get("inputs") != fingerprint["inputs"]:
+            return False, "cambiaron las entradas", fingerprint
+        outputs_hash, complete = self.hasher.fingerprint(stage.outputs)
+        if not complete or previous.get("outputs") != outputs_hash:
+            return False, "faltan o cambiaron las salidas", fingerprint
+        return True, "al día", fingerprint
+
+    def run_stage(self, stage):
+        started = time.perf_counter()
+        up_to_date, reason, fingerprint = self.check(stage)
+        result = {"estado": "omitida" if up_to_date else "pendiente", "motivo": reason, "returncode": None}
+        if not up_to_date and not self.dry_run:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            log_path = os.path.join(LOG_DIR, f"{stage.name}.log")
+            print(f"[{stage.name}] ejecutando ({reason}); salida en {log_path}", flush=True)
+            with open(log_path, "w", encoding="utf-8") as log:
+                # --profile no forma parte de la huella: perfilar no invalida la etapa
+                process = subprocess.run(stage.command(self.use_delta, self.profile),
+                                         stdout=log, stderr=subprocess.STDOUT)
+            result["returncode"] = process.returncode
+            if process.returncode == 0:
+                result["estado"] = "ejecutada"
+                fingerprint["outputs"], _ = self.hasher.fingerprint(stage.outputs)
+                self.state["stages"][stage.name] = fingerprint
+            else:
+                result["estado"] = "error"
+                result["log"] = log_path
+        result["segundos"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def run(self):
+        started = time.perf_counter()
+        remaining = {stage.name: stage for stage in self.stages}
+        selected = set(remaining)
+        finished = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while remaining or running:
+                for name, stage in list(remaining.items()):
+                    deps = [dep for dep in stage.deps if dep in selected]
+                    if any(finished.get(dep) in ("error", "bloqueada") for dep in deps):
+                        finished[name] = "bloqueada"
+                        self.results[name] = {"estado": "bloqueada", "motivo": "falló una dependencia", "segundos": 0.0}
+                        del remaining[name]
+                    elif self.dry_run and any(finished.get(dep) == "pendiente" for dep in deps):
+                        finished[name] = "pendiente"
+                        self.results[name] = {"estado": "pendiente", "motivo": "se ejecutaría una dependencia",
+                                              "segundos": 0.0}
+                        del remaining[name]
+                    elif all(dep in finished for dep in deps):
+                        running[executor.submit(self.run_stage, stage)] = name
+                        del remaining[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    self.results[name] = result
+                    finished[name] = result["estado"]
+                    print(f"[{name}] {result['estado']} en {result['segundos']:.2f} s ({result['motivo']})", flush=True)
+        self.state["hashes"] = self.hasher.cache
+        if not self.dry_run:
+            save_state(self.state)
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        print("\nResumen del pipeline:")
+        for stage in self.stages:
+            result = self.results.get(stage.name, {})
+            print(f"  {stage.name:<10} {result.get('estado', '-'):<10} {result.get('segundos', 0.0):>9.2f} s  "
+                  f"{result.get('motivo', '')}")
+        print(f"  {'total':<10} {'':<10} {elapsed:>9.2f} s")
+        report = {"segundos_total": round(elapsed, 3), "etapas": self.results}
+        if not self.dry_run:
+            with open(REPORT_PATH, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ejecuta el pipeline de candidatos como un DAG de etapas")
+    parser.add_argument("targets", nargs="*", help="Etapas a construir (con sus dependencias); por defecto todas")
+    parser.add_argument("--jobs", type=int, default=2, help="Etapas independientes en paralelo")
+    parser.add_argument("--force", action="append", default=[],
+                        help="Ejecutar la etapa aunque esté al día ('all' para todas); se puede repetir")
+    parser.add_argument("--delta", action="store_true",
+                        help="Pasar el manifiesto delta de la extracción a las etapas que lo soportan")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar qué etapas se ejecutarían")
+    parser.add_argument("--replay-har", action="append", default=None, metavar="HAR",
+                        help="Servir el sitio del INE desde un archivo HAR (har_archive.py) en lugar de la red; repetible")
+    parser.add_argument("--profile", default=None,
+                        help="Perfilar las etapas que se ejecuten (cprofile, sampling, memory; ver profiling.py)")
+    parser.add_argument("--list", action="store_true", help="Listar las etapas y sus dependencias")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name:<14} {stage.script:<28} depende de: {', '.join(stage.deps) or '-'}")
+        return
+    if args.replay_har:
+        # Las etapas heredan INE_BASE_URL apuntando al servidor de reproducción
+        from har_archive import start_replay
+        _, archive, env = start_replay(args.replay_har, port=0)
+        os.environ.update(env)
+        print(f"Reproduciendo {archive.count} respuestas grabadas en {env['INE_BASE_URL']}")
+    pipeline = Pipeline(select_stages(args.targets), jobs=args.jobs, force=args.force,
+                        use_delta=args.delta, dry_run=args.dry_run, profile=args.profile)
+    elapsed = pipeline.run()
+    pipeline.report(elapsed)
+    if any(result["estado"] in ("error", "bloqueada") for result in pipeline.results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
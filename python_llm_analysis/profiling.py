@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Perfilado opcional de las etapas del pipeline (--profile).
+Modos (se pueden combinar separados por coma):
+- cprofile: perfil determinista; escribe .pstats y pilas colapsadas derivadas del grafo de llamadas.
+- sampling: muestreo periódico de la pila del hilo principal; escribe pilas colapsadas reales.
+- memory: tracemalloc; escribe el snapshot (.tracemalloc) y un resumen de los mayores consumos.
+Los archivos .collapsed se pueden graficar con flamegraph.pl, speedscope o inferno.
+
+Uso en una etapa:
+    if __name__ == "__main__":
+        with profile_from_argv("score"):
+            main()
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ("cprofile", "sampling", "memory")
+SAMPLING_INTERVAL_MS = 5.0
+TRACEMALLOC_FRAMES = 25
+MAX_STACK_DEPTH = 64
+
+
+def add_profile_arguments(parser):
+    """Agrega --profile, --profile-dir y --profile-interval al parser de una etapa."""
+    group = parser.add_argument_group("perfilado")
+    group.add_argument("--profile", nargs="?", const="cprofile", default=None,
+                       help=f"Perfilar la etapa: {', '.join(PROFILE_MODES)} (separados por coma; por defecto cprofile)")
+    group.add_argument("--profile-dir", default=PROFILE_DIR, help="Directorio de salida de los perfiles")
+    group.add_argument("--profile-interval", type=float, default=SAMPLING_INTERVAL_MS,
+                       help="Intervalo de muestreo en ms para el modo sampling")
+    return parser
+
+
+def parse_modes(value):
+    modes = [mode.strip() for mode in (value or "").split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        raise SystemExit(f"Modos de perfilado desconocidos: {', '.join(unknown)} (disponibles: {', '.join(PROFILE_MODES)})")
+    return modes
+
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _func_label(func):
+    filename, line, name = func
+    return f"{os.path.basename(filename)}:{name}:{line}" if filename != "~" else name.strip("<>")
+
+
+class StackSampler:
+    """Muestrea la pila de un hilo cada `interval` segundos y cuenta pilas colapsadas."""
+
+    def __init__(self, thread_id=None, interval=SAMPLING_INTERVAL_MS / 1000):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = ";".join(reversed(labels))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def pstats_to_collapsed(stats, path):
+    """
+    Convierte un perfil de cProfile en pilas colapsadas (microsegundos). cProfile solo guarda
+    aristas llamador -> llamado, así que el tiempo de cada función se reparte entre sus
+    llamados en proporción al tiempo acumulado de cada arista.
+    """
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, (_, _, _, _, callers) in entries.items() if not callers]
+    lines = {}
+
+    def walk(func, inclusive, path):
+        cumulative = entries[func][3]
+        children = [(child, ct) for child, ct in callees.get(func, []) if child not in path]
+        scale = inclusive / cumulative if cumulative else 0.0
+        child_total = 0.0
+        stack = path + (func,)
+        if len(stack) < MAX_STACK_DEPTH:
+            for child, ct in children:
+                share = ct * scale
+                if share <= 0:
+                    continue
+                child_total += share
+                walk(child, share, stack)
+        own = inclusive - child_total
+        if own > 0:
+            key = ";".join(_func_label(f) for f in stack)
+            lines[key] = lines.get(key, 0) + own
+
+    for root in roots:
+        walk(root, entries[root][3], ())
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, seconds in sorted(lines.items()):
+            micros = int(seconds * 1e6)
+            if micros:
+                f.write(f"{stack} {micros}\n")
+
+
+def write_memory_report(snapshot, path, limit=30):
+    """Resumen de los mayores consumos de memoria vivos por línea y por traza."""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Memoria viva al final de la etapa, top {limit} por línea:\n")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            f.write(f"{stat.size / 1e6:10.3f} MB  {stat.count:8d} bloques  {stat.traceback[0]}\n")
+        f.write("\nTop 5 por traza completa:\n")
+        for stat in snapshot.statistics("traceback")[:5]:
+            f.write(f"\n{stat.size / 1e6:.3f} MB en {stat.count} bloques\n")
+            for line in stat.traceback.format(limit=TRACEMALLOC_FRAMES):
+                f.write(f"  {line}\n")
+
+
+@contextmanager
+def profile_stage(stage, modes, output_dir=PROFILE_DIR, interval_ms=SAMPLING_INTERVAL_MS):
+    """Perfila el bloque con los modos indicados y escribe los archivos al terminar."""
+    modes = parse_modes(modes) if isinstance(modes, str) else list(modes or [])
+    if not modes:
+        yield
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"{stage}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    sampler = StackSampler(interval=interval_ms / 1000) if "sampling" in modes else None
+    if "memory" in modes:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    if sampler:
+        sampler.start()
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        if sampler:
+            sampler.stop()
+        written = []
+        if profiler:
+            profiler.dump_stats(base + ".pstats")
+            stats = pstats.Stats(profiler)
+            pstats_to_collapsed(stats, base + ".cprofile.collapsed")
+            with open(base + ".cprofile.txt", "w", encoding="utf-8") as f:
+                pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(40)
+            written += [base + ".pstats", base + ".cprofile.collapsed", base + ".cprofile.txt"]
+        if sampler:
+            sampler.write_collapsed(base + ".sampling.collapsed")
+            written.append(base + ".sampling.collapsed")
+        if "memory" in modes:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(base + ".tracemalloc")
+            write_memory_report(snapshot, base + ".memory.txt")
+            with open(base + ".memory.txt", "a", encoding="utf-8") as f:
+                f.write(f"\nPico de memoria rastreada: {peak / 1e6:.3f} MB\n")
+            written += [base + ".tracemalloc", base + ".memory.txt"]
+        print(f"Perfil de {stage} ({', '.join(modes)}, {elapsed:.1f} s) guardado en:", file=sys.stderr)
+        for path in written:
+            print(f"  {path}", file=sys.stderr)
+
+
+@contextmanager
+def profile_from_argv(stage, argv=None):
+    """
+    Lee --profile/--profile-dir/--profile-interval de la línea de comandos (ignorando el
+    resto de argumentos de la etapa) y perfila el bloque si se pidió.
+    """
+    parser = add_profile_arguments(argparse.ArgumentParser(add_help=False))
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    with profile_stage(stage, args.profile, args.profile_dir, args.profile_interval):
+        yield
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Limitadores asíncronos para llamadas a APIs externas.
+Incluye un token bucket (peticiones o tokens por minuto) y un control de
+concurrencia adaptativo que sube o baja el número de peticiones en vuelo.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Token bucket con reposición continua; rate_per_minute unidades por minuto."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Espera hasta que haya amount unidades disponibles y las consume."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        """Corrige el consumo cuando el costo real difiere del estimado (delta puede ser negativo)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+    def pause(self, seconds):
+        """Bloquea el bucket durante seconds (p. ej. al recibir Retry-After)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    Límite de peticiones en vuelo con incremento aditivo y reducción multiplicativa (AIMD):
+    sube en 1 tras una ventana de respuestas exitosas y se reduce a la mitad ante un throttle.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=64):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, throttled=False):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+def parse_retry_after(value):
+    """Convierte un encabezado Retry-After (segundos o fecha HTTP) a segundos."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Backoff exponencial con jitter completo."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -1,20 +1,63 @@
 import os
 import json
-from openai import OpenAI
+import argparse
+import asyncio
+import openai
+from openai import OpenAI, AsyncOpenAI
 import time
 import csv
 import re
+import pandas as pd
+from artifacts import write_table
+from rate_limiter import AdaptiveConcurrency, TokenBucket, backoff_delay, parse_retry_after
+from scoring_journal import ResultJournal, load_journal
+from llm_cache import DEFAULT_CACHE_PATH, ResponseCache, cache_key
+from candidate_store import DEFAULT_STORE_PATH, CandidateStore
+from delta_manifest import affected_folios, load_delta
+from metrics import LATENCY_BUCKETS, TOKEN_BUCKETS, counter, export as export_metrics, histogram
+from profiling import add_profile_arguments, profile_from_argv
 
 # Configuración OpenRouter
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# URL base compatible con OpenAI (se puede apuntar a un servidor local, p. ej. mock_servers.py)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 MODEL = "google/gemini-2.5-flash-preview"
-client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=OPENROUTER_API_KEY)
+client = OpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY)
+# Cliente asíncrono sin reintentos propios: el motor de scoring controla reintentos y backoff
+async_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY, max_retries=0)
+
+# Límites por defecto del motor concurrente
+DEFAULT_CONCURRENCY = 8
+MAX_CONCURRENCY = 32
+# Topes de seguridad, no el limitador principal: el ritmo real lo fijan la concurrencia
+# adaptativa (AIMD) y los 429 del proveedor. Con 120 rpm / 400k tpm el motor quedaba en
+# ~3x la versión secuencial; se pueden ajustar con SCORING_RPM / SCORING_TPM o --rpm / --tpm
+REQUESTS_PER_MINUTE = int(os.getenv("SCORING_RPM", "2000"))
+TOKENS_PER_MINUTE = int(os.getenv("SCORING_TPM", "8000000"))
+EXPECTED_OUTPUT_TOKENS = 800
+# Candidatos por petición en el modo por lotes (1 = una petición por candidato)
+DEFAULT_BATCH_SIZE = 1
+SCORE_KEYS = ["CT", "IE", "EJ", "CR", "SS"]
+EXPECTED_KEYS = set(SCORE_KEYS) | {"ventaja", "area_oportunidad"}
 
 # Paths
 CANDIDATES_PATH = "extract_candidates_output/all_candidates.json"
 CV_TEXTS_DIR = "download_profiles_output/texts"
 OUTPUT_PATH = "extract_candidates_output/candidates_scored_2.json"
 CSV_OUTPUT_PATH = "extract_candidates_output/candidates_scored_2.csv"
+LOG_OUTPUT_PATH = "extract_candidates_output/candidates_scored_log.txt"
+JOURNAL_PATH = "extract_candidates_output/candidates_scored_2.jsonl"
+
+# Campos crudos que entran al prompt (el CV se identifica por descripcionHLC); para el modo --delta
+PROMPT_FIELDS = [
+    "nombreCandidato", "sexo", "categoria", "nombreEstado", "especialidad", "descripcionTP",
+    "descripcionCandidato", "visionJurisdiccional", "visionImparticionJusticia",
+    "propuesta1", "propuesta2", "propuesta3", "descripcionHLC"
+]
+
+# Presupuesto de texto del CV que se incluye en el prompt
+CV_MAX_CHARS = 8000
+CV_MAX_PAGES = None
 
 # Dimensiones
 DIMENSIONS = [
@@ -55,23 +98,83 @@ Instrucciones estrictas para la evaluación:
 - Sé riguroso, objetivo y consistente. No inventes información que no esté en el perfil.
 '''
 
+PROFILE_HEADER = "\nPerfil del candidato:\n"
+
+# Modo por lotes: las instrucciones se envían una sola vez para varios perfiles
+BATCH_PROMPT_TEMPLATE = '''
+Eres un jurista experto en selección de jueces. Analiza por separado cada uno de los {count} perfiles de candidatos judiciales que aparecen abajo y responde SOLO con un arreglo JSON con un objeto por candidato, sin ningún texto adicional antes o después:
+[
+  {{
+    "folio": str,  # el folio que aparece en el encabezado del perfil
+    "CT": {{"score": int, "explanation": str}},
+    "IE": {{"score": int, "explanation": str}},
+    "EJ": {{"score": int, "explanation": str}},
+    "CR": {{"score": int, "explanation": str}},
+    "SS": {{"score": int, "explanation": str}},
+    "ventaja": [str, ...],  # 3-5 bulletpoints, fortalezas principales
+    "area_oportunidad": [str, ...]  # 3-5 bulletpoints, áreas de mejora
+  }},
+  ...
+]
+
+{instructions}- Incluye exactamente un objeto por folio. Evalúa cada perfil de forma independiente: no compares candidatos entre sí ni mezcles información de distintos perfiles.
+'''
+
 def load_candidates():
+    """Candidatos crudos desde el almacén compartido; si está vacío, desde all_candidates.json."""
+    with CandidateStore(DEFAULT_STORE_PATH) as store:
+        if store.count("raw_candidates"):
+            return store.raw_candidates()
     with open(CANDIDATES_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def load_cv_text(folio):
+def load_cv_page_index(folio):
+    """Índice por página ({folio}_cv.pages.json) generado por convert_pdfs_to_text.py, si existe."""
+    path = os.path.join(CV_TEXTS_DIR, f"{folio}_cv.pages.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+def load_cv_pages(folio, first_page=1, last_page=None):
+    """Lee solo el rango de páginas indicado usando los offsets en bytes del índice."""
+    path = os.path.join(CV_TEXTS_DIR, f"{folio}_cv.txt")
+    page_index = load_cv_page_index(folio)
+    if not page_index or not os.path.exists(path):
+        return ""
+    pages = [p for p in page_index["pages"] if p["page"] >= first_page and (last_page is None or p["page"] <= last_page)]
+    if not pages:
+        return ""
+    with open(path, "rb") as f:
+        f.seek(pages[0]["start"])
+        data = f.read(pages[-1]["end"] - pages[0]["start"])
+    return data.decode("utf-8", errors="ignore")
+
+def load_cv_text(folio, max_chars=None, max_pages=None):
+    """
+    Lee como máximo max_chars caracteres (y max_pages páginas, si hay índice) del CV.
+    Por defecto usa CV_MAX_CHARS y CV_MAX_PAGES.
+    """
+    max_chars = max_chars or CV_MAX_CHARS
+    max_pages = max_pages or CV_MAX_PAGES
+    if max_pages:
+        text = load_cv_pages(folio, 1, max_pages)
+        if text:
+            return text[:max_chars] if max_chars else text
     path = os.path.join(CV_TEXTS_DIR, f"{folio}_cv.txt")
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+            # read(n) en modo texto lee n caracteres: no se carga el resto del archivo
+            return f.read(max_chars) if max_chars else f.read()
     return ""
 
-def score_candidate(candidate):
-    folio = str(candidate.get("idCandidato") or candidate.get("folio"))
-    cv_text = load_cv_text(folio)
-    prompt = PROMPT_TEMPLATE + f"""
-Perfil del candidato:
-Nombre: {candidate.get("nombreCandidato", "")}
+def candidate_folio(candidate):
+    return str(candidate.get("idCandidato") or candidate.get("folio"))
+
+def build_profile(candidate):
+    """Datos del candidato y el inicio de su CV, tal como van en el prompt."""
+    cv_text = load_cv_text(candidate_folio(candidate))
+    return f"""Nombre: {candidate.get("nombreCandidato", "")}
 Sexo: {candidate.get("sexo", "")}
 Categoría: {candidate.get("categoria", "")}
 Estado: {candidate.get("nombreEstado", "")}
@@ -83,8 +186,22 @@ Visión de impartición de justicia: {candidate.get("visionImparticionJusticia",
 Propuesta 1: {candidate.get("propuesta1", "")}
 Propuesta 2: {candidate.get("propuesta2", "")}
 Propuesta 3: {candidate.get("propuesta3", "")}
-CV: {cv_text[:8000]}
+CV: {cv_text[:CV_MAX_CHARS]}
 """
+
+def build_prompt(candidate):
+    return PROMPT_TEMPLATE + PROFILE_HEADER + build_profile(candidate)
+
+def build_batch_prompt(folios, profiles):
+    """Un solo prompt con las instrucciones de PROMPT_TEMPLATE y varios perfiles identificados por folio."""
+    instructions = PROMPT_TEMPLATE[PROMPT_TEMPLATE.index("Instrucciones estrictas"):]
+    prompt = BATCH_PROMPT_TEMPLATE.format(count=len(profiles), instructions=instructions)
+    for folio, profile in zip(folios, profiles):
+        prompt += f"\nPerfil del candidato con folio {folio}:\n{profile}"
+    return prompt
+
+def score_candidate(candidate):
+    prompt = build_prompt(candidate)
     response = client.chat.completions.create(
         model=MODEL,
         messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}]
@@ -97,6 +214,7 @@ CV: {cv_text[:8000]}
     return result
 
 def save_results_csv(results, path, log_path=None):
+    """Escribe el CSV (y opcionalmente el log) de resultados; regresa las filas escritas."""
     fieldnames = [
         "folio", "nombre",
         "CT_score", "CT_explanation",
@@ -107,6 +225,7 @@ def save_results_csv(results, path, log_path=None):
         "ventajas", "areas_oportunidad"
     ]
     logs = []
+    rows = []
     with open(path, "w", encoding="utf-8", newline='') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
@@ -145,6 +264,7 @@ def save_results_csv(results, path, log_path=None):
                 "areas_oportunidad": "; ".join(scoring.get("area_oportunidad", [])) if isinstance(scoring.get("area_oportunidad", []), list) else scoring.get("area_oportunidad", "")
             }
             writer.writerow(row)
+            rows.append(row)
             if log_path:
                 logs.append({
                     "folio": entry["folio"],
@@ -156,51 +276,353 @@ def save_results_csv(results, path, log_path=None):
         with open(log_path, "w", encoding="utf-8") as flog:
             for log in logs:
                 flog.write(json.dumps(log, ensure_ascii=False) + "\n")
+    return rows
+
+def save_results_parquet(rows, path):
+    """Escribe las filas del CSV de resultados como Parquet tipado (scores como enteros nulos)."""
+    df = pd.DataFrame(rows)
+    for key in SCORE_KEYS:
+        column = f"{key}_score"
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column].replace("", None), errors="coerce").astype("Int64")
+    return write_table(df, path, write_csv=False)
+
+def parse_scoring(result):
+    """Normaliza la respuesta del modelo a un dict, intentando parsear raw_response si existe."""
+    scoring = result if isinstance(result, dict) else {}
+    # Si viene raw_response, intentar parsear
+    if "raw_response" in scoring:
+        raw = scoring["raw_response"] or ""
+        raw = raw.strip().strip('`').strip('json').strip()
+        match = re.search(r'\{.*\}', raw, re.DOTALL)
+        if match:
+            try:
+                scoring = json.loads(match.group(0))
+            except Exception:
+                scoring = {}
+    return scoring
+
+def parse_batch_scoring(content):
+    """
+    Separa la respuesta de un lote en {folio: scoring}. Acepta el arreglo pedido en
+    BATCH_PROMPT_TEMPLATE o un objeto indexado por folio; lo que no se pueda asociar a un
+    folio se descarta (esos candidatos se reintentan por separado).
+    """
+    raw = (content or "").strip().strip('`').strip('json').strip()
+    match = re.search(r'\[.*\]|\{.*\}', raw, re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else None
+    except Exception:
+        data = None
+    if isinstance(data, dict):
+        return {str(folio): scoring for folio, scoring in data.items() if isinstance(scoring, dict)}
+    results = {}
+    for item in data if isinstance(data, list) else []:
+        if isinstance(item, dict) and item.get("folio") is not None:
+            results[str(item["folio"])] = {k: v for k, v in item.items() if k != "folio"}
+    return results
+
+def is_valid_scoring(scoring):
+    """Debe ser dict, tener las claves esperadas y los scores deben ser enteros 0-100."""
+    return (
+        isinstance(scoring, dict)
+        and EXPECTED_KEYS.issubset(scoring.keys())
+        and all(isinstance(scoring[k], dict) and isinstance(scoring[k].get("score", None), int) and 0 <= scoring[k]["score"] <= 100 for k in SCORE_KEYS)
+        and isinstance(scoring.get("ventaja", []), list)
+        and isinstance(scoring.get("area_oportunidad", []), list)
+    )
 
 def score_candidate_with_retries(candidate, max_retries=5):
-    expected_keys = {"CT", "IE", "EJ", "CR", "SS", "ventaja", "area_oportunidad"}
     for attempt in range(max_retries):
-        result = score_candidate(candidate)
-        # Validación: debe ser dict, tener las claves esperadas y los scores deben ser enteros 0-100
-        scoring = result if isinstance(result, dict) else result.get("scoring", {})
-        if not isinstance(scoring, dict):
-            scoring = {}
-        # Si viene raw_response, intentar parsear
-        if "raw_response" in scoring:
-            raw = scoring["raw_response"]
-            raw = raw.strip().strip('`').strip('json').strip()
-            match = re.search(r'\{.*\}', raw, re.DOTALL)
-            if match:
-                try:
-                    scoring = json.loads(match.group(0))
-                except Exception:
-                    scoring = {}
-        # Validar estructura y tipos
-        if (
-            isinstance(scoring, dict)
-            and expected_keys.issubset(scoring.keys())
-            and all(isinstance(scoring[k], dict) and isinstance(scoring[k].get("score", None), int) and 0 <= scoring[k]["score"] <= 100 for k in ["CT", "IE", "EJ", "CR", "SS"])
-            and isinstance(scoring.get("ventaja", []), list)
-            and isinstance(scoring.get("area_oportunidad", []), list)
-        ):
+        scoring = parse_scoring(score_candidate(candidate))
+        if is_valid_scoring(scoring):
             return scoring
         time.sleep(2)
     # Si nunca fue válido, devolver el último intento (aunque sea error)
     return scoring
 
+def is_retryable_error(error):
+    """429, errores 5xx y fallas de conexión se reintentan con backoff."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+class ScoringLimits:
+    """
+    Agrupa los limitadores compartidos por todas las peticiones de una corrida. Los token
+    buckets de rpm/tpm solo acotan ráfagas; la concurrencia adaptativa hace el resto.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, max_concurrency=MAX_CONCURRENCY,
+                 requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.concurrency = AdaptiveConcurrency(concurrency, maximum=max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.retries = 0
+        self.throttled = 0
+
+async def complete_async(prompt, limits, expected_output_tokens=EXPECTED_OUTPUT_TOKENS):
+    """
+    Hace una petición al modelo respetando los limitadores. Regresa el contenido de la
+    respuesta, o lanza la excepción si el error no es recuperable.
+    """
+    # Estimación aproximada: ~4 caracteres por token más la respuesta esperada
+    estimated_tokens = len(prompt) // 4 + expected_output_tokens
+    attempt = 0
+    while True:
+        await limits.requests.acquire(1)
+        await limits.tokens.acquire(estimated_tokens)
+        await limits.concurrency.acquire()
+        throttled = False
+        started = time.perf_counter()
+        try:
+            response = await async_client.chat.completions.create(
+                model=MODEL,
+                messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+            )
+        except Exception as e:
+            status = getattr(e, "status_code", None) or type(e).__name__
+            histogram("llm_request_seconds", "Latencia de peticiones al LLM", LATENCY_BUCKETS).observe(
+                time.perf_counter() - started, status=status)
+            if not is_retryable_error(e) or attempt >= 8:
+                raise
+            counter("llm_retries_total", "Reintentos de peticiones al LLM").inc(reason=status)
+            throttled = True
+            response_headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            retry_after = parse_retry_after(response_headers.get("retry-after"))
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            if retry_after is not None:
+                # Retry-After aplica a todas las peticiones, no solo a esta
+                limits.requests.pause(delay)
+            limits.throttled += 1
+        finally:
+            await limits.concurrency.release(throttled)
+        if throttled:
+            attempt += 1
+            limits.retries += 1
+            await asyncio.sleep(delay)
+            continue
+        histogram("llm_request_seconds", "Latencia de peticiones al LLM", LATENCY_BUCKETS).observe(
+            time.perf_counter() - started, status=200)
+        usage = getattr(response, "usage", None)
+        if usage and getattr(usage, "total_tokens", None):
+            limits.tokens.adjust(usage.total_tokens - estimated_tokens)
+            tokens = counter("llm_tokens_total", "Tokens usados por el LLM")
+            tokens.inc(usage.prompt_tokens or 0, type="prompt")
+            tokens.inc(usage.completion_tokens or 0, type="completion")
+            histogram("llm_request_tokens", "Tokens por petición al LLM", TOKEN_BUCKETS).observe(usage.total_tokens)
+        return response.choices[0].message.content
+
+async def score_candidate_async(candidate, limits, max_retries=5, cache=None):
+    """
+    Versión asíncrona de score_candidate_with_retries con los mismos criterios de validación.
+    Si hay caché, un prompt idéntico para el mismo modelo se responde sin llamar a la API.
+    """
+    prompt = build_prompt(candidate)
+    key = cache_key(MODEL, prompt) if cache else None
+    if cache:
+        cached = cache.get(key)
+        counter("llm_cache_lookups_total", "Consultas a la caché de respuestas").inc(
+            result="hit" if is_valid_scoring(cached) else "miss")
+        if is_valid_scoring(cached):
+            return cached
+    scoring = {}
+    for attempt in range(max_retries):
+        content = await complete_async(prompt, limits)
+        try:
+            result = json.loads(content)
+        except Exception:
+            result = {"raw_response": content}
+        scoring = parse_scoring(result)
+        if is_valid_scoring(scoring):
+            if cache:
+                cache.put(key, MODEL, scoring)
+            return scoring
+        counter("llm_parse_failures_total", "Respuestas del LLM inválidas o sin JSON").inc()
+        counter("llm_retries_total", "Reintentos de peticiones al LLM").inc(reason="invalid")
+        limits.retries += 1
+    # Si nunca fue válido, devolver el último intento (aunque sea error)
+    return scoring
+
+async def score_batch_async(candidates, limits, cache=None):
+    """
+    Califica varios candidatos en una sola petición. Regresa una calificación por candidato
+    en el orden de entrada, o None para los que no tuvieron un resultado válido (se deben
+    reintentar por separado). Las respuestas en caché se guardan por candidato, pero con el
+    modo y la plantilla del lote en los parámetros de la clave: no se mezclan con las de
+    score_candidate_async, que se obtuvieron con otro prompt.
+    """
+    folios = [candidate_folio(c) for c in candidates]
+    profiles = [build_profile(c) for c in candidates]
+    params = {"mode": "batch", "template": BATCH_PROMPT_TEMPLATE}
+    keys = [cache_key(MODEL, PROFILE_HEADER + profile, params) if cache else None for profile in profiles]
+    scorings = [None] * len(candidates)
+    pending = []
+    for index, key in enumerate(keys):
+        if cache:
+            cached = cache.get(key)
+            counter("llm_cache_lookups_total", "Consultas a la caché de respuestas").inc(
+                result="hit" if is_valid_scoring(cached) else "miss")
+            if is_valid_scoring(cached):
+                scorings[index] = cached
+                continue
+        pending.append(index)
+    if not pending:
+        return scorings
+    prompt = build_batch_prompt([folios[i] for i in pending], [profiles[i] for i in pending])
+    results = parse_batch_scoring(await complete_async(prompt, limits, EXPECTED_OUTPUT_TOKENS * len(pending)))
+    items = counter("llm_batch_items_total", "Candidatos enviados en lotes, por resultado")
+    for index in pending:
+        scoring = parse_scoring(results.get(folios[index]))
+        if is_valid_scoring(scoring):
+            scorings[index] = scoring
+            items.inc(result="ok")
+            if cache:
+                cache.put(keys[index], MODEL, scoring)
+        else:
+            items.inc(result="fallback")
+    return scorings
+
+async def score_all(candidates, limits, on_result=None, cache=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Califica todos los candidatos con varias peticiones en vuelo. Con batch_size > 1 cada
+    petición lleva hasta batch_size candidatos y solo los que fallen se reintentan uno por
+    uno. on_result(index, entry) se llama al terminar cada candidato. Regresa los
+    resultados en el orden de entrada.
+    """
+    results = [None] * len(candidates)
+    started = time.monotonic()
+    done = 0
+
+    def finish(index, candidate, scoring):
+        nonlocal done
+        nombre = candidate.get("nombreCandidato", candidate.get("folio", ""))
+        counter("rows_processed_total", "Filas procesadas por la etapa").inc(
+            kind="candidates", status="ok" if is_valid_scoring(scoring) else "error")
+        entry = {"folio": candidate.get("idCandidato", ""), "nombre": nombre, "scoring": scoring}
+        results[index] = entry
+        done += 1
+        elapsed = time.monotonic() - started
+        print(f"[{done}/{len(candidates)}] Scoring {nombre} "
+              f"(concurrencia={limits.concurrency.limit}, {done / max(elapsed, 1e-9) * 60:.1f}/min)")
+        if on_result:
+            on_result(index, entry)
+
+    async def run(index, candidate):
+        try:
+            scoring = await score_candidate_async(candidate, limits, cache=cache)
+        except Exception as e:
+            print(f"Error al calificar {candidate.get('nombreCandidato', candidate.get('folio', ''))}: {e}")
+            scoring = {"error": str(e)}
+        finish(index, candidate, scoring)
+
+    async def run_batch(indices):
+        batch = [candidates[i] for i in indices]
+        try:
+            scorings = await score_batch_async(batch, limits, cache=cache)
+        except Exception as e:
+            print(f"Error en el lote de {len(batch)} candidatos, se califican por separado: {e}")
+            scorings = [None] * len(batch)
+        retry = []
+        for index, scoring in zip(indices, scorings):
+            if scoring is None:
+                retry.append(index)
+            else:
+                finish(index, candidates[index], scoring)
+        await asyncio.gather(*(run(i, candidates[i]) for i in retry))
+
+    if batch_size > 1:
+        batches = [range(i, min(i + batch_size, len(candidates))) for i in range(0, len(candidates), batch_size)]
+        await asyncio.gather(*(run_batch(indices) for indices in batches))
+    else:
+        await asyncio.gather(*(run(i, c) for i, c in enumerate(candidates)))
+    return results
+
+def export_results(candidates, entries):
+    """Genera JSON, CSV y log a partir de las entradas del journal, en el orden de los candidatos."""
+    results = []
+    seen = set()
+    for candidate in candidates:
+        folio = str(candidate.get("idCandidato", ""))
+        if folio in entries and folio not in seen:
+            results.append(entries[folio])
+            seen.add(folio)
+    # Conservar entradas de folios que ya no están en la lista de candidatos
+    results.extend(entry for folio, entry in entries.items() if folio not in seen)
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    rows = save_results_csv(results, CSV_OUTPUT_PATH, log_path=LOG_OUTPUT_PATH)
+    save_results_parquet(rows, CSV_OUTPUT_PATH)
+    with CandidateStore(DEFAULT_STORE_PATH) as store:
+        store.upsert_scores(results, status_for=lambda scoring: "OK" if is_valid_scoring(scoring) else "ERROR")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Califica candidatos con un LLM vía OpenRouter")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Peticiones en vuelo iniciales")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help="Máximo de peticiones en vuelo")
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE, help="Límite de peticiones por minuto")
+    parser.add_argument("--tpm", type=int, default=TOKENS_PER_MINUTE, help="Límite de tokens por minuto")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar desde el journal, omitiendo folios ya calificados correctamente")
+    parser.add_argument("--export-only", action="store_true",
+                        help="Solo regenerar JSON/CSV a partir del journal, sin llamar al modelo")
+    parser.add_argument("--delta", default=None,
+                        help="Manifiesto delta de extract_candidates.py: calificar solo candidatos afectados")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Candidatos por petición; los que fallen en el lote se reintentan uno por uno")
+    parser.add_argument("--cv-max-pages", type=int, default=None,
+                        help="Incluir solo las primeras N páginas del CV (requiere el índice por página)")
+    parser.add_argument("--no-cache", action="store_true", help="No usar la caché de respuestas del LLM")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Ruta de la caché SQLite")
+    parser.add_argument("--cache-ttl-days", type=float, default=None, help="Descartar respuestas con más de N días")
+    parser.add_argument("--cache-max-entries", type=int, default=None, help="Máximo de respuestas en caché (LRU)")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
 def main():
+    global CV_MAX_PAGES
+    args = parse_args()
+    CV_MAX_PAGES = args.cv_max_pages or CV_MAX_PAGES
     candidates = load_candidates()  # Procesar todos los candidatos
-    results = []
-    for i, candidate in enumerate(candidates):
-        nombre = candidate.get("nombreCandidato", candidate.get("folio", ""))
-        print(f"[{i+1}/{len(candidates)}] Scoring {nombre}")
-        result = score_candidate_with_retries(candidate)
-        results.append({"folio": candidate.get("idCandidato", ""), "nombre": nombre, "scoring": result})
-        with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-        save_results_csv(results, CSV_OUTPUT_PATH, log_path="extract_candidates_output/candidates_scored_log.txt")
-        time.sleep(1.5)
-    print(f"Scoring completado. Resultados en {OUTPUT_PATH} y {CSV_OUTPUT_PATH}")
+    if args.export_only:
+        results = export_results(candidates, load_journal(JOURNAL_PATH))
+        print(f"Exportados {len(results)} resultados a {OUTPUT_PATH} y {CSV_OUTPUT_PATH}")
+        return
+
+    pending = candidates
+    delta = load_delta(args.delta) if args.delta else None
+    if delta:
+        folios = affected_folios(delta, PROMPT_FIELDS)
+        pending = [c for c in candidates if str(c.get("idCandidato", "")) in folios]
+        print(f"Modo delta: {len(pending)} candidatos por calificar")
+    if args.resume:
+        previous = load_journal(JOURNAL_PATH)
+        done = {folio for folio, entry in previous.items() if is_valid_scoring(entry.get("scoring"))}
+        pending = [c for c in pending if str(c.get("idCandidato", "")) not in done]
+        print(f"Reanudando: {len(candidates) - len(pending)} candidatos ya calificados, {len(pending)} pendientes")
+
+    limits = ScoringLimits(args.concurrency, args.max_concurrency, args.rpm, args.tpm)
+    cache = None
+    if not args.no_cache:
+        ttl_seconds = args.cache_ttl_days * 86400 if args.cache_ttl_days else None
+        cache = ResponseCache(args.cache_path, ttl_seconds=ttl_seconds, max_entries=args.cache_max_entries)
+    started = time.monotonic()
+    # Sin --resume ni --delta se empieza un journal nuevo; si no, se agrega al existente
+    with ResultJournal(JOURNAL_PATH, append=args.resume or bool(delta)) as journal:
+        # Lápidas para los eliminados: así tampoco vuelven en --export-only, --resume ni en otro delta
+        for folio in (delta["removed"] if delta else []):
+            journal.remove(str(folio))
+        asyncio.run(score_all(pending, limits, lambda index, entry: journal.append(entry),
+                              cache=cache, batch_size=args.batch_size))
+    results = export_results(candidates, load_journal(JOURNAL_PATH))
+    if cache:
+        print(f"Caché de respuestas: {cache.stats()}")
+        cache.close()
+    print(f"Scoring completado en {time.monotonic() - started:.1f} s "
+          f"({limits.retries} reintentos, {limits.throttled} respuestas 429/5xx). "
+          f"{len(results)} resultados en {OUTPUT_PATH} y {CSV_OUTPUT_PATH}")
+    export_metrics("score")
 
 def test_first_candidate():
     """Testea el scoring solo con el primer candidato y escala 0-100."""
@@ -247,4 +669,5 @@ Instrucciones estrictas para la evaluación:
     print(json.dumps(result, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    with profile_from_argv("score"):
+        main()
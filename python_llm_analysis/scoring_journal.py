@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Journal append-only (JSONL) para resultados de scoring.
+Cada resultado se escribe como una línea; el fsync se hace por lotes para no
+pagar una sincronización a disco por candidato. Los candidatos eliminados se registran
+con una lápida ({"folio": ..., "removed": true}) que descarta sus entradas anteriores.
+"""
+
+import json
+import os
+import time
+
+
+class ResultJournal:
+    """Escritor append-only con fsync cada fsync_every líneas o cada fsync_interval segundos."""
+
+    def __init__(self, path, append=True, fsync_every=25, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        needs_newline = append and _ends_without_newline(path)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        if needs_newline:
+            # Cerrar una línea truncada por una caída previa antes de seguir agregando
+            self._file.write("\n")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def remove(self, folio):
+        """Registra que el folio ya no es candidato; load_journal descarta sus entradas previas."""
+        self.append({"folio": folio, "removed": True})
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _ends_without_newline(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def load_journal(path):
+    """
+    Lee el journal y regresa un dict folio -> última entrada registrada.
+    Ignora una última línea truncada por una caída a mitad de escritura y omite los
+    folios cuya última línea es una lápida de candidato eliminado.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("removed"):
+                entries.pop(str(entry.get("folio", "")), None)
+            else:
+                entries[str(entry.get("folio", ""))] = entry
+    return entries
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos para pruebas de escala.
+Produce N candidatos con la misma forma que los endpoints del INE (raw_*.json con
+la lista en "candidatos"), sus fotos, CVs en PDF y páginas de perfil HTML, los catálogos
+y una tabla de distritos judiciales. Los archivos quedan con la misma estructura de rutas que el
+sitio del INE para que mock_servers.py los sirva tal cual.
+
+Uso:
+    python synthetic_data.py --count 50000 --out mock_data
+"""
+
+import argparse
+import base64
+import csv
+import html
+import json
+import os
+import random
+import time
+
+# Categoría -> (archivo del endpoint, idTipoCandidatura, nombreCorto, peso en la muestra)
+CATEGORIES = {
+    "jueces_distrito": ("juecesDistrito.json", 6, "JUEZ DE DISTRITO", 0.48),
+    "magistrados_circuito": ("magistraturaTribunales.json", 5, "MAGISTRATURA DE CIRCUITO", 0.42),
+    "magistrados_sala_superior": ("magistraturaSalaSuperior.json", 2, "MAGISTRATURA SALA SUPERIOR", 0.01),
+    "magistrados_sala_regional": ("magistraturaSalasRegionales.json", 3, "MAGISTRATURA SALA REGIONAL", 0.04),
+    "magistrados_tribunal_disciplina": ("magistraturaTribunalDJ.json", 4, "MAGISTRATURA TRIBUNAL DE DISCIPLINA", 0.03),
+    "ministros_suprema_corte": ("ministrosSupremaCorte.json", 1, "MINISTRA/O SUPREMA CORTE", 0.02),
+}
+
+CATALOGS = {
+    "catalogoEstadosSecciones.json": "estados",
+    "catalogoTiposCandidaturas.json": "tipos_candidaturas",
+    "catalogoGradoAcademico.json": "grados_academicos",
+    "catalogoPoderesUnion.json": "poderes_union",
+}
+
+ESTADOS = [
+    "AGUASCALIENTES", "BAJA CALIFORNIA", "BAJA CALIFORNIA SUR", "CAMPECHE", "COAHUILA", "COLIMA",
+    "CHIAPAS", "CHIHUAHUA", "CIUDAD DE MÉXICO", "DURANGO", "GUANAJUATO", "GUERRERO", "HIDALGO",
+    "JALISCO", "MÉXICO", "MICHOACÁN", "MORELOS", "NAYARIT", "NUEVO LEÓN", "OAXACA", "PUEBLA",
+    "QUERÉTARO", "QUINTANA ROO", "SAN LUIS POTOSÍ", "SINALOA", "SONORA", "TABASCO", "TAMAULIPAS",
+    "TLAXCALA", "VERACRUZ", "YUCATÁN", "ZACATECAS",
+]
+# Secciones electorales por estado en el catálogo catalogoEstadosSecciones.json
+SECTIONS_PER_STATE = 240
+NOMBRES = ["MARÍA", "JOSÉ", "GUADALUPE", "JUAN", "ANA", "LUIS", "CARMEN", "CARLOS", "LAURA", "JORGE",
+           "PATRICIA", "MIGUEL", "ROSA", "FRANCISCO", "ELENA", "ALEJANDRO", "SOFÍA", "RICARDO"]
+APELLIDOS = ["HERNÁNDEZ", "GARCÍA", "MARTÍNEZ", "LÓPEZ", "GONZÁLEZ", "PÉREZ", "RODRÍGUEZ", "SÁNCHEZ",
+             "RAMÍREZ", "CRUZ", "FLORES", "GÓMEZ", "MORALES", "VÁZQUEZ", "REYES", "JIMÉNEZ", "TORRES"]
+ESPECIALIDADES = ["Derecho Penal", "Derecho Civil", "Derecho Administrativo", "Derecho Laboral",
+                  "Derecho Constitucional", "Derecho Fiscal", "Derecho Mercantil", "Derechos Humanos"]
+FRASES = [
+    "garantizar el acceso a la justicia", "fortalecer la independencia judicial",
+    "reducir el rezago de expedientes", "impulsar la justicia digital", "proteger a grupos vulnerables",
+    "transparentar las resoluciones", "capacitar al personal jurisdiccional", "combatir la corrupción",
+    "aplicar perspectiva de género", "resolver con apego a la Constitución",
+]
+CV_WORDS = ("licenciatura maestria doctorado derecho juzgado tribunal secretario proyectista docente "
+            "universidad publicaciones amparo penal civil administrativo resoluciones experiencia anos "
+            "capacitacion certificacion litigio defensoria fiscalia organo jurisdiccional").split()
+
+# JPEG mínimo de 1x1 píxel (los datos de prueba solo necesitan la firma y el tipo correctos)
+TINY_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQEASABIAAD/2wBDAP////////////////////////////////////////////////////////////"
+    "//////////////////////////wgALCAABAAEBAREA/8QAFBABAAAAAAAAAAAAAAAAAAAAAP/aAAgBAQABPxA="
+)
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(FRASES) for _ in range(max(1, words // 4))).capitalize() + "."
+
+
+def make_candidate(rng, folio, category):
+    """Un registro con los campos que consumen las etapas del pipeline."""
+    _, tipo, nombre_corto, _ = CATEGORIES[category]
+    estado_index = rng.randrange(len(ESTADOS))
+    nombre = f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)} {rng.choice(NOMBRES)}"
+    has_cv = rng.random() > 0.05
+    return {
+        "idCandidato": folio,
+        "idTipoCandidatura": tipo,
+        "nombreCorto": nombre_corto,
+        "nombreCandidato": nombre,
+        "sexo": rng.choice(["M", "H"]),
+        "edad": rng.randint(35, 75),
+        "idEstado": estado_index + 1,
+        "nombreEstado": ESTADOS[estado_index],
+        "idCircuito": estado_index + 1,
+        "idDistritoJudicial": rng.randint(1, 12),
+        "especialidad": rng.choice(ESPECIALIDADES),
+        "descripcionTP": sentence(rng, 16),
+        "descripcionCandidato": sentence(rng, 40),
+        "visionJurisdiccional": sentence(rng, 30),
+        "visionImparticionJusticia": sentence(rng, 30),
+        "propuesta1": sentence(rng, 12),
+        "propuesta2": sentence(rng, 12),
+        "propuesta3": sentence(rng, 12),
+        "descripcionHLC": f"CV_{folio}.pdf" if has_cv else "",
+        "urlFoto": f"/cycc/img/fotocandidato/{folio}.jpg",
+    }
+
+
+def pdf_bytes(pages):
+    """PDF mínimo válido (Helvetica, WinAnsi) con una página por cada lista de líneas."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 50 780 Td 12 TL " + " ".join(
+            "({}) '".format(line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")) for line in lines
+        ) + " ET"
+        data = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R >> >> >>" % content_id)
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_cv(rng, candidate, pages):
+    name = candidate["nombreCandidato"].encode("ascii", "ignore").decode()
+    content = []
+    for number in range(pages):
+        lines = [f"CURRICULUM VITAE - {name} - pagina {number + 1}"]
+        lines += [" ".join(rng.choice(CV_WORDS) for _ in range(12)) for _ in range(40)]
+        content.append(lines)
+    return pdf_bytes(content)
+
+
+def profile_html(candidate, seed=0):
+    """Página de perfil con la estructura que espera parse_profiles_html.py (secciones h2, dl, enlaces)."""
+    # Generador propio por candidato: no altera la secuencia del resto del conjunto de datos
+    rng = random.Random(f"{seed}-perfil-{candidate['idCandidato']}")
+
+    def e(value):
+        return html.escape(str(value))
+
+    def items(values):
+        return "".join(f"<li>{e(value)}</li>" for value in values)
+
+    usuario = f"cand{candidate['idCandidato']}"
+    formacion = [f"{grado} en Derecho, {rng.choice(['UNAM', 'UdeG', 'UANL', 'BUAP', 'UV'])}"
+                 for grado in ["Licenciatura", "Maestría", "Doctorado"][:rng.randint(1, 3)]]
+    secciones = [
+        ("Formación académica", f"<ul>{items(formacion)}</ul>"),
+        ("Trayectoria profesional", "".join(f"<p>{e(sentence(rng, 24))}</p>" for _ in range(rng.randint(1, 3)))),
+        ("Cursos y especializaciones", f"<ul>{items(sentence(rng, 8) for _ in range(rng.randint(0, 4)))}</ul>"),
+        ("Visión jurisdiccional", f"<p>{e(candidate['visionJurisdiccional'])}</p>"),
+        ("Visión sobre la impartición de justicia", f"<p>{e(candidate['visionImparticionJusticia'])}</p>"),
+        ("Propuestas", f"<ol>{items(candidate[f'propuesta{i}'] for i in (1, 2, 3))}</ol>"),
+        ("¿Por qué quiero ser persona juzgadora?", f"<p>{e(sentence(rng, 20))}</p>"),
+        ("Reconocimientos", f"<p>{e(sentence(rng, 12))}</p>"),
+        ("Contacto", f'<ul><li><a href="https://x.com/{usuario}">X</a></li>'
+                     f'<li><a href="https://facebook.com/{usuario}">Facebook</a></li>'
+                     f'<li>Correo: <a href="mailto:{usuario}@example.org">{usuario}@example.org</a></li></ul>'),
+    ]
+    datos = [("Cargo", candidate["nombreCorto"]), ("Entidad", candidate["nombreEstado"]),
+             ("Sexo", candidate["sexo"]), ("Edad", candidate["edad"]), ("Especialidad", candidate["especialidad"])]
+    return (
+        '<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">'
+        f'<title>{e(candidate["nombreCandidato"])} | Conóceles</title>'
+        '<link rel="stylesheet" href="/static/app.css"><script src="/static/app.js"></script></head>'
+        '<body><header><nav><a href="/">Inicio</a> <a href="/candidaturas">Candidaturas</a></nav></header>'
+        f'<main><div class="candidate-profile"><h1>{e(candidate["nombreCandidato"])}</h1>'
+        f'<img src="/cycc/img/fotocandidato/{candidate["idCandidato"]}.jpg" alt="">'
+        f'<dl class="datos-generales">{"".join(f"<dt>{e(k)}</dt><dd>{e(v)}</dd>" for k, v in datos)}</dl>'
+        + "".join(f"<section><h2>{e(titulo)}</h2>{contenido}</section>" for titulo, contenido in secciones)
+        + '</div></main><footer><p>Instituto Nacional Electoral</p>'
+        '<script>window.dataLayer = window.dataLayer || [];</script></footer></body></html>'
+    ).encode("utf-8")
+
+
+def section_catalog(circuito):
+    """Secciones de un estado repartidas en bloques consecutivos entre sus 12 distritos."""
+    return [{"seccion": seccion, "idCircuito": circuito,
+             "idDistritoJudicial": (seccion - 1) * 12 // SECTIONS_PER_STATE + 1}
+            for seccion in range(1, SECTIONS_PER_STATE + 1)]
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def generate(count, out_dir, seed=0, max_cv_pages=4, documents=True, first_folio=100000):
+    """Genera el conjunto de datos y regresa un resumen con conteos y bytes escritos."""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    json_dir = os.path.join(out_dir, "cycc", "documentos", "json")
+    photos_dir = os.path.join(out_dir, "cycc", "img", "fotocandidato")
+    # Misma ruta que PROFILE_URL_PATTERN (candidato/{folio}); mock_servers.py sirve el index.html
+    profiles_dir = os.path.join(out_dir, "candidato")
+    cv_dir = os.path.join(out_dir, "cycc", "documentos", "cv")
+    names = list(CATEGORIES)
+    weights = [CATEGORIES[name][3] for name in names]
+    by_category = {name: [] for name in names}
+    total_bytes = 0
+    for offset in range(count):
+        category = rng.choices(names, weights)[0]
+        candidate = make_candidate(rng, first_folio + offset, category)
+        by_category[category].append(candidate)
+        if documents:
+            photo = TINY_JPEG[:2] + b"\xff\xfe\x00\x10" + bytes(rng.getrandbits(8) for _ in range(14)) + TINY_JPEG[2:]
+            write_file(os.path.join(photos_dir, f"{candidate['idCandidato']}.jpg"), photo)
+            total_bytes += len(photo)
+            if candidate["descripcionHLC"]:
+                cv = make_cv(rng, candidate, rng.randint(1, max_cv_pages))
+                write_file(os.path.join(cv_dir, candidate["descripcionHLC"]), cv)
+                total_bytes += len(cv)
+            page = profile_html(candidate, seed)
+            write_file(os.path.join(profiles_dir, str(candidate["idCandidato"]), "index.html"), page)
+            total_bytes += len(page)
+
+    for category, candidates in by_category.items():
+        data = json.dumps({"candidatos": candidates}, ensure_ascii=False).encode("utf-8")
+        write_file(os.path.join(json_dir, CATEGORIES[category][0]), data)
+        total_bytes += len(data)
+    catalogs = {
+        "estados": [{"idEstado": i + 1, "nombreEstado": estado, "secciones": section_catalog(i + 1)}
+                    for i, estado in enumerate(ESTADOS)],
+        "tipos_candidaturas": [{"idTipoCandidatura": tipo, "nombreCorto": corto}
+                               for _, tipo, corto, _ in CATEGORIES.values()],
+        "grados_academicos": [{"idGrado": i, "descripcion": grado}
+                              for i, grado in enumerate(["LICENCIATURA", "MAESTRÍA", "DOCTORADO"], start=1)],
+        "poderes_union": [{"idPoder": i, "descripcion": poder}
+                          for i, poder in enumerate(["EJECUTIVO", "LEGISLATIVO", "JUDICIAL"], start=1)],
+    }
+    for filename, name in CATALOGS.items():
+        write_file(os.path.join(json_dir, filename), json.dumps(catalogs[name], ensure_ascii=False).encode("utf-8"))
+
+    # Tabla de distritos compatible con associate_candidates.py
+    lookup_path = os.path.join(out_dir, "distritos_judiciales", "output", "distritos_judiciales_lookup.csv")
+    os.makedirs(os.path.dirname(lookup_path), exist_ok=True)
+    with open(lookup_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["distrito_judicial", "circuito_judicial", "nombre_distrito_judicial", "entidad"])
+        for index, estado in enumerate(ESTADOS):
+            for distrito in range(1, 13):
+                writer.writerow([distrito, index + 1, f"DISTRITO {distrito} {estado}", estado])
+
+    summary = {
+        "candidatos": count,
+        "por_categoria": {name: len(candidates) for name, candidates in by_category.items()},
+        "documentos": documents,
+        "mb_escritos": round(total_bytes / 1e6, 2),
+        "segundos": round(time.perf_counter() - started, 2),
+        "semilla": seed,
+    }
+    with open(os.path.join(out_dir, "synthetic_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera candidatos sintéticos con la forma de los endpoints del INE")
+    parser.add_argument("--count", type=int, default=3500, help="Número de candidatos")
+    parser.add_argument("--out", default="mock_data", help="Directorio de salida (raíz que sirve mock_servers.py)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla para datos reproducibles")
+    parser.add_argument("--max-cv-pages", type=int, default=4, help="Páginas máximas por CV")
+    parser.add_argument("--no-documents", action="store_true", help="Generar solo los JSON (sin fotos, CVs ni perfiles)")
+    args = parser.parse_args()
+    summary = generate(args.count, args.out, args.seed, args.max_cv_pages, documents=not args.no_documents)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()